@@ -0,0 +1,328 @@
+"""
+视记 - 命令行批量处理
+
+不经过 HTTP 服务，直接调用 ProcessService 批量处理链接（下载、分段、转写与接口完全相同，
+同样使用下载目录中的阶段缓存、会话索引和资料库），适合夜间离线批量导入：
+- 从文件或标准输入读取链接（每行一个，空行和 # 开头的行忽略）
+- --jobs N 个任务并行处理，终端实时显示进度表
+- 每个任务完成后立即向 JSONL 结果清单追加一行，中途中断也能保留已完成的结果
+
+用法:
+    python audio2note.py urls.txt --jobs 4 --download-dir ./downloads
+    cat urls.txt | python audio2note.py - --chunk-seconds 600 --transcribe-engine fake
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import List, Optional, TextIO
+
+from services import job_control
+from services.audio_chunker import SUPPORTED_MODES as CHUNK_MODES
+from services.audio_downloader import AUDIO_PROFILES, DEFAULT_AUDIO_PROFILE
+from services.errors import UNKNOWN, UNSUPPORTED_URL
+from services.process_service import ProcessService
+from services.subscription_sync import is_collection_url
+from services.transcriber import ENGINES as TRANSCRIBE_ENGINES
+
+DEFAULT_MANIFEST = "audio2note_results.jsonl"
+
+# 进度表中最多列出的运行中任务数
+_MAX_RUNNING_ROWS = 10
+
+
+def read_urls(source: TextIO) -> List[str]:
+    """
+    读取链接列表，忽略空行、注释和重复链接
+
+    Args:
+        source (TextIO): 链接文件或标准输入
+
+    Returns:
+        list: 按出现顺序去重后的链接
+    """
+    urls = []
+    seen = set()
+    for line in source:
+        url = line.strip()
+        if not url or url.startswith('#') or url in seen:
+            continue
+        seen.add(url)
+        urls.append(url)
+    return urls
+
+
+def _format_elapsed(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def _shorten(text: str, width: int) -> str:
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+class ProgressTable:
+    """
+    批量处理进度表
+
+    每个任务完成时输出一行结果；终端为 TTY 时在结果下方实时刷新汇总和运行中任务，
+    输出被重定向到文件时只输出结果行
+    """
+
+    def __init__(self, total: int, stream: TextIO):
+        """
+        Args:
+            total (int): 任务总数
+            stream (TextIO): 输出流
+        """
+        self.total = total
+        self.stream = stream
+        self.live = stream.isatty()
+        self.started_at = time.time()
+        self.succeeded = 0
+        self.failed = 0
+        self.running = {}  # url -> 开始时间
+        self._lock = threading.Lock()
+        self._drawn_lines = 0
+
+    def start(self, url: str):
+        with self._lock:
+            self.running[url] = time.time()
+            self._redraw()
+
+    def finish(self, url: str, result: dict, elapsed: float):
+        with self._lock:
+            self.running.pop(url, None)
+            if result.get("success"):
+                self.succeeded += 1
+                icon, detail = "✅", result.get("video_title") or url
+                if result.get("duplicate_of"):
+                    detail += f"（与已有任务 {result['duplicate_of']} 内容相同）"
+                elif result.get("cached_stages"):
+                    detail += f"（复用缓存: {', '.join(result['cached_stages'])}）"
+            else:
+                self.failed += 1
+                icon = "❌"
+                detail = f"{url}  [{result.get('error_category', UNKNOWN)}] {result.get('error', '')}"
+            done = self.succeeded + self.failed
+            self._clear()
+            self.stream.write(f"{icon} [{done}/{self.total}] {elapsed:6.1f}s  {_shorten(detail, 160)}\n")
+            self._redraw()
+
+    def refresh(self):
+        with self._lock:
+            self._redraw()
+
+    def close(self):
+        with self._lock:
+            self._clear()
+            self.stream.write(self._summary() + "\n")
+            self.stream.flush()
+
+    def _summary(self) -> str:
+        done = self.succeeded + self.failed
+        return (f"📊 已完成 {done}/{self.total}  成功 {self.succeeded}  失败 {self.failed}  "
+                f"运行中 {len(self.running)}  用时 {_format_elapsed(time.time() - self.started_at)}")
+
+    def _clear(self):
+        """清除上次绘制的实时区域（调用方需持有锁）"""
+        if self._drawn_lines:
+            self.stream.write(f"\x1b[{self._drawn_lines}F\x1b[J")
+            self._drawn_lines = 0
+
+    def _redraw(self):
+        """重新绘制汇总和运行中任务（调用方需持有锁）"""
+        if not self.live:
+            return
+        self._clear()
+        now = time.time()
+        lines = [self._summary()]
+        running = sorted(self.running.items(), key=lambda item: item[1])
+        for url, started in running[:_MAX_RUNNING_ROWS]:
+            lines.append(f"   ⏳ {_format_elapsed(now - started)}  {_shorten(url, 100)}")
+        if len(running) > _MAX_RUNNING_ROWS:
+            lines.append(f"   … 另有 {len(running) - _MAX_RUNNING_ROWS} 个任务运行中")
+        self.stream.write("\n".join(lines) + "\n")
+        self.stream.flush()
+        self._drawn_lines = len(lines)
+
+
+class ResultManifest:
+    """JSONL 结果清单：每完成一个任务追加一行并立即落盘"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(urls: List[str], service: ProcessService, jobs: int, manifest: ResultManifest,
+              progress: ProgressTable, **process_kwargs) -> int:
+    """
+    并行处理一批链接
+
+    Args:
+        urls (list): 链接列表
+        service (ProcessService): 处理服务（决定下载目录）
+        jobs (int): 并行任务数
+        manifest (ResultManifest): 结果清单
+        progress (ProgressTable): 进度表
+        **process_kwargs: 透传给 ProcessService.process_video 的处理参数
+
+    Returns:
+        int: 失败的任务数
+    """
+    def process(url: str) -> dict:
+        progress.start(url)
+        started = time.time()
+        if is_collection_url(url):
+            result = {"success": False, "error": "播放列表/频道链接请使用订阅同步接口",
+                      "error_category": UNSUPPORTED_URL, "retryable": False}
+        else:
+            try:
+                result = service.process_video(url, **process_kwargs)
+            except Exception as e:
+                result = {"success": False, "error": str(e), "error_category": UNKNOWN,
+                          "retryable": False}
+        elapsed = time.time() - started
+        manifest.write({"url": url, "elapsed_seconds": round(elapsed, 2),
+                        "finished_at": time.time(), **result})
+        progress.finish(url, result, elapsed)
+        return result
+
+    stop_refresh = threading.Event()
+    if progress.live:
+        def refresh():
+            while not stop_refresh.wait(1.0):
+                progress.refresh()
+        threading.Thread(target=refresh, daemon=True).start()
+
+    executor = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="audio2note")
+    try:
+        futures = [executor.submit(process, url) for url in urls]
+        failed = sum(1 for future in as_completed(futures) if not future.result().get("success"))
+    except KeyboardInterrupt:
+        # 不再启动排队中的任务，并终止正在运行的下载和 ffmpeg；
+        # 任务在获取到ID之前无法取消，因此反复取消直到所有任务结束
+        executor.shutdown(wait=False, cancel_futures=True)
+        while not all(future.done() for future in futures):
+            for job in job_control.list_running():
+                job_control.cancel_job(job["job_id"])
+            wait(futures, timeout=0.5)
+        raise
+    finally:
+        stop_refresh.set()
+    executor.shutdown()
+    return failed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="视记 - 命令行批量处理（不启动 HTTP 服务）")
+    parser.add_argument("source", nargs="?", default="-",
+                        help="链接文件，每行一个；省略或为 - 时从标准输入读取")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="并行任务数（默认 2）")
+    parser.add_argument("-d", "--download-dir", default="temp", help="下载目录（默认 temp）")
+    parser.add_argument("-o", "--output", default=DEFAULT_MANIFEST,
+                        help=f"JSONL 结果清单路径，追加写入（默认 {DEFAULT_MANIFEST}）")
+    parser.add_argument("--log", help="处理日志文件，默认写入结果清单旁的 .log 文件")
+    parser.add_argument("-v", "--verbose", action="store_true", help="处理日志直接输出到终端")
+    parser.add_argument("--page-number", type=int, help="分P编号")
+    parser.add_argument("--chunk-seconds", type=int, help="分段时长（秒）")
+    parser.add_argument("--chunk-mode", choices=CHUNK_MODES, default="fixed", help="分段模式")
+    parser.add_argument("--transcribe-engine", choices=sorted(TRANSCRIBE_ENGINES), help="转写引擎")
+    parser.add_argument("--transcribe-workers", type=int,
+                        help="每个任务的转写进程数（默认按 CPU 核数在并行任务间平分）")
+    parser.add_argument("--audio-profile", choices=sorted(AUDIO_PROFILES), default=DEFAULT_AUDIO_PROFILE,
+                        help="音频输出配置")
+    parser.add_argument("--trim-silence", action="store_true", help="裁剪长静音")
+    parser.add_argument("--timeout-seconds", type=float, help="单个任务的期限（秒）")
+    parser.add_argument("--waveform", action="store_true", help="生成波形峰值文件（<音频文件名>.peaks）")
+    parser.add_argument("--dedup", action="store_true",
+                        help="按音频指纹跳过与已有任务内容相同的视频（需要 NumPy）")
+    parser.add_argument("--profile", action="store_true",
+                        help="用 cProfile 分析每个任务，结果按任务ID保存在会话文件夹（.profile-<任务ID>.txt）")
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error("--jobs 必须大于 0")
+    if args.chunk_seconds is not None and args.chunk_seconds <= 0:
+        parser.error("--chunk-seconds 必须大于 0")
+    if args.timeout_seconds is not None and args.timeout_seconds <= 0:
+        parser.error("--timeout-seconds 必须大于 0")
+
+    if args.source == "-":
+        urls = read_urls(sys.stdin)
+    else:
+        with open(args.source, 'r', encoding='utf-8') as f:
+            urls = read_urls(f)
+    if not urls:
+        print("没有需要处理的链接", file=sys.stderr)
+        return 0
+
+    transcribe_workers = args.transcribe_workers
+    if args.transcribe_engine and transcribe_workers is None:
+        # 多个任务同时转写时平分 CPU，避免进程数超过核数
+        transcribe_workers = max((os.cpu_count() or 1) // args.jobs, 1)
+
+    process_kwargs = {
+        "page_number": args.page_number,
+        "chunk_seconds": args.chunk_seconds,
+        "chunk_mode": args.chunk_mode,
+        "transcribe_engine": args.transcribe_engine,
+        "transcribe_workers": transcribe_workers,
+        "audio_profile": args.audio_profile,
+        "trim_silence": args.trim_silence,
+        "timeout_seconds": args.timeout_seconds,
+        "profile": args.profile,
+        "waveform": args.waveform,
+        "dedup": args.dedup,
+    }
+
+    # 进度表写到标准错误，处理过程中各模块的日志默认写入日志文件；
+    # 标准输出/错误被重定向到日志后，给用户看的提示仍写到原来的终端
+    console = sys.stderr
+    progress = ProgressTable(len(urls), console)
+    manifest = ResultManifest(args.output)
+    log_path = args.log or os.path.splitext(args.output)[0] + ".log"
+    print(f"🚀 共 {len(urls)} 个链接，并行 {args.jobs} 个任务，下载目录: {args.download_dir}", file=sys.stderr)
+    print(f"📝 结果清单: {args.output}" + ("" if args.verbose else f"，处理日志: {log_path}"),
+          file=sys.stderr)
+
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            log_file = stack.enter_context(open(log_path, 'a', encoding='utf-8'))
+            stack.enter_context(contextlib.redirect_stdout(log_file))
+            # yt-dlp 的错误信息写在标准错误，一并写入日志，避免打乱进度表
+            stack.enter_context(contextlib.redirect_stderr(log_file))
+        try:
+            service = ProcessService(args.download_dir)
+            failed = run_batch(urls, service, args.jobs, manifest, progress, **process_kwargs)
+        except KeyboardInterrupt:
+            progress.close()
+            print("🛑 已中断，已完成的结果保存在结果清单中", file=console)
+            return 130
+        finally:
+            manifest.close()
+
+    progress.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+yt-dlp 提取器裁剪基准测试
+
+对比加载全部提取器和只加载 ALLOWED_EXTRACTORS 时：
+- 创建 YoutubeDL 实例的平均耗时
+- 进程常驻内存 (RSS) 峰值
+
+每种情况在独立子进程中运行，互不影响
+
+用法: python benchmark_extractors.py [--instances 20]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+MEASURE_SCRIPT = r'''
+import json, sys, time
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 单位为字节，Linux 为 KB
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+import yt_dlp
+from services.audio_downloader import ALLOWED_EXTRACTORS
+
+mode, count = sys.argv[1], int(sys.argv[2])
+params = {"quiet": True}
+if mode == "allowed":
+    params["allowed_extractors"] = ALLOWED_EXTRACTORS
+
+start = time.perf_counter()
+for _ in range(count):
+    with yt_dlp.YoutubeDL(params) as ydl:
+        extractors = len(ydl._ies)
+elapsed = (time.perf_counter() - start) / count
+
+print(json.dumps({"extractors": extractors, "per_instance_ms": elapsed * 1000,
+                  "peak_rss_mb": rss_mb()}))
+'''
+
+
+def measure(mode, count):
+    result = subprocess.run([sys.executable, "-c", MEASURE_SCRIPT, mode, str(count)],
+                            cwd=Path(__file__).parent, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="yt-dlp 提取器裁剪基准测试")
+    parser.add_argument("--instances", type=int, default=20, help="每种情况创建的实例数")
+    args = parser.parse_args()
+
+    print(f"{'模式':<10}{'提取器数':>10}{'单实例耗时':>14}{'RSS峰值':>12}")
+    for mode in ("all", "allowed"):
+        stats = measure(mode, args.instances)
+        rss = f"{stats['peak_rss_mb']:.1f}MB" if stats["peak_rss_mb"] is not None else "N/A"
+        print(f"{mode:<10}{stats['extractors']:>10}{stats['per_instance_ms']:>12.2f}ms{rss:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+后端启动耗时基准测试
+
+分别启动不同形式的后端（源码运行 / onedir 打包 / onefile 打包），
+测量从启动进程到 /health 返回 200 的耗时，对比各打包配置
+
+用法: python benchmark_startup.py [--runs 5] [--profiles source onedir onefile]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from build_exe import PROFILES, backend_executable
+
+HEALTH_URL = "http://localhost:8001/health"
+
+
+def backend_command(backend_dir, profile):
+    """获取启动指定形式后端的命令，打包产物不存在时返回 None"""
+    if profile == "source":
+        return [sys.executable, "main.py"]
+
+    exe = backend_executable(backend_dir, profile)
+    return [str(exe)] if exe.exists() else None
+
+
+def measure_once(cmd, cwd, timeout=60.0):
+    """
+    启动一次后端并测量就绪耗时
+
+    Returns:
+        float: 就绪耗时（秒），失败返回 None
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                return None
+            try:
+                with urllib.request.urlopen(HEALTH_URL, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                pass
+            time.sleep(0.02)
+        return None
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后端启动耗时基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="每种形式的启动次数")
+    parser.add_argument("--profiles", nargs="+", default=["source", *PROFILES],
+                        choices=["source", *PROFILES], help="参与对比的形式")
+    args = parser.parse_args()
+
+    backend_dir = Path(__file__).parent
+    print(f"{'形式':<10}{'中位数':>10}{'最快':>10}{'最慢':>10}")
+
+    for profile in args.profiles:
+        cmd = backend_command(backend_dir, profile)
+        if cmd is None:
+            print(f"{profile:<10}{'未构建（python build_exe.py --profile ' + profile + '）':>30}")
+            continue
+
+        samples = []
+        for _ in range(args.runs):
+            elapsed = measure_once(cmd, backend_dir)
+            if elapsed is not None:
+                samples.append(elapsed)
+
+        if not samples:
+            print(f"{profile:<10}{'启动失败':>10}")
+            continue
+
+        print(f"{profile:<10}{statistics.median(samples):>9.2f}s"
+              f"{min(samples):>9.2f}s{max(samples):>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
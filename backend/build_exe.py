@@ -1,53 +1,149 @@
 """
 使用PyInstaller打包后端为exe文件
+
+打包配置：
+- onefile: 单个可执行文件，分发方便，但每次启动都要把整个依赖树（包括 yt-dlp）解压到临时目录
+- onedir:  目录形式，启动时无需解压；排除用不到的 yt-dlp 提取器，字节码预编译并优化，
+           不使用 UPX 压缩，后端启动速度最快（默认）
+
+用法: python build_exe.py [--profile onedir|onefile]
 """
 
+import argparse
 import os
 import sys
 import subprocess
 from pathlib import Path
 
-def build_backend_exe():
+APP_NAME = "ai-audio2note-backend"
+
+# 实际需要的 yt-dlp 提取器（与 AudioDownloader._is_supported_url 支持的平台一致）
+REQUIRED_EXTRACTORS = ["youtube", "bilibili", "generic"]
+
+HIDDEN_IMPORTS = [
+    "uvicorn.lifespan.on",
+    "uvicorn.lifespan.off",
+    "uvicorn.protocols.websockets.auto",
+    "uvicorn.protocols.http.auto",
+    "uvicorn.protocols.websockets.websockets_impl",
+    "uvicorn.protocols.http.h11_impl",
+    "uvicorn.protocols.http.httptools_impl",
+    "uvicorn.loops.auto",
+    "uvicorn.loops.asyncio",
+    "uvicorn.loops.uvloop",
+    "uvicorn.logging",
+    "uvicorn.logging.default",
+    "uvicorn.logging.access",
+]
+
+PROFILES = ("onedir", "onefile")
+
+
+def unused_extractor_modules():
+    """
+    列出可以排除的 yt-dlp 提取器模块
+
+    在子进程中导入所需提取器，记录它们实际依赖的 yt_dlp.extractor 子模块，
+    其余提取器模块全部排除。依赖 yt-dlp 自带的 lazy_extractors：
+    没有它时 yt-dlp 会在启动时导入全部提取器，此时不能排除任何模块
+
+    Returns:
+        list: 可排除的模块名
+    """
+    script = (
+        "import sys, pkgutil, yt_dlp, yt_dlp.extractor as e\n"
+        "from yt_dlp.extractor import lazy_extractors\n"
+        f"for name in {REQUIRED_EXTRACTORS!r}:\n"
+        "    __import__('yt_dlp.extractor.' + name)\n"
+        "yt_dlp.YoutubeDL({'quiet': True})\n"
+        "loaded = {m for m in sys.modules if m.startswith('yt_dlp.extractor.')}\n"
+        "for m in pkgutil.iter_modules(e.__path__, 'yt_dlp.extractor.'):\n"
+        "    if m.name not in loaded and not m.name.split('.')[-1].startswith('_'):\n"
+        "        print(m.name)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    if result.returncode != 0:
+        print("⚠️ 未找到 yt-dlp lazy_extractors，跳过提取器裁剪")
+        return []
+    return result.stdout.split()
+
+
+def profile_args(profile):
+    """
+    获取打包配置对应的 PyInstaller 参数
+
+    Args:
+        profile (str): onedir 或 onefile
+
+    Returns:
+        list: PyInstaller 参数
+    """
+    if profile == "onefile":
+        return ["--onefile"]
+
+    if profile == "onedir":
+        args = ["--onedir", "--noupx", "--optimize", "1"]
+        excluded = unused_extractor_modules()
+        print(f"✂️ 排除 {len(excluded)} 个未使用的 yt-dlp 提取器模块")
+        for module in excluded:
+            args += ["--exclude-module", module]
+        return args
+
+    raise ValueError(f"不支持的打包配置: {profile}（可选: {', '.join(PROFILES)}）")
+
+
+def backend_executable(backend_dir, profile):
+    """
+    打包产物中后端可执行文件的路径
+
+    Args:
+        backend_dir (Path): backend 目录
+        profile (str): 打包配置
+
+    Returns:
+        Path: 可执行文件路径
+    """
+    exe_name = APP_NAME + (".exe" if sys.platform == "win32" else "")
+    if profile == "onedir":
+        return Path(backend_dir) / "dist" / APP_NAME / exe_name
+    return Path(backend_dir) / "dist" / exe_name
+
+
+def build_backend_exe(profile="onedir"):
     """构建后端exe文件"""
-    
+
     # 切换到backend目录
     backend_dir = Path(__file__).parent
     os.chdir(backend_dir)
-    
+
     # PyInstaller命令
     cmd = [
         "pyinstaller",
-        "--onefile",  # 打包成单个exe文件
-        "--name", "ai-audio2note-backend",
-        "--add-data", "services;services",  # 包含services目录
-        "--hidden-import", "uvicorn.lifespan.on",
-        "--hidden-import", "uvicorn.lifespan.off", 
-        "--hidden-import", "uvicorn.protocols.websockets.auto",
-        "--hidden-import", "uvicorn.protocols.http.auto",
-        "--hidden-import", "uvicorn.protocols.websockets.websockets_impl",
-        "--hidden-import", "uvicorn.protocols.http.h11_impl",
-        "--hidden-import", "uvicorn.protocols.http.httptools_impl",
-        "--hidden-import", "uvicorn.loops.auto",
-        "--hidden-import", "uvicorn.loops.asyncio",
-        "--hidden-import", "uvicorn.loops.uvloop",
-        "--hidden-import", "uvicorn.logging",
-        "--hidden-import", "uvicorn.logging.default",
-        "--hidden-import", "uvicorn.logging.access",
-        "main.py"
+        "--noconfirm",
+        *profile_args(profile),
+        "--name", APP_NAME,
+        "--add-data", f"services{os.pathsep}services",  # 包含services目录
     ]
-    
-    print("🔧 开始构建后端exe文件...")
-    print(f"命令: {' '.join(cmd)}")
-    
+    for module in HIDDEN_IMPORTS:
+        cmd += ["--hidden-import", module]
+    cmd.append("main.py")
+
+    print(f"🔧 开始构建后端exe文件（配置: {profile}）...")
+    print(f"命令: {' '.join(cmd[:12])} ...")
+
     try:
         result = subprocess.run(cmd, check=True, capture_output=True, text=True)
         print("✅ 后端exe构建成功！")
-        print(f"输出文件: {backend_dir / 'dist' / 'ai-audio2note-backend.exe'}")
+        print(f"输出文件: {backend_executable(backend_dir, profile)}")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ 后端exe构建失败: {e.stderr}")
         return False
 
 if __name__ == "__main__":
-    success = build_backend_exe()
+    parser = argparse.ArgumentParser(description="打包后端可执行文件")
+    parser.add_argument("--profile", choices=PROFILES, default="onedir", help="打包配置")
+    args = parser.parse_args()
+
+    success = build_backend_exe(args.profile)
     sys.exit(0 if success else 1)
@@ -2,15 +2,36 @@
 FastAPI Backend for AI Audio2Note
 """
 
-from fastapi import FastAPI, HTTPException
+# 最先导入，用于统计启动耗时
+from services import warmup
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import uvicorn
+import multiprocessing
 import os
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-from services.audio_downloader import AudioDownloader
+from services.audio_downloader import AUDIO_PROFILES, AudioDownloader
 from services.process_service import ProcessService
+from services.file_server import iter_folder_zip, serve_file
+from services import job_control
+from services.errors import UNKNOWN, DownloadFailed, http_status
+from services.library import MAX_PAGE_SIZE, get_library
+from services.profiler import find_profile
+from services.session_index import sanitize_filename
+from services.subscription_sync import SubscriptionSync, is_collection_url
+from services.audio_chunker import SUPPORTED_MODES as CHUNK_MODES
+from services.transcriber import ENGINES as TRANSCRIBE_ENGINES
+from services.waveform import DEFAULT_JSON_WIDTH, generate_peaks, peaks_path_for, peaks_to_json, read_peaks
+from services.webhooks import get_webhook_dispatcher
+
+warmup.mark("app_import")
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -31,19 +52,83 @@ app.add_middleware(
 # 初始化服务
 process_service = ProcessService()
 
+
+def _background_workers() -> int:
+    value = os.environ.get("AUDIO2NOTE_BACKGROUND_JOBS")
+    try:
+        return max(int(value), 1) if value else 2
+    except ValueError:
+        print(f"⚠️ 环境变量 AUDIO2NOTE_BACKGROUND_JOBS 无效: {value}")
+        return 2
+
+
+# 带 callback_url 的请求提交到这里排队执行，接口立即返回，完成后通过回调通知结果
+background_jobs = ThreadPoolExecutor(max_workers=_background_workers(), thread_name_prefix="background-job")
+
+@app.on_event("startup")
+async def start_storage_janitor():
+    """启动默认下载目录的后台清理线程"""
+    process_service.storage.start_janitor()
+
+@app.on_event("startup")
+async def prewarm_downloader():
+    """服务就绪后在后台预热 yt_dlp，首个下载请求无需等待导入"""
+    warmup.mark("startup_complete")
+    warmup.prewarm_in_background()
+
+@app.on_event("shutdown")
+async def stop_storage_janitor():
+    process_service.storage.stop_janitor()
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    """丢弃排队中的后台任务，尽量发送完已完成任务的回调"""
+    background_jobs.shutdown(wait=False, cancel_futures=True)
+    get_webhook_dispatcher().close()
+
 # Pydantic模型
 class VideoProcessRequest(BaseModel):
     url: str
     page_number: Optional[int] = None
     download_dir: Optional[str] = None
+    chunk_seconds: Optional[int] = None  # 设置后把音频切分为该时长的分段
+    chunk_mode: Optional[str] = "fixed"  # fixed: 固定时长 / silence: 在静音处切分
+    transcribe_engine: Optional[str] = None  # 转写引擎：fake / faster-whisper
+    transcribe_workers: Optional[int] = None  # 转写工作进程数，默认为 CPU 核数
+    audio_profile: Optional[str] = "standard"  # standard: 192kbps / speech: 单声道 16kHz 响度归一化
+    trim_silence: Optional[bool] = False  # 裁剪开头和中间的长静音
+    start: Optional[float] = None  # 片段开始时间（秒），只下载该时间段
+    end: Optional[float] = None  # 片段结束时间（秒）
+    timeout_seconds: Optional[float] = None  # 任务期限（秒），超时后终止下载和 ffmpeg
+    callback_url: Optional[str] = None  # 设置后接口立即返回 202，任务完成后把结果 POST 到该地址
+    profile: Optional[bool] = False  # 用 cProfile 分析本任务，结果通过 /api/jobs/{job_id}/profile 获取
+    waveform: Optional[bool] = False  # 生成波形峰值，通过 /api/jobs/{job_id}/peaks/{序号} 获取
+    dedup: Optional[bool] = False  # 按音频指纹查找内容相同的已有任务，找到时跳过后续阶段
 
 class VideoProcessResponse(BaseModel):
     success: bool
+    job_id: Optional[str] = None
     files: Optional[List[str]] = None
     session_folder: Optional[str] = None
     video_title: Optional[str] = None
+    chunk_manifests: Optional[List[str]] = None
+    transcripts: Optional[List[str]] = None
+    cached_stages: Optional[List[str]] = None  # 直接复用缓存结果的阶段
+    silence_removed_seconds: Optional[float] = None
+    selected_formats: Optional[List[dict]] = None  # 每个文件实际下载的源格式
+    profile: Optional[str] = None  # 性能分析结果路径（仅启用性能分析时）
+    peaks: Optional[List[str]] = None  # 波形峰值文件路径（仅启用波形时）
+    duplicate_of: Optional[str] = None  # 内容相同的已有任务ID（仅启用去重且找到时）
+    duplicate: Optional[dict] = None  # 已有任务的标题、会话文件夹、文件及匹配程度
     error: Optional[str] = None
 
+class SubscriptionSyncRequest(BaseModel):
+    url: Optional[str] = None  # 播放列表/频道/收藏夹链接，为空时同步全部已登记的订阅
+    download_dir: Optional[str] = None
+    max_items: Optional[int] = None  # 本次最多处理的新条目数，其余留到下次同步
+    audio_profile: Optional[str] = "standard"
+    trim_silence: Optional[bool] = False
+
 # API路由
 @app.get("/")
 async def root():
@@ -53,16 +138,189 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/api/startup")
+async def startup_report():
+    """启动耗时报告"""
+    return warmup.get_report()
+
+def _existing_dir(download_dir: str) -> str:
+    """下载目录必须已存在，否则返回 404"""
+    if not os.path.isdir(download_dir):
+        raise HTTPException(status_code=404, detail=f"下载目录不存在: {download_dir}")
+    return download_dir
+
+def _library_for(download_dir: Optional[str]):
+    """读取类接口使用的资料库；只接受已存在的下载目录，不会在任意路径下创建数据库"""
+    return get_library(_existing_dir(download_dir)) if download_dir else process_service.library
+
+def _service_for(download_dir: Optional[str]) -> ProcessService:
+    """读取类接口使用的处理服务；只接受已存在的下载目录"""
+    return ProcessService(_existing_dir(download_dir)) if download_dir else process_service
+
+@app.get("/api/library")
+def search_library(
+    q: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    download_dir: Optional[str] = None
+):
+    """
+    资料库搜索接口：按标题关键词分页查询已完成的任务
+    """
+    return _library_for(download_dir).search(q, page, page_size)
+
+@app.api_route("/api/files/{job_id}/{index}", methods=["GET", "HEAD"])
+def get_job_file(job_id: str, index: int, request: Request, download_dir: Optional[str] = None):
+    """
+    文件下载接口：按任务ID和文件序号（从0开始）返回输出文件，支持 Range 和 ETag
+    """
+    library = _library_for(download_dir)
+    job = library.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    if not 0 <= index < len(job["files"]):
+        raise HTTPException(status_code=404, detail=f"文件序号超出范围: {index}")
+
+    path = job["files"][index]
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="文件已被清理")
+    return serve_file(path, request.headers, request.method)
+
+@app.get("/api/jobs")
+async def list_running_jobs():
+    """运行中的任务（任务ID、已运行时间、剩余期限）"""
+    return job_control.list_running()
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    取消运行中的任务：中断下载、终止 ffmpeg，并清理未完成的文件
+    """
+    if not job_control.cancel_job(job_id):
+        raise HTTPException(status_code=404, detail=f"任务不在运行中: {job_id}")
+    return {"success": True, "job_id": job_id}
+
+@app.get("/api/jobs/{job_id}/profile")
+def get_job_profile(job_id: str, request: Request, format: str = "text",
+                    download_dir: Optional[str] = None):
+    """
+    性能分析结果接口：format=text 返回按累计耗时排序的文本报告，
+    format=pstats 返回 pstats 文件（可用 snakeviz 等工具查看）
+    """
+    if format not in ("text", "pstats"):
+        raise HTTPException(status_code=400, detail=f"不支持的格式: {format}（可选: text, pstats）")
+
+    library = _library_for(download_dir)
+    # 成功的任务保存在会话文件夹中；失败、取消和超时的任务保存在下载根目录
+    job = library.get(job_id)
+    folders = [job["session_folder"]] if job else []
+    folders.append(library.root_dir)
+    path = find_profile(folders, job_id, report=format == "text")
+    if not path:
+        raise HTTPException(status_code=404, detail="该任务没有性能分析结果（处理时需设置 profile=true）")
+    if format == "text":
+        with open(path, 'r', encoding='utf-8') as f:
+            return PlainTextResponse(f.read())
+    return serve_file(path, request.headers, request.method)
+
+@app.api_route("/api/jobs/{job_id}/peaks/{index}", methods=["GET", "HEAD"])
+def get_job_peaks(job_id: str, index: int, request: Request, format: str = "json",
+                  width: int = Query(DEFAULT_JSON_WIDTH, ge=1), download_dir: Optional[str] = None):
+    """
+    波形峰值接口：format=json 返回 audiowaveform 兼容的 JSON（按 width 选择分辨率），
+    format=binary 返回包含全部分辨率的二进制峰值文件（支持 Range 和 ETag）；
+    处理时未生成峰值的任务在首次请求时生成
+    """
+    if format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail=f"不支持的格式: {format}（可选: json, binary）")
+
+    service = _service_for(download_dir)
+    job = service.library.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    if not 0 <= index < len(job["files"]):
+        raise HTTPException(status_code=404, detail=f"文件序号超出范围: {index}")
+
+    audio_path = job["files"][index]
+    path = peaks_path_for(audio_path)
+    if not os.path.isfile(path):
+        if not os.path.isfile(audio_path):
+            raise HTTPException(status_code=404, detail="文件已被清理")
+        service.storage.acquire(job["session_folder"])
+        try:
+            generate_peaks(audio_path, path)
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=f"波形生成失败: {e}")
+        finally:
+            service.storage.release(job["session_folder"])
+
+    if format == "binary":
+        return serve_file(path, request.headers, request.method)
+    try:
+        return peaks_to_json(read_peaks(path), width)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/jobs/{job_id}/archive")
+def get_job_archive(job_id: str, download_dir: Optional[str] = None):
+    """
+    打包导出接口：把任务的会话文件夹边打包边发送为 ZIP（不压缩），适合多P批量导出
+    """
+    service = _service_for(download_dir)
+    job = service.library.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+
+    folder = job["session_folder"]
+
+    def _stream():
+        # 导出期间禁止后台清理该文件夹
+        service.storage.acquire(folder)
+        try:
+            yield from iter_folder_zip(folder)
+        finally:
+            service.storage.release(folder)
+
+    filename = urllib.parse.quote(f"{sanitize_filename(job['title'])}.zip")
+    return StreamingResponse(
+        _stream(),
+        media_type="application/zip",
+        headers={"content-disposition": f"attachment; filename=\"{job_id}.zip\"; filename*=utf-8''{filename}"}
+    )
+
 @app.post("/api/process/video", response_model=VideoProcessResponse)
-async def process_video(request: VideoProcessRequest):
+def process_video(request: VideoProcessRequest):
     """
     视频下载接口：接收视频 URL，调用服务层进行下载
+
+    处理过程是阻塞的，定义为同步接口由线程池执行，处理期间其他接口（如取消任务）仍可响应
     """
     print(f"收到视频处理请求: {request.url}")
     
     if not request.url or len(request.url.strip()) < 10:
         print("URL验证失败")
         raise HTTPException(status_code=400, detail="Invalid URL")
+    if is_collection_url(request.url):
+        raise HTTPException(status_code=400, detail="播放列表/频道链接请使用 /api/subscriptions/sync")
+
+    if request.chunk_seconds is not None and request.chunk_seconds <= 0:
+        raise HTTPException(status_code=400, detail="chunk_seconds 必须大于 0")
+    if request.chunk_mode not in CHUNK_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的分段模式: {request.chunk_mode}")
+    if request.transcribe_engine and request.transcribe_engine not in TRANSCRIBE_ENGINES:
+        raise HTTPException(status_code=400, detail=f"不支持的转写引擎: {request.transcribe_engine}")
+    if request.audio_profile not in AUDIO_PROFILES:
+        raise HTTPException(status_code=400, detail=f"不支持的音频配置: {request.audio_profile}")
+    if request.start is not None and request.start < 0:
+        raise HTTPException(status_code=400, detail="start 不能小于 0")
+    if request.end is not None and request.end <= (request.start or 0):
+        raise HTTPException(status_code=400, detail="end 必须大于 start")
+    if request.timeout_seconds is not None and request.timeout_seconds <= 0:
+        raise HTTPException(status_code=400, detail="timeout_seconds 必须大于 0")
+    if request.callback_url:
+        callback = urllib.parse.urlparse(request.callback_url)
+        if callback.scheme not in ("http", "https") or not callback.netloc:
+            raise HTTPException(status_code=400, detail="callback_url 必须是 http(s) 地址")
     
     try:
         print("开始处理视频...")
@@ -85,11 +343,36 @@ async def process_video(request: VideoProcessRequest):
         else:
             print("使用默认下载目录")
             service = process_service
-            
-        result = service.process_video(
-            url=request.url, 
-            page_number=request.page_number
-        )
+
+        options = {
+            "page_number": request.page_number,
+            "chunk_seconds": request.chunk_seconds,
+            "chunk_mode": request.chunk_mode,
+            "transcribe_engine": request.transcribe_engine,
+            "transcribe_workers": request.transcribe_workers,
+            "audio_profile": request.audio_profile,
+            "trim_silence": bool(request.trim_silence),
+            "start": request.start,
+            "end": request.end,
+            "timeout_seconds": request.timeout_seconds,
+            "profile": bool(request.profile),
+            "waveform": bool(request.waveform),
+            "dedup": bool(request.dedup),
+        }
+
+        if request.callback_url:
+            # 异步模式：排队后立即返回，结果通过回调送达（事件中带有 request_id）
+            request_id = uuid.uuid4().hex
+            background_jobs.submit(_process_with_callback, service, request.url, options,
+                                   request.callback_url, request_id)
+            print(f"任务已排队: request_id={request_id}，完成后回调 {request.callback_url}")
+            return JSONResponse(status_code=202, content={
+                "accepted": True,
+                "request_id": request_id,
+                "callback_url": request.callback_url,
+            })
+
+        result = service.process_video(url=request.url, **options)
         print(f"处理结果: {result}")
         
         if result.get("success"):
@@ -97,7 +380,15 @@ async def process_video(request: VideoProcessRequest):
         else:
             error_msg = result.get("error", "Unknown error")
             print(f"处理失败: {error_msg}")
-            raise HTTPException(status_code=500, detail=error_msg)
+            # 按错误类别返回状态码（如 429 限流、451 地区限制、404 视频不可用），
+            # detail 中带上类别和是否值得重试，客户端可据此决定是否稍后重新提交
+            category = result.get("error_category", UNKNOWN)
+            raise HTTPException(status_code=http_status(category), detail={
+                "error": error_msg,
+                "category": category,
+                "retryable": result.get("retryable", False),
+                "attempts": result.get("attempts"),
+            })
     
     except HTTPException:
         raise
@@ -105,5 +396,51 @@ async def process_video(request: VideoProcessRequest):
         print(f"处理异常: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _process_with_callback(service: ProcessService, url: str, options: dict,
+                           callback_url: str, request_id: str):
+    """后台执行任务，完成后登记回调事件"""
+    try:
+        result = service.process_video(url=url, **options)
+    except Exception as e:
+        result = {"success": False, **DownloadFailed.from_exception(e).to_dict()}
+
+    event_type = "job.succeeded" if result.get("success") else "job.failed"
+    try:
+        get_webhook_dispatcher().enqueue(callback_url, event_type,
+                                         {"request_id": request_id, "url": url, **result})
+    except RuntimeError as e:
+        print(f"⚠️ 无法登记回调: {e}")
+
+@app.get("/api/subscriptions")
+def list_subscriptions(download_dir: Optional[str] = None):
+    """已登记的订阅及上次同步时间"""
+    return SubscriptionSync(_service_for(download_dir)).list_subscriptions()
+
+@app.post("/api/subscriptions/sync")
+def sync_subscriptions(request: SubscriptionSyncRequest):
+    """
+    订阅同步接口：列出播放列表/频道中的条目，只下载下载存档中没有的新条目
+    """
+    if request.url and not is_collection_url(request.url):
+        raise HTTPException(status_code=400, detail="不是播放列表、频道或收藏夹链接")
+    if request.max_items is not None and request.max_items <= 0:
+        raise HTTPException(status_code=400, detail="max_items 必须大于 0")
+    if request.audio_profile not in AUDIO_PROFILES:
+        raise HTTPException(status_code=400, detail=f"不支持的音频配置: {request.audio_profile}")
+
+    service = ProcessService(request.download_dir) if request.download_dir else process_service
+    sync = SubscriptionSync(service)
+    options = {"audio_profile": request.audio_profile, "trim_silence": bool(request.trim_silence)}
+
+    if not request.url:
+        return {"success": True, "subscriptions": sync.sync_all(request.max_items, **options)}
+
+    result = sync.sync(request.url, request.max_items, **options)
+    if not result.get("success"):
+        raise HTTPException(status_code=500, detail=result.get("error", "Unknown error"))
+    return result
+
 if __name__ == "__main__":
+    # 打包后的可执行文件中转写进程池需要 freeze_support
+    multiprocessing.freeze_support()
     uvicorn.run(app, host="0.0.0.0", port=8001)
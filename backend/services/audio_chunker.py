@@ -0,0 +1,233 @@
+"""
+视记 - 音频分段模块
+
+功能：
+- 将下载得到的整段音频切分为多个分段，供后续转写等步骤并行处理
+- 固定时长模式：ffmpeg segment 封装器一次完成切分，直接复制音频流不重新编码
+- 静音检测模式：先用 silencedetect 找到静音位置，再在静音处切分（同样不重新编码）
+- 生成 manifest.json，记录每个分段的文件名和在原音频中的起止时间
+"""
+
+import csv
+import json
+import os
+import re
+import shutil
+import uuid
+from typing import List
+
+from .job_control import run_process
+
+
+# 分段文件夹名（位于会话文件夹下）
+CHUNKS_DIRNAME = "chunks"
+MANIFEST_FILENAME = "manifest.json"
+
+SUPPORTED_MODES = ('fixed', 'silence')
+
+# 静音检测参数：低于 -35dB 且持续 0.5 秒以上视为静音
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_DURATION = 0.5
+
+_SILENCE_END_RE = re.compile(r'silence_end:\s*([\d.]+)\s*\|\s*silence_duration:\s*([\d.]+)')
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):([\d.]+)')
+
+
+class AudioChunker:
+    """
+    音频分段器
+
+    按固定时长或静音位置把音频切分为分段，输出到
+    <会话文件夹>/chunks/<音频文件名>/ 下，并写入 manifest.json
+    """
+
+    def __init__(self, chunk_seconds: int = 600, mode: str = 'fixed', ffmpeg_path: str = None):
+        """
+        Args:
+            chunk_seconds (int): 目标分段时长（秒）
+            mode (str): 'fixed' 固定时长切分，'silence' 在静音处切分
+            ffmpeg_path (str, optional): ffmpeg 可执行文件路径，默认从 PATH 查找
+        """
+        if mode not in SUPPORTED_MODES:
+            raise ValueError(f"不支持的分段模式: {mode}（可选: {', '.join(SUPPORTED_MODES)}）")
+        if chunk_seconds <= 0:
+            raise ValueError("分段时长必须大于 0")
+
+        self.chunk_seconds = chunk_seconds
+        self.mode = mode
+        self.ffmpeg_path = ffmpeg_path or shutil.which('ffmpeg') or 'ffmpeg'
+
+    def split(self, audio_path: str, output_root: str = None) -> dict:
+        """
+        切分音频并生成 manifest
+
+        Args:
+            audio_path (str): 音频文件路径
+            output_root (str, optional): 分段输出根目录，默认 <音频所在目录>/chunks
+
+        Returns:
+            dict: manifest 内容，chunks 中的 path 为分段文件的绝对路径
+        """
+        if output_root is None:
+            output_root = os.path.join(os.path.dirname(audio_path), CHUNKS_DIRNAME)
+
+        stem, ext = os.path.splitext(os.path.basename(audio_path))
+        final_dir = os.path.join(output_root, stem)
+
+        # 先写到临时目录，全部完成后再替换，避免留下不完整的分段
+        work_dir = os.path.join(output_root, f".{stem}.{uuid.uuid4().hex[:8]}.tmp")
+        os.makedirs(work_dir, exist_ok=True)
+
+        try:
+            if self.mode == 'silence':
+                split_points, duration = self._detect_split_points(audio_path)
+                segment_args = ['-segment_times', ','.join(f'{t:.3f}' for t in split_points)] \
+                    if split_points else ['-segment_time', str(duration + 1)]
+            else:
+                segment_args = ['-segment_time', str(self.chunk_seconds)]
+
+            list_path = os.path.join(work_dir, 'segments.csv')
+            cmd = [
+                self.ffmpeg_path, '-hide_banner', '-nostdin', '-y',
+                '-i', audio_path,
+                '-map', '0:a', '-c', 'copy',
+                '-f', 'segment', *segment_args,
+                '-reset_timestamps', '1',
+                '-segment_list', list_path, '-segment_list_type', 'csv',
+                os.path.join(work_dir, f'chunk_%04d{ext}'),
+            ]
+            print(f"✂️ 开始分段: {os.path.basename(audio_path)}（模式: {self.mode}）")
+            _run_ffmpeg(cmd)
+
+            chunks = _read_segment_list(list_path)
+            os.remove(list_path)
+
+            manifest = {
+                'source': os.path.basename(audio_path),
+                'mode': self.mode,
+                'chunk_seconds': self.chunk_seconds,
+                'chunks': chunks,
+            }
+            with open(os.path.join(work_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+            if os.path.exists(final_dir):
+                shutil.rmtree(final_dir)
+            os.replace(work_dir, final_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        print(f"✅ 分段完成: 共 {len(chunks)} 段")
+        return load_manifest(os.path.join(final_dir, MANIFEST_FILENAME))
+
+    def _detect_split_points(self, audio_path: str):
+        """
+        使用 silencedetect 查找静音位置，选出接近目标时长的切分点
+
+        Returns:
+            tuple: (切分时间点列表, 音频总时长)
+        """
+        cmd = [
+            self.ffmpeg_path, '-hide_banner', '-nostdin',
+            '-i', audio_path,
+            '-map', '0:a',
+            '-af', f'silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_DURATION}',
+            '-f', 'null', '-',
+        ]
+        output = _run_ffmpeg(cmd)
+
+        duration = 0.0
+        match = _DURATION_RE.search(output)
+        if match:
+            hours, minutes, seconds = match.groups()
+            duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+        # 取每段静音的中点作为候选切分点
+        candidates = []
+        for end, length in _SILENCE_END_RE.findall(output):
+            candidates.append(float(end) - float(length) / 2)
+
+        return choose_split_points(candidates, duration, self.chunk_seconds), duration
+
+
+def choose_split_points(candidates: List[float], duration: float, target: float) -> List[float]:
+    """
+    从候选静音点中选出切分点
+
+    每次在 [上一切分点 + 0.5 × 目标时长, 上一切分点 + 1.5 × 目标时长] 范围内
+    选择最接近 "上一切分点 + 目标时长" 的静音点；范围内没有静音时按目标时长硬切
+
+    Args:
+        candidates (list): 候选切分时间点（秒）
+        duration (float): 音频总时长（秒），未知时为 0
+        target (float): 目标分段时长（秒）
+
+    Returns:
+        list: 升序排列的切分时间点
+    """
+    candidates = sorted(candidates)
+    if not duration and candidates:
+        duration = candidates[-1]
+
+    points = []
+    last = 0.0
+    while duration - last > target * 1.5:
+        ideal = last + target
+        window = [c for c in candidates if last + target * 0.5 <= c <= last + target * 1.5]
+        point = min(window, key=lambda c: abs(c - ideal)) if window else ideal
+        points.append(point)
+        last = point
+    return points
+
+
+def load_manifest(manifest_path: str) -> dict:
+    """
+    读取分段 manifest，并把分段文件名解析为绝对路径
+
+    Args:
+        manifest_path (str): manifest.json 路径
+
+    Returns:
+        dict: manifest 内容
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    for chunk in manifest.get('chunks', []):
+        chunk['path'] = os.path.join(base_dir, chunk['file'])
+    manifest['manifest_path'] = manifest_path
+    return manifest
+
+
+def _read_segment_list(list_path: str) -> List[dict]:
+    """解析 segment 封装器输出的 csv 列表（文件名, 开始时间, 结束时间）"""
+    chunks = []
+    with open(list_path, 'r', encoding='utf-8', newline='') as f:
+        for index, row in enumerate(csv.reader(f)):
+            if len(row) < 3:
+                continue
+            start, end = float(row[1]), float(row[2])
+            chunks.append({
+                'index': index,
+                'file': row[0],
+                'start': round(start, 3),
+                'end': round(end, 3),
+                'duration': round(end - start, 3),
+            })
+    return chunks
+
+
+def _run_ffmpeg(cmd: List[str]) -> str:
+    """运行 ffmpeg，返回 stderr 输出；失败时抛出 RuntimeError"""
+    try:
+        # 登记到当前任务，任务取消或超时时 ffmpeg 会被终止
+        result = run_process(cmd, text=True, errors='replace')
+    except FileNotFoundError:
+        raise RuntimeError("未找到 FFmpeg，请先安装 FFmpeg")
+
+    if result.returncode != 0:
+        tail = '\n'.join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"FFmpeg 执行失败: {tail}")
+    return result.stderr
+
@@ -16,9 +16,60 @@
 """
 
 import os
-from typing import Optional
+import shutil
+import uuid
+from typing import List, Optional
 
-import yt_dlp
+from .format_policy import AudioFormatPolicy
+from .errors import UNSUPPORTED_URL, DownloadFailed
+from .job_control import JobCancelled, check_current
+
+# yt_dlp 及其数百个提取器的导入耗时较长，放到首次使用时再导入（见 services.warmup），
+# 保证后端进程启动后尽快开始监听端口
+
+
+# 音频输出配置
+# - standard: 保持原声道和采样率，192 kbps MP3
+# - speech: 供语音识别使用，在提取音频的同一次 ffmpeg 调用中完成
+#   单声道下混、16 kHz 重采样和响度归一化，文件体积约为 standard 的 1/4
+AUDIO_PROFILES = {
+    'standard': {
+        'codec': 'mp3',
+        'quality': '192',
+        'ffmpeg_args': [],
+        'filters': [],
+    },
+    'speech': {
+        'codec': 'mp3',
+        'quality': '48',
+        'ffmpeg_args': ['-ac', '1', '-ar', '16000'],
+        'filters': ['loudnorm=I=-16:TP=-1.5:LRA=11'],
+    },
+}
+
+DEFAULT_AUDIO_PROFILE = 'standard'
+
+# 静音裁剪滤镜：去掉开头的静音，并把中间和结尾超过 2 秒的静音压缩为 0.5 秒
+# 放在滤镜链最前面，后续的响度归一化只处理保留下来的部分
+SILENCE_TRIM_FILTER = (
+    'silenceremove='
+    'start_periods=1:start_threshold=-50dB:start_silence=0.5:'
+    'stop_periods=-1:stop_threshold=-50dB:stop_duration=2:stop_silence=0.5'
+)
+
+
+# 只加载支持平台所需的 yt-dlp 提取器（与 _is_supported_url 对应），
+# 避免每个 YoutubeDL 实例都注册并逐个匹配全部上千个提取器
+ALLOWED_EXTRACTORS = [
+    'youtube',
+    'youtube:tab',
+    'youtubeytbe',
+    'bilibili',
+    'bilibilibangumi',
+    'bilibilibangumiseason',
+    'bilibilicheese',
+    'bilibilicheeseseason',
+]
 
 
 class AudioDownloader:
@@ -29,7 +80,8 @@ class AudioDownloader:
     提供分P选择、URL验证、错误处理等功能
     """
 
-    def __init__(self, session_folder: str = None):
+    def __init__(self, session_folder: str = None, profile: str = DEFAULT_AUDIO_PROFILE,
+                 trim_silence: bool = False):
         """
         初始化视记音频下载器
 
@@ -38,7 +90,29 @@ class AudioDownloader:
 
         Args:
             session_folder (str, optional): 会话文件夹路径
+            profile (str): 音频输出配置，见 AUDIO_PROFILES
+            trim_silence (bool): 是否在提取音频时裁剪静音
         """
+        if profile not in AUDIO_PROFILES:
+            raise ValueError(f"不支持的音频配置: {profile}（可选: {', '.join(AUDIO_PROFILES)}）")
+        self.profile = profile
+        self.trim_silence = trim_silence
+        audio_profile = AUDIO_PROFILES[profile]
+
+        # 所有滤镜合并为一条 -af 滤镜链，在提取音频的同一次 ffmpeg 调用中完成
+        filters = ([SILENCE_TRIM_FILTER] if trim_silence else []) + audio_profile['filters']
+        ffmpeg_args = list(audio_profile['ffmpeg_args'])
+        if filters:
+            ffmpeg_args += ['-af', ','.join(filters)]
+
+        # 最近一次下载中被裁剪掉的静音总秒数
+        self.silence_removed_seconds = 0.0
+        # 最近一次下载中每个输出文件所选的源格式
+        self.selected_formats: List[dict] = []
+
+        # 格式选择：满足输出码率的最小纯音频流，避免下载高码率流或整段视频
+        self.format_policy = AudioFormatPolicy(int(audio_profile['quality']))
+
         # 设置输出目录
         if session_folder:
             self.output_dir = session_folder
@@ -53,27 +127,44 @@ class AudioDownloader:
 
         self.ydl_opts = {
             # 输出目录：保存到指定文件夹
-            'outtmpl': os.path.join(self.output_dir, '%(title)s.%(ext)s'),
+            'paths': {'home': self.output_dir},
+            'outtmpl': '%(title)s.%(ext)s',
 
-            # 选择最佳音频质量进行下载
-            'format': 'bestaudio/best',
+            # 选择满足目标音质的最小音频流进行下载
+            'format': self.format_policy,
 
             # 后处理器配置：提取音频并转换为 MP3
             'postprocessors': [{
                 'key': 'FFmpegExtractAudio',  # 使用 FFmpeg 提取音频
-                'preferredcodec': 'mp3',  # 音频编码格式为 MP3
-                'preferredquality': '192',  # 音频质量 192 kbps
+                'preferredcodec': audio_profile['codec'],  # 音频编码格式
+                'preferredquality': audio_profile['quality'],  # 音频码率 (kbps)
             }],
+
+            # 附加到提取音频这次 ffmpeg 调用的输出参数（下混、重采样、静音裁剪、响度归一化）
+            'postprocessor_args': {
+                'extractaudio+ffmpeg_o': ffmpeg_args,
+            },
             
+            # 只注册支持平台的提取器
+            'allowed_extractors': ALLOWED_EXTRACTORS,
+
             # 添加超时设置
             'socket_timeout': 30,
             'retries': 3,
+
+            # 每个下载数据块和每个后处理步骤都检查任务是否已取消或超时
+            'progress_hooks': [check_current],
+            'postprocessor_hooks': [check_current],
         }
 
-    def download_audio(self, url: str, page_number: Optional[int] = None) -> bool:
+    def download_audio(self, url: str, page_number: Optional[int] = None,
+                       start: Optional[float] = None, end: Optional[float] = None) -> List[str]:
         """
         下载视频并提取为 MP3 音频文件
 
+        下载和转码都在会话文件夹下的临时目录中进行，完成后由 yt-dlp
+        原子重命名到会话文件夹，未完成的 .part 文件不会出现在输出目录中
+
         Args:
             url (str): 视频 URL 地址
                 - B站: https://www.bilibili.com/video/...
@@ -81,9 +172,15 @@ class AudioDownloader:
             page_number (int, optional): 分P编号（从1开始）
                 - None: 下载所有分P
                 - 数字: 下载指定分P
+            start (float, optional): 片段开始时间（秒），与 end 一起使用时只下载该时间段
+            end (float, optional): 片段结束时间（秒），None 表示到结尾
 
         Returns:
-            bool: 下载成功返回 True，失败返回 False
+            List[str]: 本次生成的文件路径列表
+
+        Raises:
+            DownloadFailed: 下载或转码失败，带有错误类别（网络、地区限制、缺少 FFmpeg 等）
+            JobCancelled: 任务被取消或超时
         """
         # 验证 URL 是否支持
         if not self._is_supported_url(url):
@@ -91,7 +188,7 @@ class AudioDownloader:
             print("💡 目前只支持：")
             print("   - B站: https://www.bilibili.com/video/...")
             print("   - YouTube: https://www.youtube.com/watch?v=...")
-            return False
+            raise DownloadFailed(f"不支持的平台: {url}", UNSUPPORTED_URL)
 
         # 复制配置选项
         ydl_opts = self.ydl_opts.copy()
@@ -100,6 +197,23 @@ class AudioDownloader:
         if page_number is not None:
             ydl_opts['playlist_items'] = f'{page_number}:{page_number}'
 
+        # 如果指定了时间段，只下载并转码该时间段对应的分片
+        if start is not None or end is not None:
+            from yt_dlp.utils import download_range_func
+            ydl_opts['download_ranges'] = download_range_func(
+                None, [(start or 0, end if end is not None else float('inf'))]
+            )
+            # 文件名带上时间段，避免与完整音频或其他片段重名
+            ydl_opts['outtmpl'] = f'%(title)s [{_format_range(start, end)}].%(ext)s'
+
+        # 每个任务使用独立的临时目录（与输出目录同一文件系统，保证重命名是原子的）
+        partial_dir = os.path.join(self.output_dir, f'.partial-{uuid.uuid4().hex[:12]}')
+        ydl_opts['paths'] = {**self.ydl_opts['paths'], 'temp': partial_dir}
+        import yt_dlp
+        from .output_recorder import OutputRecorderPP
+
+        recorder = OutputRecorderPP(measure_duration=self.trim_silence, start=start, end=end)
+
         try:
             # 清理URL，移除不必要的参数
             clean_url = self._clean_url(url)
@@ -108,6 +222,7 @@ class AudioDownloader:
 
             # 创建 yt-dlp 下载器实例
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                ydl.add_post_processor(recorder, when='after_move')
                 print("🔍 正在提取视频信息...")
                 # 先获取视频信息，不直接下载
                 info = ydl.extract_info(clean_url, download=False)
@@ -117,13 +232,30 @@ class AudioDownloader:
                 # 执行下载
                 ydl.download([clean_url])
 
+                if self.trim_silence:
+                    self.silence_removed_seconds = recorder.removed_seconds()
+                    print(f"✂️ 已裁剪静音: {self.silence_removed_seconds:.1f} 秒")
+
+                self.selected_formats = list(recorder.formats)
+                for fmt in self.selected_formats:
+                    print(f"🎚️ 所选格式: {fmt['format_id']} ({fmt['acodec']}, {fmt['abr']} kbps)")
+
                 print("✅ 音频下载完成！")
-                return True
+                return list(recorder.files)
+
+        except JobCancelled:
+            raise
 
         except Exception as e:
-            print(f"❌ 下载失败: {str(e)}")
-            print("💡 请确保网络连接正常、已安装FFmpeg、视频链接有效")
-            return False
+            # 任务取消时 ffmpeg 被终止，yt-dlp 会把它报告为后处理失败
+            check_current()
+            error = DownloadFailed.from_exception(e)
+            print(f"❌ 下载失败（{error.category}）: {error}")
+            raise error from e
+
+        finally:
+            # 清理临时目录中残留的 .part / 中间文件
+            shutil.rmtree(partial_dir, ignore_errors=True)
 
     def get_video_title(self, url: str) -> Optional[str]:
         """
@@ -135,17 +267,57 @@ class AudioDownloader:
         Returns:
             Optional[str]: 视频标题，获取失败返回 None
         """
+        info = self.get_video_info(url)
+        if info is None:
+            return None
+        return info.get('title', '未知标题')
+
+    def get_video_info(self, url: str) -> Optional[dict]:
+        """
+        获取视频信息（标题、时长、文件大小等），不下载
+
+        Args:
+            url (str): 视频 URL 地址
+
+        Returns:
+            Optional[dict]: yt-dlp 提取的视频信息，获取失败返回 None
+        """
+        try:
+            return self.fetch_video_info(url)
+        except DownloadFailed:
+            return None
+
+    def fetch_video_info(self, url: str) -> dict:
+        """
+        获取视频信息，失败时抛出带错误类别的异常（供重试策略判断）
+
+        Args:
+            url (str): 视频 URL 地址
+
+        Returns:
+            dict: yt-dlp 提取的视频信息
+
+        Raises:
+            DownloadFailed: 获取失败
+        """
         try:
             # 清理URL，移除不必要的参数
             clean_url = self._clean_url(url)
             print(f"清理后的URL: {clean_url}")
-            
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                info = ydl.extract_info(clean_url, download=False)
-                return info.get('title', '未知标题')
+
+            import yt_dlp
+
+            with yt_dlp.YoutubeDL({
+                'quiet': True,
+                'format': self.ydl_opts['format'],
+                'allowed_extractors': ALLOWED_EXTRACTORS,
+                'socket_timeout': self.ydl_opts['socket_timeout'],
+            }) as ydl:
+                return ydl.extract_info(clean_url, download=False)
         except Exception as e:
-            print(f"❌ 获取视频标题失败: {str(e)}")
-            return None
+            error = DownloadFailed.from_exception(e)
+            print(f"❌ 获取视频信息失败（{error.category}）: {error}")
+            raise error from e
     
     def _clean_url(self, url: str) -> str:
         """
@@ -237,3 +409,11 @@ class AudioDownloader:
                 return True
         
         return False
+
+
+
+def _format_range(start: Optional[float], end: Optional[float]) -> str:
+    """把时间段格式化为文件名片段，如 600-1500s、600-end"""
+    start_label = f'{start or 0:g}'
+    end_label = f'{end:g}s' if end is not None else 'end'
+    return f'{start_label}-{end_label}'
@@ -0,0 +1,268 @@
+"""
+视记 - 错误分类与重试模块
+
+功能：
+- 把 yt-dlp / ffmpeg / 系统异常归类为明确的错误类别（网络、限流、地区限制、视频不可用、缺少 FFmpeg 等）
+- 每个类别标明是否值得重试，以及对应的 HTTP 状态码，通过接口返回给调用方
+- RetryPolicy 只对可重试的类别按指数退避 + 随机抖动重试，永久性错误立即返回
+"""
+
+import random
+import re
+import socket
+import time
+from typing import Callable, List, TypeVar
+
+from .job_control import JobCancelled, current_job
+
+
+T = TypeVar('T')
+
+# 错误类别
+NETWORK = 'network'                  # 连接失败、超时、服务端 5xx
+RATE_LIMITED = 'rate_limited'        # HTTP 429 / 请求过于频繁
+GEO_BLOCKED = 'geo_blocked'          # 地区限制
+AUTH_REQUIRED = 'auth_required'      # 需要登录、会员或付费
+FORBIDDEN = 'forbidden'              # HTTP 403：地区、签名或权限校验未通过
+UNAVAILABLE = 'unavailable'          # 视频不存在、已删除或私密
+UNSUPPORTED_URL = 'unsupported_url'  # 不支持的平台或链接
+FFMPEG_MISSING = 'ffmpeg_missing'    # 未安装 FFmpeg
+POSTPROCESS_FAILED = 'postprocess_failed'  # 音频转码失败
+DISK_FULL = 'disk_full'              # 磁盘空间或目录配额不足
+TIMEOUT = 'timeout'                  # 超过任务期限
+CANCELLED = 'cancelled'              # 任务被取消
+UNKNOWN = 'unknown'
+
+# 类别 -> (是否可重试, HTTP 状态码, 提示)
+ERROR_CATEGORIES = {
+    NETWORK: (True, 502, "网络连接失败，请检查网络后重试"),
+    RATE_LIMITED: (True, 429, "请求过于频繁，已被视频平台限流，请稍后重试"),
+    GEO_BLOCKED: (False, 451, "该视频在当前地区不可用"),
+    AUTH_REQUIRED: (False, 403, "该视频需要登录、会员或付费才能观看"),
+    FORBIDDEN: (False, 403, "视频平台拒绝访问，可能是地区限制、链接签名失效或需要登录"),
+    UNAVAILABLE: (False, 404, "视频不存在、已删除或为私密视频"),
+    UNSUPPORTED_URL: (False, 400, "不支持的平台或链接，目前只支持 B站 和 YouTube"),
+    FFMPEG_MISSING: (False, 500, "未找到 FFmpeg，请先安装 FFmpeg（python install_ffmpeg.py）"),
+    POSTPROCESS_FAILED: (False, 500, "音频转码失败"),
+    DISK_FULL: (False, 507, "磁盘空间或目录配额不足"),
+    TIMEOUT: (False, 408, "任务超时"),
+    CANCELLED: (False, 409, "任务已取消"),
+    UNKNOWN: (False, 500, "未知错误"),
+}
+
+# 按错误信息匹配类别（按顺序，先匹配先生效）；用于 yt-dlp 只给出文字信息的情况
+_MESSAGE_PATTERNS = [
+    (FFMPEG_MISSING, r'ffmpeg.*not found|ffprobe.*not found|未找到 ?FFmpeg'),
+    (POSTPROCESS_FAILED, r'audio conversion failed|Conversion failed|FFmpeg 执行失败'),
+    (DISK_FULL, r'No space left on device|Disk quota exceeded|磁盘空间不足|配额'),
+    (RATE_LIMITED, r'HTTP Error 429|HTTP Error 412|Too Many Requests|rate.?limit|请求过于频繁'),
+    (GEO_BLOCKED, r'not available (?:in|from) your (?:country|location)|geo.?restrict|地区'),
+    (AUTH_REQUIRED, r'Sign in to confirm|login required|members[- ]only|Join this channel|'
+                    r'--cookies|大会员|会员专享|付费|需要登录'),
+    (UNAVAILABLE, r'Private video|Video unavailable|This video is unavailable|has been removed|'
+                  r'does not exist|HTTP Error 404|HTTP Error 410|视频不见了|'
+                  r'(?:视频|稿件|页面|内容)(?:已)?不存在|已失效'),
+    (UNSUPPORTED_URL, r'Unsupported URL|不支持的平台'),
+    (FORBIDDEN, r'HTTP Error 403|403 Forbidden'),
+    (NETWORK, r'timed? ?out|Connection (?:reset|refused|aborted)|Temporary failure in name resolution|'
+              r'Name or service not known|Unable to download (?:webpage|API page|JSON)|'
+              r'HTTP Error 5\d\d|IncompleteRead|EOF occurred|Remote end closed|'
+              r'Got error|giving up after'),
+]
+
+_ANSI_PATTERN = re.compile(r'\x1b\[[0-9;]*m')
+
+
+def is_retryable(category: str) -> bool:
+    return ERROR_CATEGORIES.get(category, ERROR_CATEGORIES[UNKNOWN])[0]
+
+
+def http_status(category: str) -> int:
+    return ERROR_CATEGORIES.get(category, ERROR_CATEGORIES[UNKNOWN])[1]
+
+
+def _exception_chain(exc: BaseException) -> List[BaseException]:
+    """展开 yt-dlp 的异常包装：DownloadError.exc_info、ExtractorError.cause、__cause__"""
+    chain = []
+    while exc is not None and exc not in chain and len(chain) < 10:
+        chain.append(exc)
+        exc_info = getattr(exc, 'exc_info', None)
+        inner = exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None
+        cause = getattr(exc, 'cause', None)
+        exc = (inner if isinstance(inner, BaseException) else None) \
+            or (cause if isinstance(cause, BaseException) else None) \
+            or exc.__cause__ or exc.__context__
+    return chain
+
+
+def classify_error(exc: BaseException) -> str:
+    """
+    判断异常所属的错误类别
+
+    Args:
+        exc (BaseException): 捕获到的异常
+
+    Returns:
+        str: 错误类别（见 ERROR_CATEGORIES）
+    """
+    chain = _exception_chain(exc)
+
+    try:
+        from yt_dlp.networking.exceptions import HTTPError, TransportError
+        from yt_dlp.utils import GeoRestrictedError, PostProcessingError, UnsupportedError
+    except ImportError:
+        HTTPError = TransportError = GeoRestrictedError = PostProcessingError = UnsupportedError = ()
+
+    for error in chain:
+        if isinstance(error, JobCancelled):
+            return TIMEOUT if error.timed_out else CANCELLED
+        if isinstance(error, DownloadFailed):
+            return error.category
+        if isinstance(error, GeoRestrictedError):
+            return GEO_BLOCKED
+        if isinstance(error, UnsupportedError):
+            return UNSUPPORTED_URL
+        if isinstance(error, HTTPError):
+            status = getattr(error, 'status', None)
+            # B站触发风控时返回 412
+            if status in (412, 429):
+                return RATE_LIMITED
+            if status in (404, 410):
+                return UNAVAILABLE
+            # 403 多为地区、签名或权限校验未通过，重试无济于事
+            if status == 403:
+                return FORBIDDEN
+            return NETWORK
+        if isinstance(error, (TransportError, socket.timeout, ConnectionError, TimeoutError)):
+            return NETWORK
+        if isinstance(error, OSError) and error.errno == 28:  # ENOSPC
+            return DISK_FULL
+
+    message = ' '.join(str(error) for error in chain)
+    for category, pattern in _MESSAGE_PATTERNS:
+        if re.search(pattern, message, re.IGNORECASE):
+            return category
+
+    if any(isinstance(error, PostProcessingError) for error in chain):
+        return POSTPROCESS_FAILED
+    return UNKNOWN
+
+
+def clean_message(exc: BaseException) -> str:
+    """去掉 yt-dlp 错误信息中的颜色码和 "ERROR:" 前缀"""
+    message = _ANSI_PATTERN.sub('', str(exc)).strip()
+    return re.sub(r'^ERROR:\s*', '', message) or exc.__class__.__name__
+
+
+class DownloadFailed(Exception):
+    """
+    带错误类别的下载失败
+    """
+
+    def __init__(self, message: str, category: str = UNKNOWN):
+        """
+        Args:
+            message (str): 错误信息
+            category (str): 错误类别
+        """
+        super().__init__(message)
+        self.category = category
+        self.attempts = 1
+
+    @property
+    def retryable(self) -> bool:
+        return is_retryable(self.category)
+
+    @classmethod
+    def from_exception(cls, exc: BaseException) -> 'DownloadFailed':
+        """根据捕获到的异常生成带类别的错误"""
+        if isinstance(exc, DownloadFailed):
+            return exc
+        category = classify_error(exc)
+        return cls(f"{ERROR_CATEGORIES[category][2]}: {clean_message(exc)}", category)
+
+    def to_dict(self) -> dict:
+        """
+        处理结果中的错误字段
+
+        Returns:
+            dict: {"error", "error_category", "retryable", "attempts"}
+        """
+        return {
+            "error": str(self),
+            "error_category": self.category,
+            "retryable": self.retryable,
+            "attempts": self.attempts,
+        }
+
+
+class RetryPolicy:
+    """
+    按错误类别重试：只重试网络错误和限流，等待时间按指数增长并加随机抖动，
+    避免多个任务在同一时刻重新请求同一站点
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 2.0,
+                 max_delay: float = 60.0, rate_limit_delay: float = 30.0):
+        """
+        Args:
+            max_attempts (int): 最多尝试次数（含第一次）
+            base_delay (float): 第一次重试前的基础等待时间（秒）
+            max_delay (float): 单次等待的上限（秒）
+            rate_limit_delay (float): 被限流时的最短等待基准（秒）
+        """
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_delay = rate_limit_delay
+
+    def delay(self, attempt: int, category: str) -> float:
+        """
+        第 attempt 次失败后的等待时间
+
+        网络错误使用完全抖动 [0, 上限]；限流使用一半固定 + 一半抖动，保证至少等待上限的一半
+        """
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if category == RATE_LIMITED:
+            cap = min(self.max_delay, max(cap, self.rate_limit_delay))
+            return cap / 2 + random.uniform(0, cap / 2)
+        return random.uniform(0, cap)
+
+    def run(self, func: Callable[[], T], description: str = "操作") -> T:
+        """
+        执行操作，失败时按错误类别决定是否重试
+
+        Args:
+            func (Callable): 要执行的操作，失败时抛出 DownloadFailed
+            description (str): 操作名称，用于日志
+
+        Returns:
+            操作的返回值
+
+        Raises:
+            DownloadFailed: 不可重试的错误，或重试次数用尽（attempts 记录实际尝试次数）
+            JobCancelled: 等待重试期间任务被取消
+        """
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except DownloadFailed as e:
+                e.attempts = attempt
+                if not e.retryable or attempt >= self.max_attempts:
+                    raise
+                wait = self.delay(attempt, e.category)
+                print(f"🔁 {description}失败（{e.category}，第 {attempt}/{self.max_attempts} 次），"
+                      f"{wait:.1f}s 后重试: {e}")
+                _sleep(wait)
+                attempt += 1
+
+
+def _sleep(seconds: float):
+    """等待重试；任务被取消或超时时立即结束等待"""
+    job = current_job()
+    if job is None:
+        time.sleep(seconds)
+        return
+    job.wait(seconds)
+    job.check()
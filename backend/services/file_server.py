@@ -0,0 +1,235 @@
+"""
+视记 - 文件传输模块
+
+功能：
+- 通过 HTTP 提供任务输出文件，客户端无需与服务端共享文件系统
+- 支持 Range 请求（拖动进度条、断点续传）、ETag / If-None-Match / If-Range 条件请求
+- 文件按块从磁盘读取直接发送，不在内存中缓存整个文件；
+  ASGI 服务器支持 zerocopysend 扩展时交给服务器用 sendfile 零拷贝发送
+- 把会话文件夹边打包边发送为 ZIP（仅存储不压缩），内存占用恒定，也不在磁盘上生成压缩包
+"""
+
+import os
+import re
+import zipfile
+from email.utils import formatdate
+from mimetypes import guess_type
+from typing import Iterator, List, Mapping, Optional, Tuple
+
+import anyio
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def make_etag(stat_result: os.stat_result) -> str:
+    """根据文件大小和修改时间生成强 ETag"""
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def parse_range(header: str, size: int) -> Tuple[int, int]:
+    """
+    解析单个字节范围
+
+    Args:
+        header (str): Range 请求头，如 "bytes=0-1023"、"bytes=1024-"、"bytes=-500"
+        size (int): 文件大小
+
+    Returns:
+        Tuple[int, int]: (起始, 结束) 闭区间
+
+    Raises:
+        ValueError: 范围格式错误或超出文件大小（应返回 416）
+    """
+    # 空文件没有可满足的字节范围
+    if size == 0:
+        raise ValueError(f"Range 超出文件大小: {header}")
+    match = _RANGE_PATTERN.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        raise ValueError(f"无效的 Range: {header}")
+
+    first, last = match.groups()
+    if not first:
+        # 后缀范围：最后 N 个字节
+        length = int(last)
+        if length == 0:
+            raise ValueError(f"无效的 Range: {header}")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Range 超出文件大小: {header}")
+    return start, end
+
+
+class RangeFileResponse(FileResponse):
+    """发送文件中的一个字节范围（完整文件即范围 0 ~ size-1）"""
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: str, stat_result: os.stat_result, start: int, end: int,
+                 status_code: int = 200, method: Optional[str] = None,
+                 headers: Optional[Mapping[str, str]] = None):
+        self.start = start
+        self.end = end
+        super().__init__(path, status_code=status_code, headers=headers,
+                         stat_result=stat_result, method=method,
+                         media_type=guess_type(path)[0] or "application/octet-stream",
+                         filename=os.path.basename(path), content_disposition_type="inline")
+
+    def set_stat_headers(self, stat_result: os.stat_result) -> None:
+        self.headers.setdefault("content-length", str(self.end - self.start + 1))
+        self.headers.setdefault("last-modified", formatdate(stat_result.st_mtime, usegmt=True))
+        self.headers.setdefault("etag", make_etag(stat_result))
+        self.headers.setdefault("accept-ranges", "bytes")
+        if self.status_code == 206:
+            self.headers["content-range"] = f"bytes {self.start}-{self.end}/{stat_result.st_size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        count = self.end - self.start + 1
+        if self.send_header_only or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.start)
+                remaining = count
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    })
+                if remaining > 0:
+                    # 文件在发送过程中被截断
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+
+def serve_file(path: str, request_headers: Mapping[str, str], method: str = "GET") -> Response:
+    """
+    根据请求头生成文件响应（200 / 206 / 304 / 416）
+
+    Args:
+        path (str): 文件路径（调用方需确认文件存在）
+        request_headers (Mapping): 请求头
+        method (str): 请求方法，HEAD 时只返回响应头
+
+    Returns:
+        Response: 响应
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag = make_etag(stat_result)
+
+    if_none_match = request_headers.get("if-none-match")
+    # If-None-Match 使用弱比较，忽略 W/ 前缀
+    if if_none_match and (if_none_match.strip() == "*" or
+                          etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers={"etag": etag, "accept-ranges": "bytes"})
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    # 多段范围按完整文件返回（RFC 9110 允许忽略 Range）
+    if range_header and "," not in range_header and (not if_range or if_range.strip() == etag):
+        try:
+            start, end = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={"content-range": f"bytes */{size}"})
+        return RangeFileResponse(path, stat_result, start, end, status_code=206, method=method)
+
+    return RangeFileResponse(path, stat_result, 0, size - 1, method=method)
+
+
+class _ZipStream:
+    """只写、不可回退的输出流，zipfile 写入的数据暂存在这里等待取走"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._written = 0
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        self._written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._written
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def list_archive_files(folder: str) -> List[str]:
+    """
+    列出会话文件夹中需要导出的文件（跳过缓存记录、临时目录等隐藏文件）
+
+    Args:
+        folder (str): 会话文件夹
+
+    Returns:
+        list: 相对会话文件夹的路径，按名称排序
+    """
+    names = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if not filename.startswith('.') and not filename.endswith('.tmp'):
+                names.append(os.path.relpath(os.path.join(dirpath, filename), folder))
+    return names
+
+
+def iter_folder_zip(folder: str, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+    """
+    逐块生成会话文件夹的 ZIP 数据
+
+    音频已是压缩格式，使用 ZIP_STORED 不再重复压缩；
+    输出流不可回退，zipfile 会在每个文件后写入数据描述符，无需预先计算 CRC
+
+    Args:
+        folder (str): 会话文件夹
+        chunk_size (int): 每次读取的字节数
+
+    Yields:
+        bytes: ZIP 数据块
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name in list_archive_files(folder):
+            path = os.path.join(folder, name)
+            info = zipfile.ZipInfo.from_file(path, name.replace(os.sep, '/'))
+            info.compress_type = zipfile.ZIP_STORED
+            with open(path, 'rb') as src, archive.open(info, mode='w', force_zip64=True) as dst:
+                for chunk in iter(lambda: src.read(chunk_size), b''):
+                    dst.write(chunk)
+                    yield stream.take()
+    # 文件尾部的数据描述符和中央目录
+    yield stream.take()
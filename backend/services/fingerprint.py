@@ -0,0 +1,378 @@
+"""
+视记 - 音频指纹去重模块
+
+功能：
+- 对解码后的音频计算声学指纹：每 23 ms 一个 32 位子指纹，由相邻频带能量差随时间的变化符号组成
+  （Haitsma & Kalker 的频带能量差方法），对重新编码、码率和音量变化不敏感
+- 在下载目录中用 SQLite 建立子指纹索引，新任务通过子指纹精确匹配 + 时间偏移投票找到候选，
+  再按对齐后的比特错误率确认是否为同一段音频
+- 同一内容以不同 BV 号 / YouTube ID 重复上传时，任务直接关联到已有结果，跳过后续阶段
+- 指纹计算需要 NumPy（可选依赖），未安装时不做去重
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .waveform import iter_pcm
+
+
+FINGERPRINT_DB_FILENAME = ".fingerprints.db"
+
+# 解码采样率与分帧参数：帧长约 0.37 秒、帧移约 23 毫秒，相邻帧高度重叠，
+# 两个版本的起点不对齐时子指纹也基本一致
+FINGERPRINT_SAMPLE_RATE = 5512
+FRAME_SIZE = 2048
+HOP_SIZE = 128
+# 300 ~ 2000 Hz 之间按对数划分 33 个频带，得到 32 位子指纹
+BAND_COUNT = 33
+MIN_FREQUENCY = 300
+MAX_FREQUENCY = 2000
+
+# 索引中每隔几帧登记一个子指纹；查询时使用全部子指纹，仍能在任意偏移上命中
+INDEX_STRIDE = 8
+# 出现次数过多的子指纹（静音、单音等）没有区分度，查询时跳过
+MAX_HASH_OCCURRENCES = 50
+
+# 判定为同一段音频的条件：比特错误率不超过阈值，且重叠部分覆盖两段音频的大部分
+MAX_BIT_ERROR_RATE = 0.35
+MIN_COVERAGE = 0.9
+# 太短的音频容易误判，不参与去重
+MIN_DURATION_SECONDS = 30
+
+# 静音帧（RMS 低于约 -50 dBFS）的子指纹由噪声决定，不登记也不查询
+_SILENCE_RMS = 100
+# 每批计算的帧数，控制内存占用
+_FRAME_BATCH = 2048
+# SQLite 单条语句的参数数量上限以内
+_QUERY_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL UNIQUE,
+    duration REAL NOT NULL,
+    data BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    hash INTEGER NOT NULL,
+    fingerprint_id INTEGER NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_hash ON hashes(hash);
+CREATE INDEX IF NOT EXISTS hashes_fingerprint ON hashes(fingerprint_id);
+CREATE TABLE IF NOT EXISTS links (
+    job_id TEXT PRIMARY KEY,
+    duplicate_of TEXT NOT NULL,
+    bit_error_rate REAL,
+    offset_seconds REAL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def _numpy():
+    """NumPy 为可选依赖，未安装时抛出 RuntimeError"""
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        raise RuntimeError("未安装 NumPy，无法计算音频指纹，请先运行: pip install numpy")
+
+
+def compute_fingerprint(audio_path: str, ffmpeg_path: Optional[str] = None) -> dict:
+    """
+    计算音频指纹
+
+    Args:
+        audio_path (str): 音频文件路径
+        ffmpeg_path (str, optional): ffmpeg 可执行文件路径，默认从 PATH 查找
+
+    Returns:
+        dict: {"hashes": uint32 数组（每帧一个子指纹）, "silent": bool 数组（静音帧）, "duration": 时长（秒）}
+
+    Raises:
+        RuntimeError: 未安装 NumPy、未找到 FFmpeg 或解码失败
+    """
+    np = _numpy()
+    print(f"🔎 计算音频指纹: {os.path.basename(audio_path)}")
+
+    samples = np.frombuffer(b''.join(iter_pcm(audio_path, FINGERPRINT_SAMPLE_RATE,
+                                              ffmpeg_path=ffmpeg_path)), dtype='<i2')
+    duration = len(samples) / FINGERPRINT_SAMPLE_RATE
+    if len(samples) < FRAME_SIZE + HOP_SIZE:
+        return {"hashes": np.empty(0, dtype=np.uint32), "silent": np.empty(0, dtype=bool),
+                "duration": duration}
+
+    # 每个频带对应的 FFT 频点（频带矩阵，能量 = 功率谱 @ 矩阵）
+    frequencies = np.fft.rfftfreq(FRAME_SIZE, 1 / FINGERPRINT_SAMPLE_RATE)
+    edges = np.geomspace(MIN_FREQUENCY, MAX_FREQUENCY, BAND_COUNT + 1)
+    bands = ((frequencies[:, None] >= edges[None, :-1]) &
+             (frequencies[:, None] < edges[None, 1:])).astype(np.float32)
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    weights = (1 << np.arange(BAND_COUNT - 1, dtype=np.uint64)).astype(np.uint64)
+
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    hashes = []
+    silent = []
+    previous = None
+    for start in range(0, len(frames), _FRAME_BATCH):
+        batch = frames[start:start + _FRAME_BATCH].astype(np.float32)
+        silent.append(np.sqrt((batch ** 2).mean(axis=1)) < _SILENCE_RMS)
+        spectrum = np.abs(np.fft.rfft(batch * window, axis=1)) ** 2
+        # 相邻频带的能量差
+        energy = spectrum @ bands
+        band_diff = energy[:, :-1] - energy[:, 1:]
+        # 再与上一帧相减，取符号作为比特
+        if previous is None:
+            time_diff = np.vstack([np.zeros_like(band_diff[:1]), band_diff[1:] - band_diff[:-1]])
+        else:
+            time_diff = band_diff - np.vstack([previous, band_diff[:-1]])
+        previous = band_diff[-1:]
+        bits = (time_diff > 0).astype(np.uint64)
+        hashes.append((bits @ weights).astype(np.uint32))
+
+    return {"hashes": np.concatenate(hashes), "silent": np.concatenate(silent), "duration": duration}
+
+
+def bit_error_rate(a, b, offset: int) -> Optional[tuple]:
+    """
+    按偏移对齐两段指纹并计算比特错误率
+
+    Args:
+        a: 新音频的子指纹（uint32 数组）
+        b: 已有音频的子指纹
+        offset (int): a[i] 对应 b[i + offset]
+
+    Returns:
+        Optional[tuple]: (比特错误率, 重叠帧数)，没有重叠时返回 None
+    """
+    np = _numpy()
+    start = max(0, -offset)
+    end = min(len(a), len(b) - offset)
+    if end <= start:
+        return None
+    diff = np.bitwise_xor(a[start:end], b[start + offset:end + offset])
+    errors = int(np.unpackbits(diff.view(np.uint8)).sum())
+    return errors / ((end - start) * 32), end - start
+
+
+class FingerprintIndex:
+    """
+    音频指纹索引
+
+    每个下载目录一个数据库；只登记不重复的音频，被判定为重复的任务记录为指向已有任务的关联
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        Args:
+            root_dir (str): 下载根目录
+        """
+        self.root_dir = root_dir
+        self.db_path = os.path.join(root_dir, FINGERPRINT_DB_FILENAME)
+        self._lock = threading.Lock()
+
+        os.makedirs(root_dir, exist_ok=True)
+        self._conn = self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def contains(self, job_id: str) -> bool:
+        """任务的指纹是否已登记"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM fingerprints WHERE job_id = ?", (job_id,)).fetchone() is not None
+
+    def get_link(self, job_id: str) -> Optional[dict]:
+        """
+        获取任务的重复关联
+
+        Returns:
+            Optional[dict]: {"job_id", "duplicate_of", "bit_error_rate", "offset_seconds", "created_at"}，
+                不是重复任务时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM links WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def remove(self, job_id: str):
+        """删除任务的指纹和关联（对应的会话文件夹已被清理时调用）"""
+        with self._lock, self._conn:
+            self._remove(job_id)
+
+    def _remove(self, job_id: str):
+        self._remove_fingerprint(job_id)
+        self._conn.execute("DELETE FROM links WHERE job_id = ? OR duplicate_of = ?", (job_id, job_id))
+
+    def _remove_fingerprint(self, job_id: str):
+        row = self._conn.execute("SELECT id FROM fingerprints WHERE job_id = ?", (job_id,)).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM hashes WHERE fingerprint_id = ?", (row['id'],))
+            self._conn.execute("DELETE FROM fingerprints WHERE id = ?", (row['id'],))
+
+    def match_or_add(self, job_id: str, fingerprint: dict,
+                     is_available: Callable[[str], bool] = lambda job_id: True) -> Optional[dict]:
+        """
+        查找与新音频重复的已有任务；没有重复时登记新音频的指纹
+
+        耗时的候选查询和比对用独立的只读连接在锁外进行，不阻塞其他任务；
+        查询期间新登记的指纹在锁内补查后再登记，同时处理的两个重复任务中后完成的一个仍能找到先完成的一个
+
+        Args:
+            job_id (str): 新任务ID
+            fingerprint (dict): compute_fingerprint 的结果
+            is_available (Callable): 检查已有任务的结果是否仍然存在，不存在的会从索引中移除
+
+        Returns:
+            Optional[dict]: 重复时返回关联 {"job_id", "duplicate_of", "bit_error_rate", "offset_seconds"}，
+                否则返回 None
+        """
+        hashes = fingerprint["hashes"]
+        if fingerprint["duration"] < MIN_DURATION_SECONDS or not len(hashes):
+            return None
+
+        silent = fingerprint["silent"]
+        with self._lock:
+            last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM fingerprints").fetchone()[0]
+        reader = self._connect()
+        try:
+            matches = self._find_matches(reader, job_id, hashes, silent)
+        finally:
+            reader.close()
+
+        with self._lock, self._conn:
+            matches += self._find_matches(self._conn, job_id, hashes, silent, after_id=last_id)
+            for existing_job_id, match in matches:
+                # 锁外查询到的指纹可能已被移除
+                if self._conn.execute("SELECT 1 FROM fingerprints WHERE job_id = ?",
+                                      (existing_job_id,)).fetchone() is None:
+                    continue
+                if not is_available(existing_job_id):
+                    self._remove(existing_job_id)
+                    continue
+
+                link = {"job_id": job_id, "duplicate_of": existing_job_id, **match}
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO links (job_id, duplicate_of, bit_error_rate, offset_seconds, "
+                    "created_at) VALUES (:job_id, :duplicate_of, :bit_error_rate, :offset_seconds, :now)",
+                    {**link, "now": time.time()})
+                return link
+
+            self._add(job_id, fingerprint)
+        return None
+
+    def _find_matches(self, conn: sqlite3.Connection, job_id: str, hashes, silent,
+                      after_id: int = 0) -> List[Tuple[str, dict]]:
+        """查找并比对候选，返回满足重复条件的 [(已有任务ID, 匹配信息)]，按得票从多到少排列"""
+        np = _numpy()
+        matches = []
+        for candidate, votes in self._candidates(conn, hashes, silent, after_id):
+            row = conn.execute(
+                "SELECT job_id, data FROM fingerprints WHERE id = ?", (candidate,)).fetchone()
+            if row is None or row['job_id'] == job_id:
+                continue
+            match = self._verify(hashes, np.frombuffer(row['data'], dtype='<u4'), votes)
+            if match is not None:
+                matches.append((row['job_id'], match))
+        return matches
+
+    @staticmethod
+    def _candidates(conn: sqlite3.Connection, hashes, silent, after_id: int = 0) -> List[Tuple[int, Counter]]:
+        """
+        子指纹精确匹配，按 (已有音频, 时间偏移) 投票，返回得票最多的几个候选及其偏移票数
+
+        after_id 不为 0 时只查找该 ID 之后登记的指纹
+        """
+        query = {}
+        for position, value in enumerate(hashes.tolist()):
+            if not silent[position]:
+                query.setdefault(value, []).append(position)
+
+        votes: Dict[int, Counter] = {}
+        values = list(query)
+        for i in range(0, len(values), _QUERY_BATCH):
+            batch = values[i:i + _QUERY_BATCH]
+            rows = conn.execute(
+                f"SELECT hash, fingerprint_id, position FROM hashes "
+                f"WHERE hash IN ({','.join('?' * len(batch))}) AND fingerprint_id > ?",
+                (*batch, after_id)).fetchall()
+            matches = {}
+            for row in rows:
+                matches.setdefault(row['hash'], []).append(row)
+            for value, found in matches.items():
+                if len(found) > MAX_HASH_OCCURRENCES:
+                    continue
+                for row in found:
+                    offsets = votes.setdefault(row['fingerprint_id'], Counter())
+                    for position in query[value]:
+                        offsets[row['position'] - position] += 1
+
+        ranked = sorted(votes.items(), key=lambda item: item[1].most_common(1)[0][1], reverse=True)
+        return ranked[:5]
+
+    @staticmethod
+    def _verify(hashes, existing, votes: Counter) -> Optional[dict]:
+        """在得票最多的偏移附近计算比特错误率，满足重复条件时返回匹配信息"""
+        best = None
+        for offset, _ in votes.most_common(3):
+            for shift in (offset - 1, offset, offset + 1):
+                result = bit_error_rate(hashes, existing, shift)
+                if result and (best is None or result[0] < best[0]):
+                    best = (result[0], result[1], shift)
+
+        if best is None:
+            return None
+        error_rate, overlap, offset = best
+        coverage = overlap / max(len(hashes), len(existing))
+        if error_rate > MAX_BIT_ERROR_RATE or coverage < MIN_COVERAGE:
+            return None
+        return {"bit_error_rate": round(error_rate, 4),
+                "offset_seconds": round(offset * HOP_SIZE / FINGERPRINT_SAMPLE_RATE, 2)}
+
+    def _add(self, job_id: str, fingerprint: dict):
+        """登记指纹（调用方需持有锁并处于事务中）"""
+        hashes = fingerprint["hashes"]
+        self._remove_fingerprint(job_id)
+        cursor = self._conn.execute(
+            "INSERT INTO fingerprints (job_id, duration, data, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, fingerprint["duration"], hashes.astype('<u4').tobytes(), time.time()))
+        fingerprint_id = cursor.lastrowid
+        values = hashes.tolist()
+        silent = fingerprint["silent"]
+        self._conn.executemany(
+            "INSERT INTO hashes (hash, fingerprint_id, position) VALUES (?, ?, ?)",
+            [(values[p], fingerprint_id, p) for p in range(0, len(values), INDEX_STRIDE) if not silent[p]])
+
+
+# 每个下载目录共享一个指纹索引实例
+_indexes: Dict[str, FingerprintIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_fingerprint_index(root_dir: str) -> FingerprintIndex:
+    """
+    获取（或创建）指定下载目录的指纹索引
+
+    Args:
+        root_dir (str): 下载根目录
+
+    Returns:
+        FingerprintIndex: 指纹索引实例
+    """
+    key = os.path.abspath(root_dir)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = FingerprintIndex(root_dir)
+            _indexes[key] = index
+        return index
@@ -0,0 +1,134 @@
+"""
+视记 - 下载格式选择策略模块
+
+功能：
+- 替代固定的 'bestaudio/best'，在满足目标输出音质的前提下选择体积最小的纯音频流
+- 存在纯音频流时不回退到带视频的格式，减少每个任务的下载量
+- 跳过带 DRM 的格式；有多条音轨时只在原声（language_preference 最高）音轨中选择，不会因体积选中配音音轨
+- 作为 yt-dlp 的 format 选项（可调用对象）使用，并可描述所选格式用于结果上报
+"""
+
+from typing import Iterator, List, Optional
+
+
+# 不同编码相对 MP3 的压缩效率：同等听感下，opus 128k 约相当于 mp3 192k 以上
+CODEC_EFFICIENCY = {
+    'opus': 1.6,
+    'mp4a': 1.3,
+    'aac': 1.3,
+    'vorbis': 1.3,
+    'ec-3': 1.2,
+    'flac': 4.0,
+    'mp3': 1.0,
+}
+
+
+def _codec_family(codec: Optional[str]) -> str:
+    return (codec or '').split('.')[0].lower()
+
+
+def _bitrate(fmt: dict) -> float:
+    """音频码率 (kbps)，缺失时退回总码率"""
+    return fmt.get('abr') or fmt.get('tbr') or 0
+
+
+def _effective_kbps(fmt: dict) -> float:
+    """换算为 MP3 等效码率，用于和目标输出码率比较"""
+    return _bitrate(fmt) * CODEC_EFFICIENCY.get(_codec_family(fmt.get('acodec')), 1.0)
+
+
+def _size_key(fmt: dict):
+    """按码率（同一视频下与体积成正比）排序，码率相同时比较文件大小"""
+    return (_bitrate(fmt) or float('inf'),
+            fmt.get('filesize') or fmt.get('filesize_approx') or float('inf'))
+
+
+def is_audio_only(fmt: dict) -> bool:
+    return fmt.get('vcodec') == 'none' and fmt.get('acodec') not in (None, 'none')
+
+
+def has_audio(fmt: dict) -> bool:
+    return fmt.get('acodec') != 'none'
+
+
+def _language_preference(fmt: dict) -> int:
+    """音轨语言优先级，yt-dlp 对原声音轨给出较高值，缺失时按 -1（与 yt-dlp 一致）"""
+    preference = fmt.get('language_preference')
+    return preference if preference is not None else -1
+
+
+class AudioFormatPolicy:
+    """
+    "满足目标音质的最小音频流" 格式选择策略
+
+    先排除带 DRM 的格式，并且只保留 language_preference 最高的一组音轨，再按以下顺序选择：
+    1. 等效码率达到目标的纯音频流中体积最小的
+    2. 没有达标的纯音频流时，选等效码率最高的纯音频流
+    3. 完全没有纯音频流时，才在带视频的格式中按同样规则选择
+    """
+
+    name = 'smallest-audio'
+
+    def __init__(self, target_kbps: int):
+        """
+        Args:
+            target_kbps (int): 目标输出码率 (kbps)，即 MP3 转码码率
+        """
+        self.target_kbps = target_kbps
+
+    def __call__(self, ctx: dict) -> Iterator[dict]:
+        """yt-dlp 格式选择接口：接收 {'formats': [...]}，产出要下载的格式"""
+        fmt = self.select(ctx['formats'])
+        if fmt is not None:
+            yield fmt
+
+    def select(self, formats: List[dict]) -> Optional[dict]:
+        """
+        从候选格式中选出一个
+
+        Args:
+            formats (list): yt-dlp 提取的格式列表（按质量从低到高排列）
+
+        Returns:
+            Optional[dict]: 选中的格式，没有可用格式时返回 None
+        """
+        formats = [f for f in formats if not f.get('has_drm')]
+        candidates = [f for f in formats if is_audio_only(f)]
+        if not candidates:
+            candidates = [f for f in formats if has_audio(f)]
+        if not candidates:
+            return None
+
+        # 多音轨（原声 + 配音）时只在原声音轨中比较码率和体积
+        preferred = max(_language_preference(f) for f in candidates)
+        candidates = [f for f in candidates if _language_preference(f) == preferred]
+
+        meeting = [f for f in candidates if _effective_kbps(f) >= self.target_kbps]
+        if meeting:
+            return min(meeting, key=_size_key)
+
+        # 都达不到目标音质时取最好的；码率未知时保持 yt-dlp 的质量排序（靠后的更好）
+        return max(enumerate(candidates), key=lambda item: (_effective_kbps(item[1]), item[0]))[1]
+
+    def describe(self) -> dict:
+        """策略描述（可 JSON 序列化，参与缓存键计算）"""
+        return {'policy': self.name, 'target_kbps': self.target_kbps}
+
+
+def describe_format(info: dict) -> dict:
+    """
+    提取所选格式的关键信息，用于任务结果上报
+
+    Args:
+        info (dict): 下载完成后的视频信息
+
+    Returns:
+        dict: {"format_id", "acodec", "abr", "filesize", "audio_only"}
+    """
+    return {
+        'format_id': info.get('format_id'),
+        'acodec': info.get('acodec'),
+        'abr': _bitrate(info) or None,
+        'filesize': info.get('filesize') or info.get('filesize_approx'),
+        'audio_only': is_audio_only(info),
+    }
@@ -0,0 +1,292 @@
+"""
+视记 - 任务期限与取消模块
+
+功能：
+- 每个任务一个 JobContext：记录截止时间，到期自动取消；也可通过接口手动取消
+- 取消时终止该任务启动的所有子进程（yt-dlp 调用的 ffmpeg、分段用的 ffmpeg），
+  yt-dlp 的下载循环通过进度回调在下一个数据块处中断
+- 任务在当前线程上激活，下载器、分段器、转写器通过 current_job() 获取，无需逐层传参
+"""
+
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+# 全局任务期限（秒），可通过环境变量 AUDIO2NOTE_JOB_TIMEOUT_MINUTES 调整；
+# 单个请求的期限不能超过它
+DEFAULT_JOB_TIMEOUT_SECONDS = 2 * 3600
+
+# 取消后等待子进程正常退出的时间，超时则强制结束
+_TERMINATE_GRACE_SECONDS = 3
+
+
+class JobCancelled(Exception):
+    """任务被取消或超过期限"""
+
+    def __init__(self, reason: str, timed_out: bool = False):
+        super().__init__(reason)
+        self.timed_out = timed_out
+
+
+class JobContext:
+    """
+    单个任务的期限与取消状态
+    """
+
+    def __init__(self, timeout_seconds: Optional[float] = None, url: Optional[str] = None):
+        """
+        Args:
+            timeout_seconds (float, optional): 任务期限（秒），超过全局期限时按全局期限
+            url (str, optional): 任务链接，用于运行中任务列表
+        """
+        limit = global_timeout_seconds()
+        if timeout_seconds is None or (limit is not None and timeout_seconds > limit):
+            timeout_seconds = limit
+
+        self.job_id: Optional[str] = None
+        self.url = url
+        self.started_at = time.time()
+        self.timeout_seconds = timeout_seconds
+        self.reason: Optional[str] = None
+        self.timed_out = False
+
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes: List[subprocess.Popen] = []
+        self._timer: Optional[threading.Timer] = None
+        if timeout_seconds:
+            self._timer = threading.Timer(timeout_seconds, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def _expire(self):
+        self.cancel(f"任务超时（超过 {self.timeout_seconds:g} 秒）", timed_out=True)
+
+    def cancel(self, reason: str = "任务已取消", timed_out: bool = False):
+        """
+        取消任务并终止其子进程
+
+        Args:
+            reason (str): 取消原因
+            timed_out (bool): 是否因超过期限而取消
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self.timed_out = timed_out
+            self._event.set()
+            processes = list(self._processes)
+
+        print(f"🛑 {reason}: {self.url or self.job_id}")
+        for process in processes:
+            _terminate(process)
+
+    def check(self):
+        """任务已取消时抛出 JobCancelled，在各阶段的检查点调用"""
+        if self._event.is_set():
+            raise JobCancelled(self.reason, self.timed_out)
+
+    def wait(self, seconds: float) -> bool:
+        """
+        等待指定时间，任务被取消时提前返回
+
+        Returns:
+            bool: 等待期间任务被取消返回 True
+        """
+        return self._event.wait(seconds)
+
+    def track(self, process: subprocess.Popen):
+        """登记任务启动的子进程，取消时一并终止"""
+        with self._lock:
+            self._processes = [p for p in self._processes if p.poll() is None]
+            self._processes.append(process)
+            cancelled = self._event.is_set()
+        if cancelled:
+            _terminate(process)
+
+    def close(self):
+        """任务结束，停止计时"""
+        if self._timer:
+            self._timer.cancel()
+
+    def describe(self) -> dict:
+        """运行中任务的概要信息"""
+        elapsed = time.time() - self.started_at
+        return {
+            "job_id": self.job_id,
+            "url": self.url,
+            "elapsed_seconds": round(elapsed, 1),
+            "remaining_seconds": (round(max(self.timeout_seconds - elapsed, 0), 1)
+                                  if self.timeout_seconds else None),
+            "cancelled": self.cancelled,
+        }
+
+
+def _terminate(process: subprocess.Popen):
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=_TERMINATE_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def global_timeout_seconds() -> Optional[float]:
+    """全局任务期限（秒），环境变量设为 0 时不限制"""
+    value = os.environ.get('AUDIO2NOTE_JOB_TIMEOUT_MINUTES')
+    if not value:
+        return DEFAULT_JOB_TIMEOUT_SECONDS
+    try:
+        return float(value) * 60 or None
+    except ValueError:
+        print(f"⚠️ 环境变量 AUDIO2NOTE_JOB_TIMEOUT_MINUTES 无效: {value}")
+        return DEFAULT_JOB_TIMEOUT_SECONDS
+
+
+# ----------------------------------------------------------------------
+# 当前线程的任务
+# ----------------------------------------------------------------------
+
+_local = threading.local()
+
+
+def current_job() -> Optional[JobContext]:
+    """当前线程正在执行的任务，没有时返回 None"""
+    return getattr(_local, 'job', None)
+
+
+@contextmanager
+def activate(job: JobContext):
+    """在当前线程上激活任务，退出时停止计时并从运行中任务列表移除"""
+    _install_popen_tracking()
+    previous = current_job()
+    _local.job = job
+    try:
+        yield job
+    finally:
+        _local.job = previous
+        job.close()
+        unregister(job)
+
+
+def check_current(*_):
+    """
+    检查当前任务是否已取消
+
+    可直接用作 yt-dlp 的 progress_hooks / postprocessor_hooks：
+    回调中抛出的异常会中断下载循环
+    """
+    job = current_job()
+    if job:
+        job.check()
+
+
+def run_process(cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """
+    运行子进程并登记到当前任务，任务取消时子进程会被终止
+
+    Args:
+        cmd (list): 命令
+        **kwargs: 传给 subprocess.Popen 的参数
+
+    Returns:
+        subprocess.CompletedProcess: 运行结果
+
+    Raises:
+        JobCancelled: 运行期间任务被取消
+    """
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs) as process:
+        job = current_job()
+        if job:
+            job.track(process)
+        stdout, stderr = process.communicate()
+    check_current()
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+_popen_patch_lock = threading.Lock()
+_popen_patched = False
+
+
+def _install_popen_tracking():
+    """
+    让 yt-dlp 启动的子进程（ffmpeg 后处理、外部下载器）登记到当前任务
+
+    yt-dlp 没有提供子进程回调，这里包装 yt_dlp.utils.Popen 的构造函数；
+    只对激活了任务的线程生效，其余调用不受影响
+    """
+    global _popen_patched
+    with _popen_patch_lock:
+        if _popen_patched:
+            return
+        try:
+            from yt_dlp.utils import Popen
+        except ImportError:
+            return
+
+        original_init = Popen.__init__
+
+        def __init__(self, *args, **kwargs):
+            original_init(self, *args, **kwargs)
+            job = current_job()
+            if job:
+                job.track(self)
+
+        Popen.__init__ = __init__
+        _popen_patched = True
+
+
+# ----------------------------------------------------------------------
+# 运行中任务
+# ----------------------------------------------------------------------
+
+_running: Dict[str, JobContext] = {}
+_running_lock = threading.Lock()
+
+
+def register(job_id: str, job: JobContext):
+    """以任务ID登记运行中的任务，供查询和取消"""
+    job.job_id = job_id
+    with _running_lock:
+        _running[job_id] = job
+
+
+def unregister(job: JobContext):
+    with _running_lock:
+        if job.job_id and _running.get(job.job_id) is job:
+            del _running[job.job_id]
+
+
+def list_running() -> List[dict]:
+    """运行中任务列表"""
+    with _running_lock:
+        jobs = list(_running.values())
+    return [job.describe() for job in jobs]
+
+
+def cancel_job(job_id: str) -> bool:
+    """
+    取消运行中的任务
+
+    Args:
+        job_id (str): 任务ID
+
+    Returns:
+        bool: 找到并取消返回 True，任务不存在（未运行或已结束）返回 False
+    """
+    with _running_lock:
+        job = _running.get(job_id)
+    if job is None:
+        return False
+    job.cancel()
+    return True
@@ -0,0 +1,294 @@
+"""
+视记 - 下载资料库模块
+
+功能：
+- 在下载目录中用 SQLite 记录已完成的任务（ID、标题、平台、时长、分P数、文件路径、大小、时间）
+- 标题建立 FTS5 全文索引，按关键词分页搜索，查询耗时与资料库大小基本无关
+- 存储管理器清理会话文件夹时同步删除对应记录；被手动删除的文件夹在查询到所在页时移除，分页结果不受影响
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .storage_manager import get_storage_manager
+
+
+# 数据库文件名（隐藏文件，清理线程只处理文件夹，不会误删）
+LIBRARY_FILENAME = ".library.db"
+
+MAX_PAGE_SIZE = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    video_id TEXT,
+    title TEXT NOT NULL,
+    platform TEXT,
+    url TEXT,
+    duration REAL,
+    parts INTEGER NOT NULL DEFAULT 1,
+    session_folder TEXT NOT NULL,
+    files TEXT NOT NULL,
+    total_size INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs(updated_at);
+CREATE INDEX IF NOT EXISTS jobs_video_id ON jobs(video_id);
+"""
+
+# 标题全文索引与 jobs 表通过触发器保持同步
+_FTS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS jobs_ai AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_fts(rowid, title) VALUES (new.rowid, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_ad AFTER DELETE ON jobs BEGIN
+    INSERT INTO jobs_fts(jobs_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_au AFTER UPDATE OF title ON jobs BEGIN
+    INSERT INTO jobs_fts(jobs_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+    INSERT INTO jobs_fts(rowid, title) VALUES (new.rowid, new.title);
+END;
+"""
+
+# trigram 分词可以匹配中文标题中的任意子串（需要 SQLite 3.34+），
+# 不支持时退回 unicode61 按词匹配；两者都不可用时使用 LIKE 扫描
+_FTS_TOKENIZERS = ("trigram", "unicode61")
+
+# trigram 分词下少于 3 个字符的关键词无法走索引
+_TRIGRAM_MIN_LENGTH = 3
+
+
+class Library:
+    """
+    下载资料库
+
+    每个下载目录一个数据库，记录以任务ID为主键，重复处理同一任务时更新已有记录
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        Args:
+            root_dir (str): 下载根目录
+        """
+        self.root_dir = root_dir
+        self.db_path = os.path.join(root_dir, LIBRARY_FILENAME)
+        self._lock = threading.Lock()
+
+        os.makedirs(root_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self.tokenizer = self._create_fts()
+
+    def _create_fts(self) -> Optional[str]:
+        """创建标题全文索引，返回使用的分词器；SQLite 不支持 FTS5 时返回 None"""
+        row = self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'jobs_fts'").fetchone()
+        if row:
+            return next((t for t in _FTS_TOKENIZERS if t in row['sql']), _FTS_TOKENIZERS[-1])
+
+        for tokenizer in _FTS_TOKENIZERS:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "CREATE VIRTUAL TABLE jobs_fts USING fts5("
+                        f"title, content='jobs', content_rowid='rowid', tokenize='{tokenizer}')")
+                    self._conn.executescript(_FTS_TRIGGERS)
+                    self._conn.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')")
+                return tokenizer
+            except sqlite3.OperationalError:
+                continue
+
+        print("⚠️ SQLite 不支持 FTS5，资料库搜索将使用 LIKE 扫描")
+        return None
+
+    def record(self, job_id: str, result: dict, info: Optional[dict] = None,
+               url: Optional[str] = None, video_id: Optional[str] = None):
+        """
+        登记（或更新）一个已完成的任务
+
+        Args:
+            job_id (str): 任务ID
+            result (dict): ProcessService.process_video 的成功结果
+            info (dict, optional): yt-dlp 提取的视频信息，用于平台和时长
+            url (str, optional): 原始链接
+            video_id (str, optional): 规范视频ID
+        """
+        info = info or {}
+        files = result.get("files") or []
+        total_size = 0
+        for path in files:
+            try:
+                total_size += os.path.getsize(path)
+            except OSError:
+                pass
+
+        duration = info.get('duration')
+        if duration is None and info.get('entries'):
+            durations = [e.get('duration') for e in info['entries'] if e]
+            duration = sum(d for d in durations if d) or None
+
+        now = time.time()
+        row = {
+            "job_id": job_id,
+            "video_id": video_id,
+            "title": result.get("video_title") or info.get('title') or '',
+            "platform": info.get('extractor_key') or info.get('extractor'),
+            "url": url,
+            "duration": duration,
+            "parts": len(files) or 1,
+            "session_folder": os.path.relpath(result["session_folder"], self.root_dir),
+            "files": json.dumps([os.path.relpath(p, self.root_dir) for p in files],
+                                ensure_ascii=False),
+            "total_size": total_size,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, video_id, title, platform, url, duration, parts, "
+                "session_folder, files, total_size, created_at, updated_at) "
+                "VALUES (:job_id, :video_id, :title, :platform, :url, :duration, :parts, "
+                ":session_folder, :files, :total_size, :created_at, :updated_at) "
+                "ON CONFLICT(job_id) DO UPDATE SET "
+                "video_id = excluded.video_id, title = excluded.title, "
+                "platform = excluded.platform, url = excluded.url, "
+                "duration = excluded.duration, parts = excluded.parts, "
+                "session_folder = excluded.session_folder, files = excluded.files, "
+                "total_size = excluded.total_size, updated_at = excluded.updated_at",
+                row
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        按任务ID获取记录
+
+        Args:
+            job_id (str): 任务ID
+
+        Returns:
+            Optional[dict]: 任务记录；不存在或文件夹已被清理时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if not row or self._remove_stale([row]):
+                return None
+            return self._to_item(row)
+
+    def search(self, query: Optional[str] = None, page: int = 1, page_size: int = 20) -> dict:
+        """
+        按标题关键词分页搜索，结果按最近更新时间倒序
+
+        Args:
+            query (str, optional): 标题关键词，为空时列出全部
+            page (int): 页码（从1开始）
+            page_size (int): 每页条数（最多 MAX_PAGE_SIZE）
+
+        Returns:
+            dict: {"total": 总数, "page": 页码, "page_size": 每页条数, "items": [任务记录]}
+        """
+        page = max(page, 1)
+        page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+        where, params = self._match_clause((query or '').strip())
+
+        with self._lock:
+            # 只检查本页记录的文件夹；有已被清理的记录时删除后重新取本页，
+            # 本页不会变短，总数也在删除之后统计
+            while True:
+                rows = self._conn.execute(
+                    f"SELECT * FROM jobs {where} ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                    (*params, page_size, (page - 1) * page_size)
+                ).fetchall()
+                if not self._remove_stale(rows):
+                    break
+            total = self._conn.execute(f"SELECT COUNT(*) FROM jobs {where}", params).fetchone()[0]
+            items = [self._to_item(row) for row in rows]
+
+        return {"total": total, "page": page, "page_size": page_size, "items": items}
+
+    def _match_clause(self, query: str):
+        """
+        生成标题匹配条件，多个词之间为 AND 关系
+
+        能走全文索引的词合并为一个 MATCH 条件；trigram 分词会忽略少于 3 个字符的短语，
+        这些短词（以及不支持 FTS5 时的所有词）各自用 LIKE 匹配
+        """
+        terms = query.split()
+        if not terms:
+            return "", ()
+
+        min_length = _TRIGRAM_MIN_LENGTH if self.tokenizer == "trigram" else 1
+        indexed = [t for t in terms if self.tokenizer and len(t) >= min_length]
+        scanned = [t for t in terms if t not in indexed]
+
+        conditions = []
+        params = []
+        if indexed:
+            # 每个词作为短语匹配
+            conditions.append("rowid IN (SELECT rowid FROM jobs_fts WHERE jobs_fts MATCH ?)")
+            params.append(" ".join('"{}"'.format(t.replace('"', '""')) for t in indexed))
+        for term in scanned:
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append("title LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        return "WHERE " + " AND ".join(conditions), tuple(params)
+
+    def remove_folder(self, session_folder: str):
+        """
+        删除会话文件夹对应的记录（存储管理器清理文件夹后调用）
+
+        Args:
+            session_folder (str): 被清理的会话文件夹路径
+        """
+        folder = os.path.relpath(session_folder, self.root_dir)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE session_folder = ?", (folder,))
+
+    def _remove_stale(self, rows: List[sqlite3.Row]) -> bool:
+        """删除会话文件夹已不存在的记录，返回是否有记录被删除（调用方需持有锁）"""
+        stale = [(row['job_id'],) for row in rows
+                 if not os.path.isdir(os.path.join(self.root_dir, row['session_folder']))]
+        if stale:
+            with self._conn:
+                self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", stale)
+        return bool(stale)
+
+    def _to_item(self, row: sqlite3.Row) -> dict:
+        """把数据库行转为结果字典（路径转为绝对路径）"""
+        item = dict(row)
+        item['session_folder'] = os.path.join(self.root_dir, row['session_folder'])
+        item['files'] = [os.path.join(self.root_dir, p) for p in json.loads(row['files'])]
+        return item
+
+
+# 每个下载目录共享一个资料库实例（共用同一个数据库连接）
+_libraries: Dict[str, Library] = {}
+_libraries_lock = threading.Lock()
+
+
+def get_library(root_dir: str) -> Library:
+    """
+    获取（或创建）指定下载目录的资料库
+
+    Args:
+        root_dir (str): 下载根目录
+
+    Returns:
+        Library: 资料库实例
+    """
+    key = os.path.abspath(root_dir)
+    with _libraries_lock:
+        library = _libraries.get(key)
+        if library is None:
+            library = Library(root_dir)
+            _libraries[key] = library
+            # 存储管理器清理会话文件夹时同步删除对应记录，查询时无需逐条检查文件夹
+            get_storage_manager(root_dir).add_eviction_listener(library.remove_folder)
+        return library
@@ -0,0 +1,111 @@
+"""
+视记 - 下载输出记录模块
+
+功能：
+- 以 yt-dlp 后处理器的形式记录每个最终输出文件的路径和所选源格式
+- 可选用 ffprobe（未安装时用 ffmpeg）测量输出时长，用于统计静音裁剪量
+
+该模块依赖 yt_dlp，只在实际下载时由 AudioDownloader 导入
+"""
+
+import re
+import shutil
+import subprocess
+from typing import List, Optional
+
+from yt_dlp.postprocessor import PostProcessor
+
+from .format_policy import describe_format
+
+
+class OutputRecorderPP(PostProcessor):
+    """
+    记录最终输出文件路径的后处理器
+
+    在 after_move 阶段运行（所有后处理和移动完成之后），
+    此时 info['filepath'] 就是最终落盘的文件路径
+    """
+
+    def __init__(self, downloader=None, measure_duration: bool = False,
+                 start: Optional[float] = None, end: Optional[float] = None):
+        """
+        Args:
+            downloader: yt-dlp 实例
+            measure_duration (bool): 是否用 ffprobe 测量输出时长（用于统计静音裁剪量）
+            start (float, optional): 只下载片段时的开始时间（秒）
+            end (float, optional): 只下载片段时的结束时间（秒）
+        """
+        super().__init__(downloader)
+        self.files: List[str] = []
+        # 每个输出文件实际下载的源格式
+        self.formats: List[dict] = []
+        self.measure_duration = measure_duration
+        # 输出文件路径 -> (源时长, 输出时长)
+        self.durations = {}
+        self.start = start
+        self.end = end
+        self.ffprobe_path = shutil.which('ffprobe')
+        self.ffmpeg_path = shutil.which('ffmpeg') or 'ffmpeg'
+
+    def run(self, info):
+        filepath = info.get('filepath')
+        if filepath and filepath not in self.files:
+            self.files.append(filepath)
+            self.formats.append(describe_format(info))
+            if self.measure_duration:
+                self.durations[filepath] = (self._source_duration(info), self._probe_duration(filepath))
+        return [], info
+
+    def _probe_duration(self, filepath: str) -> Optional[float]:
+        """
+        读取输出文件的实际时长，失败时返回 None
+
+        优先用 ffprobe；未安装 ffprobe 时解析 ffmpeg -i 输出中的 Duration
+        """
+        try:
+            if self.ffprobe_path:
+                cmd = [self.ffprobe_path, '-v', 'error', '-show_entries', 'format=duration',
+                       '-of', 'default=noprint_wrappers=1:nokey=1', filepath]
+                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+                return float(result.stdout.decode('utf-8', errors='replace').strip())
+
+            # 没有指定输出时 ffmpeg 以非 0 退出，时长信息仍会写到标准错误
+            cmd = [self.ffmpeg_path, '-hide_banner', '-i', filepath]
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+            match = re.search(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)',
+                              result.stderr.decode('utf-8', errors='replace'))
+            if not match:
+                raise ValueError("ffmpeg 输出中没有时长信息")
+            hours, minutes, seconds = match.groups()
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        except (OSError, subprocess.TimeoutExpired, ValueError) as e:
+            print(f"⚠️ 无法获取输出时长: {filepath}: {e}")
+            return None
+
+    def _source_duration(self, info) -> Optional[float]:
+        """
+        输出文件对应的源时长
+
+        只下载片段时 info['duration'] 仍是完整视频的时长，需改用片段长度，
+        否则片段以外的部分会被算作裁剪掉的静音
+        """
+        duration = info.get('duration')
+        section_start, section_end = info.get('section_start'), info.get('section_end')
+        if section_end is not None and section_start is not None:
+            if duration:
+                section_end = min(section_end, duration)
+            return max(section_end - section_start, 0.0)
+        if self.start is None and self.end is None:
+            return duration
+        if not duration:
+            return None
+        end = min(self.end, duration) if self.end is not None else duration
+        return max(end - (self.start or 0), 0.0)
+
+    def removed_seconds(self) -> float:
+        """统计所有输出文件相对源视频被裁剪掉的总秒数"""
+        total = 0.0
+        for source, output in self.durations.values():
+            if source and output:
+                total += max(source - output, 0.0)
+        return round(total, 3)
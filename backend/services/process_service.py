@@ -3,7 +3,23 @@ Minimal ProcessService: Only keeps video download functionality
 """
 
 import os
-from .audio_downloader import AudioDownloader
+import uuid
+from contextlib import nullcontext
+from typing import Optional
+from .audio_chunker import AudioChunker, load_manifest
+from .audio_downloader import AUDIO_PROFILES, DEFAULT_AUDIO_PROFILE, AudioDownloader
+from .errors import (CANCELLED, DISK_FULL, TIMEOUT, UNAVAILABLE, DownloadFailed, RetryPolicy,
+                     classify_error)
+from .job_control import JobCancelled, JobContext, activate, check_current, register
+from .fingerprint import FingerprintIndex, compute_fingerprint, get_fingerprint_index
+from .library import get_library
+from .profiler import JobProfiler
+from .session_index import canonical_video_id, get_session_index, sanitize_filename
+from .stage_cache import StageCache
+from .storage_manager import get_storage_manager
+from .transcriber import Transcriber
+from .waveform import (BASE_SAMPLES_PER_BIN, LEVEL_COUNT, LEVEL_FACTOR, PEAKS_SAMPLE_RATE,
+                       PEAKS_VERSION, generate_peaks)
 
 
 class ProcessService:
@@ -14,21 +30,118 @@ class ProcessService:
             self.temp_dir = download_dir
         else:
             self.temp_dir = "temp"  # 用于存放下载的会话文件夹
+        # 统一为绝对路径：新下载和命中缓存时返回的文件路径形式一致（缓存记录保存的是绝对路径）
+        self.temp_dir = os.path.abspath(self.temp_dir)
 
-    def process_video(self, url: str, page_number: int = None) -> dict:
+        # 同一下载目录共享存储管理器（空间预检、配额、旧文件夹清理）
+        self.storage = get_storage_manager(self.temp_dir)
+        # 视频ID -> 会话文件夹 的索引
+        self.session_index = get_session_index(self.temp_dir)
+        # 已完成任务的资料库（支持按标题搜索）
+        self.library = get_library(self.temp_dir)
+        # 获取信息和下载失败时，只对网络错误和限流按退避重试
+        self.retry_policy = RetryPolicy()
+
+    @property
+    def fingerprints(self) -> FingerprintIndex:
+        """音频指纹索引，识别以不同链接重复上传的同一段音频；只在启用去重时打开，不会在其他下载目录中创建数据库"""
+        return get_fingerprint_index(self.temp_dir)
+
+    def process_video(self, url: str, page_number: int = None,
+                      chunk_seconds: int = None, chunk_mode: str = 'fixed',
+                      transcribe_engine: str = None, transcribe_workers: int = None,
+                      audio_profile: str = DEFAULT_AUDIO_PROFILE,
+                      trim_silence: bool = False,
+                      start: float = None, end: float = None,
+                      timeout_seconds: float = None, profile: bool = False,
+                      waveform: bool = False, dedup: bool = False) -> dict:
         """
         下载视频（或音频，根据你的实际业务逻辑）
         Args:
             url: 视频页面 URL 或视频直链
             page_number: 可选分页参数，用于批量下载等场景
+            chunk_seconds: 可选分段时长（秒），设置后下载完成的音频会被切分为分段
+            chunk_mode: 分段模式，'fixed' 固定时长 / 'silence' 在静音处切分
+            transcribe_engine: 可选转写引擎名称，设置后生成带时间戳的文稿
+            transcribe_workers: 转写工作进程数，默认为 CPU 核数
+            audio_profile: 音频输出配置，'standard' 或 'speech'（单声道 16 kHz 响度归一化）
+            trim_silence: 是否在提取音频时裁剪开头和中间的长静音
+            start: 可选片段开始时间（秒），只下载并转码该时间段
+            end: 可选片段结束时间（秒），None 表示到结尾
+            timeout_seconds: 可选任务期限（秒），超时后终止下载和 ffmpeg 并清理临时文件；
+                不能超过全局期限（AUDIO2NOTE_JOB_TIMEOUT_MINUTES）
+            profile: 是否用 cProfile 分析本任务，结果按任务ID保存在会话文件夹（.profile-<任务ID>.prof / .txt），
+                失败、取消和超时的任务同样保存
+            waveform: 是否生成多级波形峰值文件（<音频文件名>.peaks），供界面快速绘制波形
+            dedup: 是否按音频指纹查找内容相同的已有任务，找到时跳过后续阶段并关联到已有任务（需要 NumPy）
         Returns:
             dict: {
                 "success": bool,
+                "job_id": 任务ID（同一视频、同样的下载参数得到相同的ID）,
                 "files": list[下载的文件路径],
                 "session_folder": 下载文件所在目录,
-                "video_title": 视频标题
-            } 或者错误信息
+                "video_title": 视频标题,
+                "peaks": list[波形峰值文件路径]（仅启用波形时）,
+                "chunk_manifests": list[分段 manifest 路径]（仅启用分段时）,
+                "transcripts": list[文稿文件路径]（仅启用转写时）,
+                "cached_stages": list[直接复用缓存结果的阶段],
+                "silence_removed_seconds": 裁剪掉的静音秒数（仅启用静音裁剪时）,
+                "selected_formats": list[每个文件实际下载的源格式],
+                "duplicate_of": 内容相同的已有任务ID（仅启用去重且找到时，此时不执行后续阶段）,
+                "duplicate": 已有任务的标题、会话文件夹、文件及比特错误率、时间偏移,
+                "profile": 性能分析结果路径（仅启用性能分析时）
+            } 或者错误信息 {
+                "success": False,
+                "error": 错误信息,
+                "error_category": 错误类别（见 errors.ERROR_CATEGORIES）,
+                "retryable": 是否值得稍后重试,
+                "attempts": 实际尝试次数（获取信息或下载阶段失败时）,
+                "profile": 性能分析结果路径（仅启用性能分析且已确定任务ID时）
+            }（任务被取消或超时时另带有 "cancelled": True 和 "timed_out"）
+        """
+        job = JobContext(timeout_seconds, url)
+        profiler = JobProfiler() if profile else None
+        result = None
+        try:
+            with activate(job), profiler or nullcontext():
+                result = self._process_video(
+                    job, url, page_number, chunk_seconds, chunk_mode,
+                    transcribe_engine, transcribe_workers, audio_profile,
+                    trim_silence, start, end, waveform, dedup
+                )
+        except JobCancelled as e:
+            result = {"success": False, "error": str(e), "error_category": TIMEOUT if e.timed_out else CANCELLED,
+                      "retryable": False, "cancelled": True, "timed_out": e.timed_out}
+        except DownloadFailed as e:
+            result = {"success": False, **e.to_dict()}
+        finally:
+            # 慢任务和失败的任务最需要分析，无论结果如何都保存
+            if profiler:
+                self._save_profile(profiler, job, result)
+        return result
+
+    def _save_profile(self, profiler: JobProfiler, job: JobContext, result: Optional[dict]):
+        """
+        保存任务的性能分析结果，路径写入 result
+
+        成功的任务保存在会话文件夹；失败的任务不会登记到资料库，保存在下载根目录，
+        两者都可以按任务ID查询。任务ID尚未确定时（获取视频信息阶段失败）无法查询，不保存
         """
+        if not job.job_id:
+            return
+        succeeded = bool(result and result.get("success"))
+        folder = result["session_folder"] if succeeded else self.temp_dir
+        title = f"{job.job_id} {(result or {}).get('video_title') or job.url or ''}"
+        path = profiler.save(folder, job.job_id, title)
+        if path and result is not None:
+            result["profile"] = path
+
+    def _process_video(self, job: JobContext, url: str, page_number: int,
+                       chunk_seconds: int, chunk_mode: str,
+                       transcribe_engine: str, transcribe_workers: int,
+                       audio_profile: str, trim_silence: bool,
+                       start: float, end: float, waveform: bool, dedup: bool) -> dict:
+        """process_video 的实际处理流程，在已激活的任务中运行"""
         try:
             print(f"ProcessService: 下载目录 = {self.temp_dir}")
             
@@ -37,32 +150,337 @@ class ProcessService:
                 print(f"创建下载目录: {self.temp_dir}")
                 os.makedirs(self.temp_dir, exist_ok=True)
             
-            downloader = AudioDownloader()
-            video_title = downloader.get_video_title(url)
-            if not video_title:
-                return {"success": False, "error": "无法获取视频标题"}
-
-            # 创建以视频标题命名的文件夹，用于存放下载内容
-            session_folder = os.path.join(self.temp_dir, video_title)
-            print(f"创建会话文件夹: {session_folder}")
-            os.makedirs(session_folder, exist_ok=True)
-
-            # 使用指定目录的 downloader 实例进行下载
-            downloader = AudioDownloader(session_folder)
-            download_success = downloader.download_audio(url, page_number)
-
-            if not download_success:
-                return {"success": False, "error": "视频下载失败"}
-
-            # 列出下载的文件
-            files = [os.path.join(session_folder, f) for f in os.listdir(session_folder)]
-
-            return {
-                "success": True,
-                "files": files,
-                "session_folder": session_folder,
-                "video_title": video_title
+            downloader = AudioDownloader(profile=audio_profile, trim_silence=trim_silence)
+            info = self.retry_policy.run(lambda: downloader.fetch_video_info(url), "获取视频信息")
+            video_title = info.get('title', '未知标题')
+            video_id = canonical_video_id(info)
+
+            cached_stages = []
+
+            # 同一视频已下载过且下载参数未变时，直接复用已有音频
+            files = None
+            audio_data = {}
+            audio_params = {
+                "video_id": video_id,
+                "page_number": page_number,
+                "start": start,
+                "end": end,
+                **self._download_params(downloader),
             }
+            audio_key = StageCache.make_key("audio", audio_params)
+            job_id = audio_key[:16] if video_id else uuid.uuid4().hex[:16]
+            # 登记后可通过任务ID查询和取消
+            register(job_id, job)
+            job.check()
+            # 会话文件夹先标记为使用中再确认存在，查找或创建之后到开始下载之前不会被清理线程删除
+            session_folder = None
+            if video_id:
+                session_folder = self._acquire_folder(lambda: self.session_index.lookup(video_id))
+            try:
+                if session_folder:
+                    hit = StageCache(session_folder).get("audio", audio_key)
+                    if hit:
+                        files = hit["outputs"]
+                        audio_data = hit["data"]
+                        cached_stages.append("audio")
+
+                if files is None:
+                    # 下载前检查磁盘空间和目录配额，避免下载完成后才在转码阶段失败
+                    required_bytes = self.storage.estimate_required_bytes(
+                        self._clip_info(self._select_entries(info, page_number), start, end),
+                        int(AUDIO_PROFILES[audio_profile]['quality'])
+                    )
+                    enough, space_error = self.storage.check_space(required_bytes)
+                    if not enough:
+                        raise DownloadFailed(space_error, DISK_FULL)
+
+                    # 会话文件夹以 "标题 [视频ID]" 命名，同名的不同视频互不干扰
+                    if session_folder is None:
+                        if video_id:
+                            session_folder = self._acquire_folder(
+                                lambda: self.session_index.get_or_create(video_id, video_title))
+                        else:
+                            session_folder = self._acquire_folder(
+                                lambda: self._make_folder(sanitize_filename(video_title)))
+                print(f"会话文件夹: {session_folder}")
+
+                cache = StageCache(session_folder)
+
+                if files is None:
+                    # 使用指定目录的 downloader 实例进行下载
+                    downloader = AudioDownloader(session_folder, audio_profile, trim_silence)
+                    files = self.retry_policy.run(
+                        lambda: downloader.download_audio(url, page_number, start, end), "下载音频")
+                    if not files:
+                        raise DownloadFailed("未下载到任何音频文件（请检查分P编号）", UNAVAILABLE)
+                    files = [os.path.abspath(path) for path in files]
+                    audio_data["selected_formats"] = downloader.selected_formats
+                    if trim_silence:
+                        audio_data["silence_removed_seconds"] = downloader.silence_removed_seconds
+                    if video_id:
+                        cache.put("audio", audio_key, audio_params, files, audio_data)
+
+                result = {
+                    "success": True,
+                    "job_id": job_id,
+                    "files": files,
+                    "session_folder": session_folder,
+                    "video_title": video_title,
+                    **audio_data
+                }
+
+                # 可选：内容与已有任务相同时直接关联，不再执行后续阶段
+                check_current()
+                duplicate = self._find_duplicate(job_id, files) if dedup else None
+                if duplicate:
+                    result["duplicate_of"] = duplicate["job_id"]
+                    result["duplicate"] = duplicate
+                else:
+                    self._run_stages(cache, files, result, cached_stages, waveform,
+                                     chunk_seconds, chunk_mode, transcribe_engine, transcribe_workers)
+            finally:
+                if session_folder:
+                    self.storage.release(session_folder)
 
+            result["cached_stages"] = sorted(set(cached_stages))
+
+            try:
+                self.library.record(job_id, result, info, url, video_id)
+            except Exception as e:
+                print(f"⚠️ 写入资料库失败: {e}")
+            return result
+
+        except (JobCancelled, DownloadFailed):
+            raise
         except Exception as e:
-            return {"success": False, "error": str(e)}
+            return {"success": False, **DownloadFailed.from_exception(e).to_dict()}
+
+    def _acquire_folder(self, resolve) -> Optional[str]:
+        """
+        查找或创建会话文件夹，并在标记为使用中之后确认它仍然存在
+
+        标记之前文件夹可能已被并发任务的空间清理或后台清理删除，此时重新查找或创建
+
+        Args:
+            resolve: 返回会话文件夹路径的函数（查找不到时返回 None）
+
+        Returns:
+            Optional[str]: 已标记为使用中的会话文件夹，查找不到时返回 None
+        """
+        while True:
+            folder = resolve()
+            if folder is None:
+                return None
+            self.storage.acquire(folder)
+            if os.path.isdir(folder):
+                return folder
+            self.storage.release(folder)
+
+    def _make_folder(self, name: str) -> str:
+        """在下载目录下创建（或复用）指定名称的会话文件夹"""
+        folder = os.path.join(self.temp_dir, name)
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def _run_stages(self, cache: StageCache, files: list, result: dict, cached_stages: list,
+                    waveform: bool, chunk_seconds: int, chunk_mode: str,
+                    transcribe_engine: str, transcribe_workers: int):
+        """音频之后的可选阶段（波形、分段、转写），输出写入 result"""
+        # 可选：生成波形峰值，界面无需下载和解码整段音频即可绘制波形
+        check_current()
+        if waveform:
+            try:
+                result["peaks"] = [self._run_waveform(cache, path, cached_stages) for path in files]
+            except RuntimeError as e:
+                raise DownloadFailed(f"波形生成失败: {e}", classify_error(e))
+
+        # 可选：把整段音频切分为分段，供后续步骤并行处理
+        manifests = []
+        check_current()
+        if chunk_seconds:
+            chunker = AudioChunker(chunk_seconds, chunk_mode)
+            try:
+                manifests = [self._run_chunking(cache, chunker, path, cached_stages)
+                             for path in files]
+            except RuntimeError as e:
+                raise DownloadFailed(f"音频分段失败: {e}", classify_error(e))
+            result["chunk_manifests"] = [m["manifest_path"] for m in manifests]
+
+        # 可选：按分段并行转写，在音频旁生成文稿
+        if transcribe_engine:
+            transcriber = Transcriber(transcribe_engine, transcribe_workers)
+            transcripts = []
+            try:
+                for i, path in enumerate(files):
+                    chunks = manifests[i]["chunks"] if manifests else None
+                    transcripts.append(self._run_transcription(
+                        cache, transcriber, path, chunks, cached_stages))
+            except RuntimeError as e:
+                raise DownloadFailed(f"音频转写失败: {e}", classify_error(e))
+            result["transcripts"] = transcripts
+
+    def _find_duplicate(self, job_id: str, files: list) -> Optional[dict]:
+        """
+        去重阶段：按音频指纹查找内容相同的已有任务
+
+        只处理单个音频文件的任务（多P视频不去重）；已判定过的任务直接使用索引中的关联，
+        不再重复计算指纹
+
+        Returns:
+            Optional[dict]: 已有任务的信息，没有重复时返回 None
+        """
+        if len(files) != 1:
+            return None
+
+        link = self.fingerprints.get_link(job_id)
+        if link is None:
+            if self.fingerprints.contains(job_id):
+                return None
+            try:
+                fingerprint = compute_fingerprint(files[0])
+            except RuntimeError as e:
+                print(f"⚠️ 音频指纹计算失败，跳过去重: {e}")
+                return None
+            link = self.fingerprints.match_or_add(
+                job_id, fingerprint, lambda existing_id: self.library.get(existing_id) is not None)
+            if link is None:
+                return None
+
+        existing = self.library.get(link["duplicate_of"])
+        if existing is None:
+            # 已有任务的会话文件夹已被清理
+            self.fingerprints.remove(link["duplicate_of"])
+            return None
+
+        print(f"🔗 与已有任务内容相同，跳过后续阶段: {existing['title']} ({existing['job_id']})")
+        return {
+            "job_id": existing["job_id"],
+            "video_title": existing["title"],
+            "session_folder": existing["session_folder"],
+            "files": existing["files"],
+            "bit_error_rate": link["bit_error_rate"],
+            "offset_seconds": link["offset_seconds"],
+        }
+
+    @staticmethod
+    def _download_params(downloader: AudioDownloader) -> dict:
+        """影响下载输出的参数，参与音频阶段的缓存键计算"""
+        return {
+            "format": downloader.format_policy.describe(),
+            "postprocessors": downloader.ydl_opts.get("postprocessors"),
+            "postprocessor_args": downloader.ydl_opts.get("postprocessor_args"),
+        }
+
+    @staticmethod
+    def _run_waveform(cache: StageCache, audio_path: str, cached_stages: list) -> str:
+        """波形阶段：音频内容和峰值参数不变时复用已有峰值文件"""
+        params = {
+            "version": PEAKS_VERSION,
+            "sample_rate": PEAKS_SAMPLE_RATE,
+            "samples_per_bin": BASE_SAMPLES_PER_BIN,
+            "levels": [LEVEL_FACTOR, LEVEL_COUNT],
+        }
+        key = cache.make_key("peaks", params, [audio_path])
+        hit = cache.get("peaks", key)
+        if hit:
+            cached_stages.append("peaks")
+            return hit["outputs"][0]
+
+        peaks = generate_peaks(audio_path)
+        cache.put("peaks", key, params, [peaks["path"]])
+        return peaks["path"]
+
+    @staticmethod
+    def _run_chunking(cache: StageCache, chunker: AudioChunker,
+                      audio_path: str, cached_stages: list) -> dict:
+        """分段阶段：音频内容和分段参数不变时复用已有分段"""
+        params = {"chunk_seconds": chunker.chunk_seconds, "mode": chunker.mode}
+        key = cache.make_key("chunks", params, [audio_path])
+        hit = cache.get("chunks", key)
+        if hit:
+            cached_stages.append("chunks")
+            return load_manifest(hit["data"]["manifest_path"])
+
+        manifest = chunker.split(audio_path)
+        outputs = [manifest["manifest_path"]] + [c["path"] for c in manifest["chunks"]]
+        cache.put("chunks", key, params, outputs, {"manifest_path": manifest["manifest_path"]})
+        return manifest
+
+    @staticmethod
+    def _run_transcription(cache: StageCache, transcriber: Transcriber, audio_path: str,
+                           chunks: list, cached_stages: list) -> str:
+        """转写阶段：输入音频（或分段）和引擎不变时复用已有文稿"""
+        inputs = [c["path"] for c in chunks] if chunks else [audio_path]
+        params = {
+            "engine": transcriber.engine,
+            "offsets": [c["start"] for c in chunks] if chunks else [0.0],
+        }
+        key = cache.make_key("transcript", params, inputs)
+        hit = cache.get("transcript", key)
+        if hit:
+            cached_stages.append("transcript")
+            return hit["data"]["text_path"]
+
+        transcript = transcriber.transcribe(audio_path, chunks)
+        outputs = [transcript["transcript_path"], transcript["text_path"]]
+        cache.put("transcript", key, params, outputs, {"text_path": transcript["text_path"]})
+        return transcript["text_path"]
+
+    @staticmethod
+    def _select_entries(info: dict, page_number: int = None) -> dict:
+        """
+        只保留本次实际要下载的分P，用于空间预估
+
+        Args:
+            info: yt-dlp 提取的视频信息
+            page_number: 分P编号（从1开始），None 表示全部
+
+        Returns:
+            dict: 用于预估的视频信息
+        """
+        entries = info.get('entries')
+        if page_number is None or not entries:
+            return info
+
+        entries = list(entries)
+        if 1 <= page_number <= len(entries):
+            return entries[page_number - 1]
+        return info
+
+    @staticmethod
+    def _clip_info(info: dict, start: float = None, end: float = None) -> dict:
+        """
+        按时间段缩放视频信息中的时长和文件大小，用于空间预估
+
+        Args:
+            info: yt-dlp 提取的视频信息（单个视频或多P）
+            start: 片段开始时间（秒）
+            end: 片段结束时间（秒）
+
+        Returns:
+            dict: 用于预估的视频信息
+        """
+        if start is None and end is None:
+            return info
+
+        if info.get('entries'):
+            return {**info, 'entries': [ProcessService._clip_info(e, start, end)
+                                        for e in info['entries'] if e]}
+
+        duration = info.get('duration')
+        if not duration:
+            return info
+
+        clip = max(min(end if end is not None else duration, duration) - (start or 0), 0)
+        ratio = clip / duration
+        clipped = {**info, 'duration': clip}
+        for key in ('filesize', 'filesize_approx'):
+            if clipped.get(key):
+                clipped[key] = int(clipped[key] * ratio)
+        if clipped.get('requested_formats'):
+            clipped['requested_formats'] = [
+                {k: (int(v * ratio) if k in ('filesize', 'filesize_approx') and v else v)
+                 for k, v in f.items()}
+                for f in clipped['requested_formats']
+            ]
+        return clipped
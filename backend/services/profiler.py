@@ -0,0 +1,116 @@
+"""
+视记 - 任务性能分析模块
+
+功能：
+- 对单个任务开启 cProfile，分析 ProcessService、yt-dlp 下载与后处理以及本项目代码的耗时热点
+- 分析结果按任务ID保存在任务的会话文件夹中：.profile-<任务ID>.prof（pstats 格式，可用 snakeviz 等工具查看）
+  和 .profile-<任务ID>.txt（按累计耗时排序的文本报告）；同一视频不同参数的任务共用会话文件夹，互不覆盖
+- 失败、取消和超时的任务同样保存分析结果（这些任务不登记到资料库，保存在下载根目录）
+- cProfile 只统计开启它的线程；ffmpeg 子进程和转写进程池的耗时体现为等待时间
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import time
+from typing import List, Optional
+
+
+PROFILE_PREFIX = ".profile-"
+
+# 文本报告中列出的函数数
+REPORT_LIMIT = 60
+
+
+class JobProfiler:
+    """
+    单个任务的性能分析器，在执行任务的线程中作为上下文管理器使用
+    """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.enabled = False
+        self.wall_seconds = 0.0
+        self._started_at = 0.0
+
+    def __enter__(self) -> 'JobProfiler':
+        try:
+            self.profile.enable()
+            self.enabled = True
+        except ValueError as e:
+            # Python 3.12+ 同一时间只能有一个分析器处于开启状态
+            print(f"⚠️ 无法开启性能分析（已有其他任务在分析中）: {e}")
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_seconds = time.perf_counter() - self._started_at
+        if self.enabled:
+            self.profile.disable()
+        return False
+
+    def report(self, title: str = "") -> str:
+        """
+        生成文本报告
+
+        Args:
+            title (str): 报告标题（如任务ID和视频标题）
+
+        Returns:
+            str: 按累计耗时排序的前 REPORT_LIMIT 个函数
+        """
+        stream = io.StringIO()
+        stream.write(f"{title}\n任务总耗时: {self.wall_seconds:.2f}s\n\n")
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_LIMIT)
+        return stream.getvalue()
+
+    def save(self, folder: str, job_id: str, title: str = "") -> Optional[str]:
+        """
+        把分析结果保存到会话文件夹
+
+        Args:
+            folder (str): 会话文件夹
+            job_id (str): 任务ID，用于文件名
+            title (str): 报告标题
+
+        Returns:
+            Optional[str]: pstats 文件路径；分析未能开启或保存失败时返回 None
+        """
+        if not self.enabled:
+            return None
+        path = profile_path(folder, job_id, report=False)
+        try:
+            self.profile.dump_stats(path)
+            with open(profile_path(folder, job_id), 'w', encoding='utf-8') as f:
+                f.write(self.report(title))
+        except OSError as e:
+            print(f"⚠️ 保存性能分析结果失败: {e}")
+            return None
+        print(f"⏱️ 性能分析结果已保存: {path}")
+        return path
+
+
+def profile_path(folder: str, job_id: str, report: bool = True) -> str:
+    """任务的性能分析文件路径（report 为 True 时为文本报告，否则为 pstats 文件）"""
+    return os.path.join(folder, f"{PROFILE_PREFIX}{job_id}{'.txt' if report else '.prof'}")
+
+
+def find_profile(folders: List[str], job_id: str, report: bool = True) -> Optional[str]:
+    """
+    按任务ID查找性能分析结果
+
+    Args:
+        folders (List[str]): 依次查找的文件夹（任务的会话文件夹、下载根目录）
+        job_id (str): 任务ID
+        report (bool): True 返回文本报告路径，False 返回 pstats 文件路径
+
+    Returns:
+        Optional[str]: 文件路径，未做过性能分析时返回 None
+    """
+    for folder in folders:
+        path = profile_path(folder, job_id, report)
+        if os.path.isfile(path):
+            return path
+    return None
@@ -0,0 +1,174 @@
+"""
+视记 - 会话文件夹索引模块
+
+功能：
+- 以 "清洗后的标题 [视频ID]" 命名会话文件夹，避免同名视频共用文件夹
+- 在下载目录中维护视频ID到会话文件夹的索引文件，O(1) 查找已有会话
+- 索引写入采用临时文件 + 原子替换，支持多任务并发读写
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+
+# 索引文件名（隐藏文件，清理线程只处理文件夹，不会误删）
+INDEX_FILENAME = ".session_index.json"
+
+# 会话文件夹名中标题部分的最大长度，避免超过文件系统路径限制
+MAX_TITLE_LENGTH = 80
+
+# Windows 保留设备名
+_RESERVED_NAMES = {
+    'CON', 'PRN', 'AUX', 'NUL',
+    *(f'COM{i}' for i in range(1, 10)),
+    *(f'LPT{i}' for i in range(1, 10)),
+}
+
+
+def canonical_video_id(info: dict) -> Optional[str]:
+    """
+    根据 yt-dlp 提取的视频信息生成规范的视频ID
+
+    同一视频的不同链接形式（youtu.be / watch?v= / 带追踪参数）得到相同的ID
+
+    Args:
+        info (dict): yt-dlp extract_info 的返回结果
+
+    Returns:
+        Optional[str]: 形如 "youtube-dQw4w9WgXcQ" 的ID，信息不完整时返回 None
+    """
+    video_id = info.get('id')
+    if not video_id:
+        return None
+    extractor = (info.get('extractor_key') or info.get('extractor') or 'video').lower()
+    return f"{extractor}-{video_id}"
+
+
+def sanitize_filename(name: str, max_length: int = MAX_TITLE_LENGTH) -> str:
+    """
+    清洗文件名：移除路径分隔符、保留字符和控制字符，截断过长的名称
+
+    Args:
+        name (str): 原始名称
+        max_length (int): 最大长度
+
+    Returns:
+        str: 可安全用作文件夹名的字符串
+    """
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', name or '')
+    name = re.sub(r'\s+', ' ', name).strip(' .')
+    if name.upper() in _RESERVED_NAMES:
+        name = f'_{name}'
+    return name[:max_length].rstrip(' .') or 'untitled'
+
+
+class SessionIndex:
+    """
+    会话文件夹索引
+
+    索引文件内容：{视频ID: {"folder": 文件夹名, "title": 标题}}
+    文件夹名以相对下载目录的形式保存，下载目录整体移动后索引仍然有效
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        Args:
+            root_dir (str): 下载根目录
+        """
+        self.root_dir = root_dir
+        self.index_path = os.path.join(root_dir, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 会话索引损坏，将重新建立: {e}")
+            return {}
+
+    def _save(self):
+        """原子写入索引文件（调用方需持有锁）"""
+        os.makedirs(self.root_dir, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def lookup(self, video_id: str) -> Optional[str]:
+        """
+        查找视频对应的会话文件夹
+
+        Args:
+            video_id (str): 规范视频ID
+
+        Returns:
+            Optional[str]: 会话文件夹路径；未记录或文件夹已被清理时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if not entry:
+                return None
+
+            folder = os.path.join(self.root_dir, entry['folder'])
+            if not os.path.isdir(folder):
+                # 文件夹已被清理，同步移除索引项
+                del self._entries[video_id]
+                self._save()
+                return None
+            return folder
+
+    def get_or_create(self, video_id: str, title: str) -> str:
+        """
+        获取视频对应的会话文件夹，不存在时按 "标题 [视频ID]" 创建并登记
+
+        Args:
+            video_id (str): 规范视频ID
+            title (str): 视频标题
+
+        Returns:
+            str: 会话文件夹路径
+        """
+        folder = self.lookup(video_id)
+        if folder:
+            return folder
+
+        name = f"{sanitize_filename(title)} [{sanitize_filename(video_id)}]"
+        folder = os.path.join(self.root_dir, name)
+        os.makedirs(folder, exist_ok=True)
+
+        with self._lock:
+            self._entries[video_id] = {'folder': name, 'title': title}
+            self._save()
+        return folder
+
+
+# 每个下载目录共享一个索引实例，保证同一进程内的并发任务看到一致的数据
+_indexes: Dict[str, SessionIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_session_index(root_dir: str) -> SessionIndex:
+    """
+    获取（或创建）指定下载目录的会话索引
+
+    Args:
+        root_dir (str): 下载根目录
+
+    Returns:
+        SessionIndex: 会话索引实例
+    """
+    key = os.path.abspath(root_dir)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = SessionIndex(root_dir)
+            _indexes[key] = index
+        return index
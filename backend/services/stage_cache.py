@@ -0,0 +1,178 @@
+"""
+视记 - 流水线阶段缓存模块
+
+功能：
+- 按 "阶段名 + 阶段参数 + 输入文件内容哈希" 计算缓存键
+- 记录每个阶段的输出文件（路径、大小、修改时间、内容哈希）
+- 重新运行时只要输入和参数不变、输出文件未被改动，就直接复用上次结果
+
+缓存记录保存在会话文件夹的 .cache/ 下，随会话文件夹一起被清理
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+CACHE_DIRNAME = ".cache"
+
+# 文件内容哈希的内存缓存：(绝对路径, 大小, 修改时间) -> sha256；
+# 按最近使用淘汰，长时间运行的服务中不会无限增长
+DIGEST_MEMO_SIZE = 4096
+_digest_memo: 'OrderedDict[Tuple[str, int, int], str]' = OrderedDict()
+_digest_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """
+    计算文件内容的 sha256，文件未变化时直接返回缓存的结果
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        cached = _digest_memo.get(memo_key)
+        if cached:
+            _digest_memo.move_to_end(memo_key)
+            return cached
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    value = digest.hexdigest()
+
+    _remember_digest(path, st.st_size, st.st_mtime_ns, value)
+    return value
+
+
+def _remember_digest(path: str, size: int, mtime_ns: int, value: str):
+    memo_key = (os.path.abspath(path), size, mtime_ns)
+    with _digest_lock:
+        _digest_memo[memo_key] = value
+        _digest_memo.move_to_end(memo_key)
+        while len(_digest_memo) > DIGEST_MEMO_SIZE:
+            _digest_memo.popitem(last=False)
+
+
+class StageCache:
+    """
+    单个会话文件夹内的阶段缓存
+    """
+
+    def __init__(self, session_folder: str):
+        """
+        Args:
+            session_folder (str): 会话文件夹路径
+        """
+        self.cache_dir = os.path.join(session_folder, CACHE_DIRNAME)
+
+    @staticmethod
+    def make_key(stage: str, params: dict, input_files: Optional[List[str]] = None) -> str:
+        """
+        计算阶段缓存键
+
+        Args:
+            stage (str): 阶段名，如 audio / chunks / transcript
+            params (dict): 阶段参数（需可 JSON 序列化）
+            input_files (list, optional): 输入文件，按内容哈希参与计算
+
+        Returns:
+            str: 缓存键
+        """
+        payload = {
+            'stage': stage,
+            'params': params,
+            'inputs': [file_digest(path) for path in input_files or []],
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _record_path(self, stage: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{stage}-{key[:32]}.json")
+
+    def get(self, stage: str, key: str) -> Optional[dict]:
+        """
+        读取阶段缓存
+
+        输出文件缺失或大小/修改时间与记录不一致时视为失效
+
+        Args:
+            stage (str): 阶段名
+            key (str): 缓存键
+
+        Returns:
+            Optional[dict]: 缓存记录 {"outputs": [路径], "data": {...}}，未命中返回 None
+        """
+        try:
+            with open(self._record_path(stage, key), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if record.get('key') != key:
+            return None
+
+        for output in record['outputs']:
+            try:
+                st = os.stat(output['path'])
+            except OSError:
+                return None
+            if st.st_size != output['size'] or st.st_mtime_ns != output['mtime_ns']:
+                return None
+
+        # 输出文件未变化，其哈希可直接供下游阶段计算缓存键
+        for output in record['outputs']:
+            _remember_digest(output['path'], output['size'], output['mtime_ns'], output['sha256'])
+
+        print(f"♻️ 命中阶段缓存: {stage}")
+        return {
+            'outputs': [output['path'] for output in record['outputs']],
+            'data': record.get('data') or {},
+        }
+
+    def put(self, stage: str, key: str, params: dict, outputs: List[str], data: dict = None):
+        """
+        写入阶段缓存
+
+        Args:
+            stage (str): 阶段名
+            key (str): 缓存键
+            params (dict): 阶段参数（仅用于排查问题）
+            outputs (list): 阶段输出文件路径
+            data (dict, optional): 需要随缓存保存的附加结果
+        """
+        output_entries = []
+        for path in outputs:
+            st = os.stat(path)
+            output_entries.append({
+                'path': os.path.abspath(path),
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'sha256': file_digest(path),
+            })
+
+        record = {
+            'stage': stage,
+            'key': key,
+            'params': params,
+            'created_at': time.time(),
+            'outputs': output_entries,
+            'data': data or {},
+        }
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._record_path(stage, key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
@@ -0,0 +1,394 @@
+"""
+视记 - 下载目录存储管理模块
+
+功能：
+- 下载前根据视频信息（文件大小/时长）预估所需空间并检查磁盘剩余容量
+- 按下载目录设置配额，超出配额时拒绝新任务或触发清理
+- 后台清理线程按最近使用时间 (LRU) / 最大保留时长淘汰旧的会话文件夹
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# 默认 MP3 输出码率 (kbps)，与 AudioDownloader 中的 preferredquality 保持一致
+DEFAULT_AUDIO_KBPS = 192
+
+# 无法获取时长/大小时的保守预估值：按 1 小时音视频计算
+FALLBACK_DURATION_SECONDS = 3600
+FALLBACK_SOURCE_KBPS = 320
+
+# 预估值的安全系数，覆盖临时文件、封装开销等
+ESTIMATE_SAFETY_FACTOR = 1.2
+
+# 磁盘至少保留的空闲空间
+DEFAULT_MIN_FREE_BYTES = 512 * 1024 * 1024
+
+# 待删除文件夹的名称前缀（隐藏文件夹，不会被当作会话文件夹）
+TRASH_PREFIX = ".trash-"
+
+
+class StorageManager:
+    """
+    下载目录存储管理器
+
+    每个下载目录对应一个实例（通过 get_storage_manager 获取），负责：
+    空间预检、目录配额统计以及旧会话文件夹的淘汰
+    """
+
+    def __init__(self, root_dir: str,
+                 quota_bytes: Optional[int] = None,
+                 max_age_seconds: Optional[int] = None,
+                 min_free_bytes: int = DEFAULT_MIN_FREE_BYTES):
+        """
+        Args:
+            root_dir (str): 下载根目录，其下每个子文件夹视为一个会话文件夹
+            quota_bytes (int, optional): 目录配额（字节），None 表示不限制
+            max_age_seconds (int, optional): 会话文件夹最长保留时间，None 表示不按时间淘汰
+            min_free_bytes (int): 磁盘至少保留的空闲空间
+        """
+        self.root_dir = root_dir
+        self.quota_bytes = quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self.min_free_bytes = min_free_bytes
+
+        # 正在使用中的会话文件夹（路径 -> 使用中的任务数）不会被清理
+        self._active = Counter()
+        self._lock = threading.Lock()
+        self._janitor_thread = None
+        self._stop_event = threading.Event()
+        # 会话文件夹被清理后的回调（资料库等据此同步删除记录）
+        self._eviction_listeners: List[Callable[[str], None]] = []
+
+    # ------------------------------------------------------------------
+    # 空间预估与预检
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def estimate_required_bytes(info: Optional[dict],
+                                audio_kbps: int = DEFAULT_AUDIO_KBPS) -> int:
+        """
+        根据 yt-dlp 提取的视频信息预估一次任务所需的磁盘空间
+
+        所需空间 = 源文件大小（下载） + MP3 输出大小（转码），多P视频逐P累加
+
+        Args:
+            info (dict): yt-dlp extract_info 的返回结果
+            audio_kbps (int): 输出音频码率
+
+        Returns:
+            int: 预估字节数
+        """
+        if not info:
+            return int(FALLBACK_DURATION_SECONDS * (FALLBACK_SOURCE_KBPS + audio_kbps)
+                       * 1000 / 8 * ESTIMATE_SAFETY_FACTOR)
+
+        entries = info.get('entries')
+        if entries:
+            return sum(StorageManager.estimate_required_bytes(entry, audio_kbps)
+                       for entry in entries if entry)
+
+        duration = info.get('duration') or 0
+        source_bytes = info.get('filesize') or info.get('filesize_approx')
+
+        # 已选择的格式中可能带有更精确的大小
+        if not source_bytes:
+            requested = info.get('requested_formats') or []
+            sizes = [f.get('filesize') or f.get('filesize_approx') or 0 for f in requested]
+            source_bytes = sum(sizes) or None
+
+        if not source_bytes:
+            kbps = info.get('abr') or info.get('tbr') or FALLBACK_SOURCE_KBPS
+            source_bytes = (duration or FALLBACK_DURATION_SECONDS) * kbps * 1000 / 8
+
+        output_bytes = (duration or FALLBACK_DURATION_SECONDS) * audio_kbps * 1000 / 8
+        return int((source_bytes + output_bytes) * ESTIMATE_SAFETY_FACTOR)
+
+    def check_space(self, required_bytes: int) -> Tuple[bool, Optional[str]]:
+        """
+        检查磁盘剩余空间和目录配额是否足够
+
+        空间不足时会先尝试按 LRU 清理旧会话文件夹，再重新检查
+
+        Args:
+            required_bytes (int): 预估所需字节数
+
+        Returns:
+            tuple: (是否足够, 不足时的错误信息)
+        """
+        ok, error = self._check_space_once(required_bytes)
+        if ok:
+            return True, None
+
+        print(f"⚠️ 空间不足，尝试清理旧会话文件夹: {error}")
+        self.evict(required_bytes)
+        return self._check_space_once(required_bytes)
+
+    def _check_space_once(self, required_bytes: int) -> Tuple[bool, Optional[str]]:
+        os.makedirs(self.root_dir, exist_ok=True)
+        free = shutil.disk_usage(self.root_dir).free
+        if free - required_bytes < self.min_free_bytes:
+            return False, (f"磁盘空间不足: 需要约 {_format_size(required_bytes)}，"
+                           f"剩余 {_format_size(free)}")
+
+        if self.quota_bytes is not None:
+            used = self.get_usage()
+            if used + required_bytes > self.quota_bytes:
+                return False, (f"超出下载目录配额: 已用 {_format_size(used)}，"
+                               f"需要约 {_format_size(required_bytes)}，"
+                               f"配额 {_format_size(self.quota_bytes)}")
+
+        return True, None
+
+    # ------------------------------------------------------------------
+    # 使用统计
+    # ------------------------------------------------------------------
+
+    def get_usage(self) -> int:
+        """
+        统计下载目录当前占用的总字节数
+
+        Returns:
+            int: 字节数
+        """
+        return sum(size for _, size, _ in self._list_sessions())
+
+    def _list_sessions(self) -> List[Tuple[str, int, float]]:
+        """
+        列出所有会话文件夹（隐藏文件夹不是会话文件夹，不统计也不清理）
+
+        Returns:
+            list: [(路径, 占用字节数, 最近使用时间)]
+        """
+        sessions = []
+        if not os.path.isdir(self.root_dir):
+            return sessions
+
+        with os.scandir(self.root_dir) as it:
+            for entry in it:
+                if not entry.is_dir(follow_symlinks=False) or entry.name.startswith('.'):
+                    continue
+                size, last_used = _dir_stats(entry.path)
+                sessions.append((entry.path, size, last_used))
+        return sessions
+
+    # ------------------------------------------------------------------
+    # 会话文件夹的使用标记
+    # ------------------------------------------------------------------
+
+    def acquire(self, session_folder: str):
+        """标记会话文件夹正在使用，清理时跳过（可在文件夹创建之前调用）"""
+        with self._lock:
+            self._active[os.path.abspath(session_folder)] += 1
+
+    def release(self, session_folder: str):
+        """取消会话文件夹的使用标记，并刷新其最近使用时间"""
+        path = os.path.abspath(session_folder)
+        with self._lock:
+            self._active[path] -= 1
+            if self._active[path] <= 0:
+                del self._active[path]
+        touch(path)
+
+    # ------------------------------------------------------------------
+    # 清理
+    # ------------------------------------------------------------------
+
+    def evict(self, required_bytes: int = 0) -> List[str]:
+        """
+        淘汰旧会话文件夹
+
+        规则：
+        1. 超过 max_age_seconds 未使用的文件夹全部删除
+        2. 按最近使用时间从旧到新删除，直到满足配额和磁盘空间要求
+
+        Args:
+            required_bytes (int): 需要额外腾出的字节数
+
+        Returns:
+            list: 被删除的会话文件夹路径
+        """
+        removed = []
+        now = time.time()
+        self._purge_trash()
+
+        with self._lock:
+            active = set(self._active)
+
+        sessions = [s for s in self._list_sessions() if os.path.abspath(s[0]) not in active]
+        sessions.sort(key=lambda s: s[2])
+        used = self.get_usage()
+
+        for path, size, last_used in sessions:
+            expired = self.max_age_seconds is not None and now - last_used > self.max_age_seconds
+            over_quota = self.quota_bytes is not None and used + required_bytes > self.quota_bytes
+            low_disk = shutil.disk_usage(self.root_dir).free - required_bytes < self.min_free_bytes
+
+            if not (expired or over_quota or low_disk):
+                continue
+
+            # 确认未被使用和移走在同一把锁内完成，刚被任务标记的文件夹不会被删除；
+            # 耗时的删除在锁外进行，不阻塞其他任务查找和标记文件夹
+            trash_path = os.path.join(self.root_dir, f"{TRASH_PREFIX}{uuid.uuid4().hex}")
+            with self._lock:
+                if os.path.abspath(path) in self._active:
+                    continue
+                try:
+                    os.rename(path, trash_path)
+                except OSError as e:
+                    print(f"❌ 清理会话文件夹失败: {path}: {e}")
+                    continue
+
+            try:
+                shutil.rmtree(trash_path)
+            except OSError as e:
+                # 文件夹已移走，剩余内容在下次清理时删除
+                print(f"⚠️ 删除会话文件夹未完成: {path}: {e}")
+
+            used -= size
+            removed.append(path)
+            print(f"🧹 已清理会话文件夹: {path} ({_format_size(size)})")
+            self._notify_evicted(path)
+
+        return removed
+
+    def _purge_trash(self):
+        """删除上次清理时未能删完的文件夹"""
+        if not os.path.isdir(self.root_dir):
+            return
+        with os.scandir(self.root_dir) as it:
+            leftovers = [entry.path for entry in it
+                         if entry.name.startswith(TRASH_PREFIX) and entry.is_dir(follow_symlinks=False)]
+        for path in leftovers:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def add_eviction_listener(self, callback: Callable[[str], None]):
+        """
+        登记会话文件夹被清理后的回调
+
+        Args:
+            callback: 以被清理的文件夹路径调用
+        """
+        with self._lock:
+            self._eviction_listeners.append(callback)
+
+    def _notify_evicted(self, path: str):
+        with self._lock:
+            listeners = list(self._eviction_listeners)
+        for callback in listeners:
+            try:
+                callback(path)
+            except Exception as e:
+                print(f"⚠️ 清理回调失败: {path}: {e}")
+
+    def start_janitor(self, interval_seconds: int = 600):
+        """
+        启动后台清理线程，定期执行 evict()
+
+        Args:
+            interval_seconds (int): 清理间隔（秒）
+        """
+        if self._janitor_thread and self._janitor_thread.is_alive():
+            return
+
+        self._stop_event.clear()
+
+        def _run():
+            while not self._stop_event.wait(interval_seconds):
+                try:
+                    self.evict()
+                except Exception as e:
+                    print(f"❌ 后台清理失败: {e}")
+
+        self._janitor_thread = threading.Thread(target=_run, name="storage-janitor", daemon=True)
+        self._janitor_thread.start()
+        print(f"🧹 后台清理线程已启动: {self.root_dir}（间隔 {interval_seconds}s）")
+
+    def stop_janitor(self):
+        """停止后台清理线程"""
+        self._stop_event.set()
+        if self._janitor_thread:
+            self._janitor_thread.join(timeout=5)
+            self._janitor_thread = None
+
+
+# 每个下载目录共享一个 StorageManager，保证配额统计和使用标记一致
+_managers: Dict[str, StorageManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_storage_manager(root_dir: str, **kwargs) -> StorageManager:
+    """
+    获取（或创建）指定下载目录的存储管理器
+
+    未传入的配置从环境变量读取：
+    - AUDIO2NOTE_QUOTA_MB: 目录配额（MB）
+    - AUDIO2NOTE_MAX_AGE_HOURS: 会话文件夹最长保留时间（小时）
+    - AUDIO2NOTE_MIN_FREE_MB: 磁盘至少保留的空闲空间（MB）
+
+    Args:
+        root_dir (str): 下载根目录
+        **kwargs: 传给 StorageManager 的配置，仅在首次创建时生效
+
+    Returns:
+        StorageManager: 存储管理器实例
+    """
+    key = os.path.abspath(root_dir)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            kwargs.setdefault('quota_bytes', _env_int('AUDIO2NOTE_QUOTA_MB', 1024 * 1024))
+            kwargs.setdefault('max_age_seconds', _env_int('AUDIO2NOTE_MAX_AGE_HOURS', 3600))
+            min_free = _env_int('AUDIO2NOTE_MIN_FREE_MB', 1024 * 1024)
+            if min_free is not None:
+                kwargs.setdefault('min_free_bytes', min_free)
+            manager = StorageManager(root_dir, **kwargs)
+            _managers[key] = manager
+        return manager
+
+
+def touch(path: str):
+    """刷新文件/文件夹的访问和修改时间，用于 LRU 统计"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _dir_stats(path: str) -> Tuple[int, float]:
+    """统计文件夹的总大小和最近使用时间（取文件夹及其中文件的最大 mtime）"""
+    total = 0
+    last_used = os.stat(path).st_mtime
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                st = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            total += st.st_size
+            last_used = max(last_used, st.st_mtime)
+    return total, last_used
+
+
+def _env_int(name: str, multiplier: int) -> Optional[int]:
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return int(float(value) * multiplier)
+    except ValueError:
+        print(f"⚠️ 环境变量 {name} 无效: {value}")
+        return None
+
+
+def _format_size(num_bytes: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f}TB"
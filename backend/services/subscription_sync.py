@@ -0,0 +1,293 @@
+"""
+视记 - 订阅同步模块
+
+功能：
+- 支持 YouTube 播放列表/频道、B站 UP主空间/合集/收藏夹 等集合链接作为订阅
+- 用 yt-dlp 的 extract_flat 只列出条目（每个列表一次请求），不解析每个视频；
+  频道主页列出的 "视频/短视频/直播" 等子列表逐个展开
+- 在下载目录中维护持久化的下载存档（已处理的条目ID），每次同步只处理新条目
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+
+# 下载存档文件名，格式与 yt-dlp 的 --download-archive 相同（每行 "提取器 视频ID"）
+ARCHIVE_FILENAME = ".download_archive.txt"
+# 订阅列表文件名
+SUBSCRIPTIONS_FILENAME = ".subscriptions.json"
+
+# 展开嵌套列表的最大层数（频道主页 -> 标签页 已经足够）
+MAX_NESTING_DEPTH = 2
+
+# 列出集合条目所需的 yt-dlp 提取器（单个视频的提取器见 ALLOWED_EXTRACTORS）
+COLLECTION_EXTRACTORS = [
+    'youtube:tab',
+    'youtube:playlist',
+    'youtube:user',
+    'bilibilispacevideo',
+    'bilibilicollectionlist',
+    'bilibiliserieslist',
+    'bilibilifavoriteslist',
+    'bilibiliplaylist',
+]
+
+_COLLECTION_PATTERNS = [
+    r'https?://(?:www\.|m\.)?youtube\.com/playlist\?(?:.*&)?list=[A-Za-z0-9_-]+',
+    r'https?://(?:www\.|m\.)?youtube\.com/(?:@[^/?#]+|channel/[A-Za-z0-9_-]+|c/[^/?#]+|user/[^/?#]+)',
+    r'https?://space\.bilibili\.com/\d+',
+    r'https?://(?:www\.)?bilibili\.com/(?:list|medialist/detail)/',
+]
+
+
+def is_collection_url(url: str) -> bool:
+    """
+    检查 URL 是否为播放列表、频道或收藏夹等集合链接
+
+    Args:
+        url (str): 链接
+
+    Returns:
+        bool: 是集合链接返回 True
+    """
+    url = (url or '').strip()
+    return any(re.match(pattern, url, re.IGNORECASE) for pattern in _COLLECTION_PATTERNS)
+
+
+def _entry_archive_id(entry: dict) -> Optional[str]:
+    """条目在下载存档中的ID，与 yt-dlp 的存档格式一致"""
+    extractor = entry.get('ie_key') or entry.get('extractor_key') or entry.get('extractor')
+    if not extractor or not entry.get('id'):
+        return None
+    return f"{extractor.lower()} {entry['id']}"
+
+
+class DownloadArchive:
+    """
+    下载存档：记录已成功处理的条目，追加写入，进程重启后仍然有效
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        Args:
+            root_dir (str): 下载根目录
+        """
+        self.path = os.path.join(root_dir, ARCHIVE_FILENAME)
+        self._lock = threading.Lock()
+        self._ids: Set[str] = self._load()
+
+    def _load(self) -> Set[str]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def __contains__(self, archive_id: str) -> bool:
+        with self._lock:
+            return archive_id in self._ids
+
+    def add(self, archive_id: str):
+        """登记一个已处理的条目"""
+        with self._lock:
+            if archive_id in self._ids:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(archive_id + '\n')
+            self._ids.add(archive_id)
+
+
+class SubscriptionSync:
+    """
+    订阅同步：列出集合中的条目，跳过存档中已有的，只处理新条目
+    """
+
+    def __init__(self, process_service):
+        """
+        Args:
+            process_service (ProcessService): 处理条目使用的服务（决定下载目录）
+        """
+        self.process_service = process_service
+        self.root_dir = process_service.temp_dir
+        self.archive = get_download_archive(self.root_dir)
+        self.subscriptions_path = os.path.join(self.root_dir, SUBSCRIPTIONS_FILENAME)
+
+    def list_entries(self, url: str) -> Optional[dict]:
+        """
+        只列出集合中的条目，不解析各个视频
+
+        Args:
+            url (str): 集合链接
+
+        Returns:
+            Optional[dict]: {"title": 集合标题, "entries": [{"archive_id", "url", "title"}]}，失败返回 None
+        """
+        try:
+            import yt_dlp
+            from .audio_downloader import ALLOWED_EXTRACTORS
+
+            with yt_dlp.YoutubeDL({
+                'quiet': True,
+                'extract_flat': 'in_playlist',
+                'allowed_extractors': ALLOWED_EXTRACTORS + COLLECTION_EXTRACTORS,
+                'socket_timeout': 30,
+            }) as ydl:
+                info = ydl.extract_info(url.strip(), download=False)
+                entries = []
+                self._collect_entries(ydl, info, entries, set(), MAX_NESTING_DEPTH)
+        except Exception as e:
+            print(f"❌ 获取订阅列表失败: {e}")
+            return None
+
+        return {'title': info.get('title'), 'entries': entries}
+
+    def _collect_entries(self, ydl, info: dict, entries: List[dict], seen: Set[str], depth: int):
+        """
+        收集列表中的视频条目，嵌套的子列表（如频道主页的 "视频/短视频/直播" 标签页）逐层展开
+
+        Args:
+            ydl: yt-dlp 实例（extract_flat 模式）
+            info: 列表信息
+            entries: 收集结果，按列表顺序追加 {"archive_id", "url", "title"}
+            seen: 已收集的存档ID和已展开的子列表链接，避免重复
+            depth: 还可以展开的层数
+        """
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            entry_url = entry.get('webpage_url') or entry.get('url')
+            if not entry_url:
+                continue
+
+            if entry.get('_type') == 'playlist' or is_collection_url(entry_url):
+                if entry_url in seen:
+                    continue
+                seen.add(entry_url)
+                if depth <= 0:
+                    print(f"⚠️ 嵌套层数过多，跳过子列表: {entry_url}")
+                    continue
+                # 已经带有条目的子列表直接展开，否则单独请求一次
+                nested = entry if entry.get('entries') is not None else \
+                    ydl.extract_info(entry_url, download=False)
+                self._collect_entries(ydl, nested, entries, seen, depth - 1)
+                continue
+
+            archive_id = _entry_archive_id(entry)
+            if not archive_id or archive_id in seen:
+                continue
+            seen.add(archive_id)
+            entries.append({'archive_id': archive_id, 'url': entry_url, 'title': entry.get('title')})
+
+    def sync(self, url: str, max_items: Optional[int] = None, **process_kwargs) -> dict:
+        """
+        同步一个订阅：处理存档中没有的新条目，成功后写入存档
+
+        Args:
+            url (str): 集合链接
+            max_items (int, optional): 本次最多处理的新条目数，其余留到下次同步
+            **process_kwargs: 透传给 ProcessService.process_video 的处理参数
+
+        Returns:
+            dict: {
+                "success": bool,
+                "title": 集合标题,
+                "total_entries": 集合条目总数,
+                "new_entries": 新条目数,
+                "results": [{"url", "title", "success", "job_id" | "error"}]
+            } 或者错误信息
+        """
+        listing = self.list_entries(url)
+        if listing is None:
+            return {"success": False, "error": "无法获取订阅列表"}
+
+        pending = [e for e in listing['entries'] if e['archive_id'] not in self.archive]
+        print(f"📋 订阅 {listing['title']}: 共 {len(listing['entries'])} 项，新增 {len(pending)} 项")
+
+        results = []
+        for entry in pending[:max_items] if max_items else pending:
+            result = self.process_service.process_video(entry['url'], **process_kwargs)
+            item = {"url": entry['url'], "title": entry['title'], "success": result.get("success")}
+            if result.get("success"):
+                self.archive.add(entry['archive_id'])
+                item["job_id"] = result.get("job_id")
+            else:
+                item["error"] = result.get("error")
+                item["error_category"] = result.get("error_category")
+            results.append(item)
+
+        self._remember(url, listing['title'])
+        return {
+            "success": True,
+            "title": listing['title'],
+            "total_entries": len(listing['entries']),
+            "new_entries": len(pending),
+            "results": results,
+        }
+
+    def sync_all(self, max_items: Optional[int] = None, **process_kwargs) -> List[dict]:
+        """
+        依次同步所有已登记的订阅
+
+        Returns:
+            list: 每个订阅的同步结果（附带 "url"）
+        """
+        return [{"url": url, **self.sync(url, max_items, **process_kwargs)}
+                for url in self.list_subscriptions()]
+
+    def list_subscriptions(self) -> Dict[str, dict]:
+        """
+        获取已登记的订阅
+
+        Returns:
+            dict: {集合链接: {"title": 集合标题, "last_synced": 上次同步时间戳}}
+        """
+        try:
+            with open(self.subscriptions_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 订阅列表损坏，将重新建立: {e}")
+            return {}
+
+    def _remember(self, url: str, title: Optional[str]):
+        """登记订阅并更新同步时间（原子写入）"""
+        with _subscriptions_lock:
+            subscriptions = self.list_subscriptions()
+            subscriptions[url] = {'title': title, 'last_synced': time.time()}
+            tmp_path = f"{self.subscriptions_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(subscriptions, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.subscriptions_path)
+
+
+_subscriptions_lock = threading.Lock()
+
+# 每个下载目录共享一个下载存档实例
+_archives: Dict[str, DownloadArchive] = {}
+_archives_lock = threading.Lock()
+
+
+def get_download_archive(root_dir: str) -> DownloadArchive:
+    """
+    获取（或创建）指定下载目录的下载存档
+
+    Args:
+        root_dir (str): 下载根目录
+
+    Returns:
+        DownloadArchive: 下载存档实例
+    """
+    key = os.path.abspath(root_dir)
+    with _archives_lock:
+        archive = _archives.get(key)
+        if archive is None:
+            archive = DownloadArchive(root_dir)
+            _archives[key] = archive
+        return archive
@@ -0,0 +1,263 @@
+"""
+视记 - 音频转写模块
+
+功能：
+- 统一的转写引擎接口，可替换具体实现
+- fake：确定性的假引擎，不依赖模型，用于测试和联调
+- faster-whisper：本地 CPU 转写引擎（可选依赖 faster-whisper）
+- 在进程池中并行转写各个音频分段，按分段偏移拼接为带时间戳的完整文稿
+"""
+
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Dict, List, Optional
+
+from .job_control import JobCancelled, check_current
+
+
+class TranscriptionEngine(ABC):
+    """
+    转写引擎接口
+
+    子类实现 transcribe()，返回相对于输入音频开头的分句列表
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def transcribe(self, audio_path: str, duration: Optional[float] = None) -> List[dict]:
+        """
+        转写单个音频文件
+
+        Args:
+            audio_path (str): 音频文件路径
+            duration (float, optional): 音频时长（秒），已知时传入
+
+        Returns:
+            list: [{"start": 秒, "end": 秒, "text": 文本}]
+        """
+
+
+class FakeEngine(TranscriptionEngine):
+    """
+    确定性的假转写引擎
+
+    根据文件内容的哈希生成固定文本，同一文件总是得到相同结果
+    """
+
+    name = "fake"
+
+    def transcribe(self, audio_path: str, duration: Optional[float] = None) -> List[dict]:
+        digest = hashlib.sha1()
+        with open(audio_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+
+        return [{
+            'start': 0.0,
+            'end': round(duration or 0.0, 3),
+            'text': f"[fake] {os.path.basename(audio_path)} {digest.hexdigest()[:12]}",
+        }]
+
+
+class FasterWhisperEngine(TranscriptionEngine):
+    """
+    本地 CPU 转写引擎，基于 faster-whisper（int8 量化推理）
+
+    模型通过环境变量 AUDIO2NOTE_WHISPER_MODEL 指定，默认 "base"
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size: str = None, language: str = None):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("未安装 faster-whisper，请先运行: pip install faster-whisper")
+
+        model_size = model_size or os.environ.get('AUDIO2NOTE_WHISPER_MODEL', 'base')
+        # 每个工作进程单线程推理，并行度由进程池控制
+        self.model = WhisperModel(model_size, device='cpu', compute_type='int8', cpu_threads=1)
+        self.language = language
+
+    def transcribe(self, audio_path: str, duration: Optional[float] = None) -> List[dict]:
+        segments, _ = self.model.transcribe(audio_path, language=self.language, vad_filter=True)
+        return [
+            {'start': round(seg.start, 3), 'end': round(seg.end, 3), 'text': seg.text.strip()}
+            for seg in segments
+        ]
+
+
+ENGINES = {
+    FakeEngine.name: FakeEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def get_engine(name: str) -> TranscriptionEngine:
+    """
+    按名称创建转写引擎
+
+    Args:
+        name (str): 引擎名称（见 ENGINES）
+
+    Returns:
+        TranscriptionEngine: 引擎实例
+    """
+    engine_cls = ENGINES.get(name)
+    if engine_cls is None:
+        raise ValueError(f"不支持的转写引擎: {name}（可选: {', '.join(ENGINES)}）")
+    return engine_cls()
+
+
+# 进程内的引擎实例，按名称缓存：模型在每个进程（包括主进程）中只加载一次
+_engines: Dict[str, TranscriptionEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_cached_engine(name: str) -> TranscriptionEngine:
+    """
+    获取当前进程中缓存的引擎实例，首次使用时创建
+
+    Args:
+        name (str): 引擎名称（见 ENGINES）
+
+    Returns:
+        TranscriptionEngine: 引擎实例
+    """
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            engine = get_engine(name)
+            _engines[name] = engine
+        return engine
+
+
+def _init_worker(engine_name: str):
+    """工作进程启动时预先加载模型"""
+    get_cached_engine(engine_name)
+
+
+def _transcribe_chunk(chunk: dict, engine_name: str) -> List[dict]:
+    """转写一个分段，并把时间戳平移到原音频时间轴"""
+    offset = chunk.get('start', 0.0)
+    segments = get_cached_engine(engine_name).transcribe(chunk['path'], chunk.get('duration'))
+    return [
+        {
+            'start': round(seg['start'] + offset, 3),
+            'end': round(seg['end'] + offset, 3),
+            'text': seg['text'],
+        }
+        for seg in segments
+    ]
+
+
+class Transcriber:
+    """
+    分段并行转写器
+
+    把分段分发到进程池中转写，按分段顺序拼接结果，
+    在音频旁生成 <音频文件名>.transcript.json 和 <音频文件名>.transcript.txt
+    """
+
+    def __init__(self, engine: str = FakeEngine.name, workers: Optional[int] = None):
+        """
+        Args:
+            engine (str): 引擎名称
+            workers (int, optional): 工作进程数，默认为 CPU 核数
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"不支持的转写引擎: {engine}（可选: {', '.join(ENGINES)}）")
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+
+    def transcribe(self, audio_path: str, chunks: Optional[List[dict]] = None) -> dict:
+        """
+        转写音频并写出文稿文件
+
+        Args:
+            audio_path (str): 原始音频路径，文稿写在其旁边
+            chunks (list, optional): 分段 manifest 中的 chunks；为空时整段转写
+
+        Returns:
+            dict: {"engine", "source", "segments", "transcript_path", "text_path"}
+        """
+        if not chunks:
+            chunks = [{'index': 0, 'path': audio_path, 'start': 0.0}]
+
+        print(f"📝 开始转写: {os.path.basename(audio_path)}"
+              f"（引擎: {self.engine}，{len(chunks)} 段）")
+
+        workers = min(self.workers, len(chunks))
+        if workers <= 1:
+            # 单个分段直接在当前进程转写，省去进程池启动开销；引擎在进程内复用，模型只加载一次
+            results = []
+            for chunk in chunks:
+                check_current()
+                results.append(_transcribe_chunk(chunk, self.engine))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.engine,)) as pool:
+                futures = [pool.submit(_transcribe_chunk, chunk, self.engine) for chunk in chunks]
+                try:
+                    results = [_wait_result(future) for future in futures]
+                except JobCancelled:
+                    # 丢弃尚未开始的分段，正在转写的分段结束后进程池退出
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+
+        segments = [seg for chunk_segments in results for seg in chunk_segments]
+        transcript = {
+            'engine': self.engine,
+            'source': os.path.basename(audio_path),
+            'segments': segments,
+        }
+
+        base = os.path.splitext(audio_path)[0]
+        transcript_path = f"{base}.transcript.json"
+        text_path = f"{base}.transcript.txt"
+        _write_atomic(transcript_path, json.dumps(transcript, ensure_ascii=False, indent=2))
+        _write_atomic(text_path, format_transcript(segments))
+
+        print(f"✅ 转写完成: {transcript_path}")
+        transcript.update({'transcript_path': transcript_path, 'text_path': text_path})
+        return transcript
+
+
+def _wait_result(future: Future, poll_seconds: float = 0.5):
+    """等待分段转写结果，等待期间定期检查任务是否已取消"""
+    while True:
+        try:
+            return future.result(timeout=poll_seconds)
+        except FuturesTimeout:
+            check_current()
+
+
+def format_transcript(segments: List[Dict]) -> str:
+    """
+    把分句格式化为带时间戳的纯文本，每行形如 "[00:01:23] 文本"
+
+    Args:
+        segments (list): 分句列表
+
+    Returns:
+        str: 文稿文本
+    """
+    lines = []
+    for seg in segments:
+        total = int(seg['start'])
+        timestamp = f"{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+        lines.append(f"[{timestamp}] {seg['text']}")
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path: str, content: str):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
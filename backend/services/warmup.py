@@ -0,0 +1,83 @@
+"""
+视记 - 启动耗时统计与预热模块
+
+功能：
+- 记录后端启动各阶段耗时（应用导入、开始监听、yt_dlp 导入、首个下载器实例）
+- 服务开始监听后在后台线程中预热 yt_dlp，首个请求无需等待导入
+- 启动完成后打印耗时报告，并通过 /api/startup 对外提供
+
+更详细的模块级导入耗时可使用: python -X importtime main.py
+"""
+
+import threading
+import time
+from typing import Dict
+
+
+# 进程内的计时起点：main.py 最先导入本模块
+PROCESS_START = time.perf_counter()
+
+_timings: Dict[str, float] = {}
+_lock = threading.Lock()
+_ready = threading.Event()
+
+
+def mark(name: str, since: float = PROCESS_START) -> float:
+    """
+    记录一个启动阶段的耗时
+
+    Args:
+        name (str): 阶段名
+        since (float): 计时起点（perf_counter），默认为进程启动
+
+    Returns:
+        float: 耗时（秒）
+    """
+    elapsed = time.perf_counter() - since
+    with _lock:
+        _timings[name] = round(elapsed, 4)
+    return elapsed
+
+
+def get_report() -> dict:
+    """
+    获取启动耗时报告
+
+    Returns:
+        dict: {"timings": {阶段名: 秒}, "yt_dlp_ready": bool}
+    """
+    with _lock:
+        timings = dict(_timings)
+    return {"timings": timings, "yt_dlp_ready": _ready.is_set()}
+
+
+def print_report():
+    """打印启动耗时报告"""
+    print("⏱️ 启动耗时报告:")
+    for name, seconds in get_report()["timings"].items():
+        print(f"   {name:<24} {seconds * 1000:8.1f} ms")
+
+
+def _prewarm():
+    try:
+        start = time.perf_counter()
+        import yt_dlp
+        mark("yt_dlp_import", start)
+
+        # 首次创建实例时会加载提取器列表，这里提前完成；
+        # 只加载实际下载使用的提取器，不抵消裁剪提取器节省的内存和初始化时间
+        from .audio_downloader import ALLOWED_EXTRACTORS
+        start = time.perf_counter()
+        with yt_dlp.YoutubeDL({'quiet': True, 'allowed_extractors': ALLOWED_EXTRACTORS}):
+            pass
+        mark("yt_dlp_first_instance", start)
+
+        _ready.set()
+        print_report()
+    except Exception as e:
+        print(f"❌ yt_dlp 预热失败: {e}")
+
+
+def prewarm_in_background():
+    """在后台线程中预热 yt_dlp，不阻塞服务启动"""
+    threading.Thread(target=_prewarm, name="yt-dlp-prewarm", daemon=True).start()
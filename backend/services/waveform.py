@@ -0,0 +1,315 @@
+"""
+视记 - 波形峰值模块
+
+功能：
+- 用 ffmpeg 把音频解码为 8 kHz 单声道 PCM 并流式读取，按时间分箱计算每箱的最小/最大采样值
+- 一次解码生成多级分辨率（每级箱宽为上一级的 4 倍），界面缩放时直接选用合适的级别
+- 峰值量化为 8 位，一小时音频的全部级别约 1.2 MB；安装了 NumPy 时按块向量化计算，否则逐箱计算
+- 二进制文件保存在音频旁（<音频文件名>.peaks），可转换为 audiowaveform 兼容的 JSON 格式
+"""
+
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import uuid
+from array import array
+from typing import Iterator, List, Optional
+
+from .job_control import check_current, current_job
+
+
+PEAKS_EXTENSION = ".peaks"
+PEAKS_VERSION = 1
+
+# 解码采样率：波形显示不需要高频细节，8 kHz 即可，解码和读取的数据量只有 44.1 kHz 的约 1/5
+PEAKS_SAMPLE_RATE = 8000
+# 最精细一级的箱宽（采样数），8 kHz 下每秒 125 个箱
+BASE_SAMPLES_PER_BIN = 64
+# 相邻两级的箱宽倍数和总级数：64 / 256 / 1024 / 4096 / 16384 个采样
+LEVEL_FACTOR = 4
+LEVEL_COUNT = 5
+
+# JSON 格式默认返回的最少箱数（大致对应界面宽度的像素数）
+DEFAULT_JSON_WIDTH = 2000
+
+# 文件头：魔数、版本、级数、采样率、总采样数；每级：箱宽、箱数；之后依次为各级的 int8 [min, max] 交错数据
+_HEADER = struct.Struct('<4sHHIQ')
+_LEVEL = struct.Struct('<II')
+_MAGIC = b'A2NP'
+
+# 每次从 ffmpeg 读取的字节数（最精细一级箱宽的整数倍）
+_READ_BYTES = BASE_SAMPLES_PER_BIN * 2 * 4096
+
+
+def _numpy():
+    """NumPy 为可选依赖，未安装时返回 None"""
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+
+def iter_pcm(audio_path: str, sample_rate: int, block_bytes: int = _READ_BYTES,
+             ffmpeg_path: Optional[str] = None) -> Iterator[bytes]:
+    """
+    用 ffmpeg 把音频解码为单声道 16 位小端 PCM，按块读取，不在内存或磁盘上保存完整的解码结果
+
+    Args:
+        audio_path (str): 音频文件路径
+        sample_rate (int): 输出采样率
+        block_bytes (int): 每块的字节数
+        ffmpeg_path (str, optional): ffmpeg 可执行文件路径，默认从 PATH 查找
+
+    Yields:
+        bytes: PCM 数据块
+
+    Raises:
+        RuntimeError: 未找到 FFmpeg 或解码失败
+    """
+    ffmpeg_path = ffmpeg_path or shutil.which('ffmpeg') or 'ffmpeg'
+    cmd = [
+        ffmpeg_path, '-hide_banner', '-nostdin', '-loglevel', 'error',
+        '-i', audio_path,
+        '-map', '0:a:0', '-ac', '1', '-ar', str(sample_rate),
+        '-f', 's16le', '-acodec', 'pcm_s16le', '-',
+    ]
+    # 错误输出写入临时文件，损坏的音频会产生大量警告，写入管道可能阻塞 ffmpeg
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        except FileNotFoundError:
+            raise RuntimeError("未找到 FFmpeg，请先安装 FFmpeg")
+        with process:
+            # 登记到当前任务，任务取消或超时时 ffmpeg 会被终止
+            job = current_job()
+            if job:
+                job.track(process)
+            try:
+                yield from iter(lambda: process.stdout.read(block_bytes), b'')
+            finally:
+                if process.poll() is None:
+                    process.kill()
+            process.wait()
+        check_current()
+        if process.returncode != 0:
+            stderr.seek(0)
+            tail = '\n'.join(stderr.read().decode('utf-8', 'replace').strip().splitlines()[-5:])
+            raise RuntimeError(f"FFmpeg 执行失败: {tail}")
+
+
+def peaks_path_for(audio_path: str) -> str:
+    """音频对应的峰值文件路径"""
+    return audio_path + PEAKS_EXTENSION
+
+
+class _PeakAccumulator:
+    """按块接收 16 位 PCM 数据，计算最精细一级每箱的最小/最大值"""
+
+    def __init__(self, samples_per_bin: int):
+        self.samples_per_bin = samples_per_bin
+        self.sample_count = 0
+        self.np = _numpy()
+        self._tail = b''
+        self._mins = []
+        self._maxs = []
+
+    def feed(self, data: bytes):
+        """追加 PCM 数据，不足一箱的部分留到下一块"""
+        data = self._tail + data if self._tail else data
+        bin_bytes = self.samples_per_bin * 2
+        usable = len(data) // bin_bytes * bin_bytes
+        self._tail = data[usable:]
+        if usable:
+            self._add(data[:usable], self.samples_per_bin)
+
+    def finish(self):
+        """处理最后不足一箱的数据，返回 (最小值, 最大值) 两个 int16 序列"""
+        tail = self._tail[:len(self._tail) // 2 * 2]
+        if tail:
+            self._add(tail, len(tail) // 2)
+        self._tail = b''
+
+        if self.np is not None:
+            np = self.np
+            empty = np.empty(0, dtype=np.int16)
+            return (np.concatenate(self._mins) if self._mins else empty,
+                    np.concatenate(self._maxs) if self._maxs else empty)
+        mins, maxs = array('h'), array('h')
+        for part in self._mins:
+            mins.extend(part)
+        for part in self._maxs:
+            maxs.extend(part)
+        return mins, maxs
+
+    def _add(self, data: bytes, samples_per_bin: int):
+        self.sample_count += len(data) // 2
+        if self.np is not None:
+            samples = self.np.frombuffer(data, dtype='<i2').reshape(-1, samples_per_bin)
+            self._mins.append(samples.min(axis=1))
+            self._maxs.append(samples.max(axis=1))
+            return
+
+        samples = array('h')
+        samples.frombytes(data)
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        self._mins.append(array('h', (min(samples[i:i + samples_per_bin])
+                                      for i in range(0, len(samples), samples_per_bin))))
+        self._maxs.append(array('h', (max(samples[i:i + samples_per_bin])
+                                      for i in range(0, len(samples), samples_per_bin))))
+
+
+def _downsample(values, factor: int, reduce, np=None):
+    """把相邻 factor 个箱合并为一个箱（reduce 为 min 或 max）"""
+    if np is not None:
+        whole = len(values) // factor * factor
+        merged = getattr(values[:whole].reshape(-1, factor), reduce.__name__)(axis=1)
+        if whole < len(values):
+            merged = np.append(merged, reduce(values[whole:]))
+        return merged
+    return array('h', (reduce(values[i:i + factor]) for i in range(0, len(values), factor)))
+
+
+def _interleave_int8(mins, maxs, np=None) -> bytes:
+    """量化为 8 位（取高 8 位）并按 [min, max] 交错排列"""
+    if np is not None:
+        out = np.empty(len(mins) * 2, dtype=np.int8)
+        out[0::2] = mins >> 8
+        out[1::2] = maxs >> 8
+        return out.tobytes()
+    out = array('b', bytes(len(mins) * 2))
+    out[0::2] = array('b', (v >> 8 for v in mins))
+    out[1::2] = array('b', (v >> 8 for v in maxs))
+    return out.tobytes()
+
+
+def generate_peaks(audio_path: str, output_path: Optional[str] = None,
+                   ffmpeg_path: Optional[str] = None) -> dict:
+    """
+    解码音频并生成多级峰值文件
+
+    Args:
+        audio_path (str): 音频文件路径
+        output_path (str, optional): 峰值文件路径，默认 <音频文件名>.peaks
+        ffmpeg_path (str, optional): ffmpeg 可执行文件路径，默认从 PATH 查找
+
+    Returns:
+        dict: {"path", "sample_rate", "sample_count", "duration", "levels": [{"samples_per_bin", "length"}]}
+
+    Raises:
+        RuntimeError: 未找到 FFmpeg 或解码失败
+    """
+    output_path = output_path or peaks_path_for(audio_path)
+
+    print(f"〰️ 生成波形峰值: {os.path.basename(audio_path)}")
+    accumulator = _PeakAccumulator(BASE_SAMPLES_PER_BIN)
+    for block in iter_pcm(audio_path, PEAKS_SAMPLE_RATE, ffmpeg_path=ffmpeg_path):
+        accumulator.feed(block)
+
+    np = accumulator.np
+    mins, maxs = accumulator.finish()
+    levels = []
+    samples_per_bin = BASE_SAMPLES_PER_BIN
+    for i in range(LEVEL_COUNT):
+        if i:
+            mins = _downsample(mins, LEVEL_FACTOR, min, np)
+            maxs = _downsample(maxs, LEVEL_FACTOR, max, np)
+            samples_per_bin *= LEVEL_FACTOR
+        levels.append((samples_per_bin, len(mins), _interleave_int8(mins, maxs, np)))
+
+    # 先写临时文件再替换，避免读到不完整的峰值文件
+    tmp_path = f"{output_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, PEAKS_VERSION, len(levels), PEAKS_SAMPLE_RATE,
+                                 accumulator.sample_count))
+            for spb, length, _ in levels:
+                f.write(_LEVEL.pack(spb, length))
+            for _, _, data in levels:
+                f.write(data)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {
+        "path": output_path,
+        "sample_rate": PEAKS_SAMPLE_RATE,
+        "sample_count": accumulator.sample_count,
+        "duration": round(accumulator.sample_count / PEAKS_SAMPLE_RATE, 3),
+        "levels": [{"samples_per_bin": spb, "length": length} for spb, length, _ in levels],
+    }
+
+
+def read_peaks(path: str) -> dict:
+    """
+    读取峰值文件
+
+    Args:
+        path (str): 峰值文件路径
+
+    Returns:
+        dict: {"sample_rate", "sample_count", "levels": [{"samples_per_bin", "length", "data": bytes}]}
+
+    Raises:
+        ValueError: 文件格式错误
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    if len(content) < _HEADER.size:
+        raise ValueError("峰值文件不完整")
+    magic, version, level_count, sample_rate, sample_count = _HEADER.unpack_from(content)
+    if magic != _MAGIC or version != PEAKS_VERSION:
+        raise ValueError("不是有效的峰值文件")
+
+    offset = _HEADER.size
+    levels = []
+    for _ in range(level_count):
+        samples_per_bin, length = _LEVEL.unpack_from(content, offset)
+        levels.append({"samples_per_bin": samples_per_bin, "length": length})
+        offset += _LEVEL.size
+    for level in levels:
+        size = level["length"] * 2
+        level["data"] = content[offset:offset + size]
+        if len(level["data"]) != size:
+            raise ValueError("峰值文件不完整")
+        offset += size
+
+    return {"sample_rate": sample_rate, "sample_count": sample_count, "levels": levels}
+
+
+def select_level(peaks: dict, width: int = DEFAULT_JSON_WIDTH) -> dict:
+    """选出箱数不少于 width 的最粗一级（都不够时返回最精细一级）"""
+    levels = peaks["levels"]
+    candidates = [level for level in levels if level["length"] >= width]
+    return candidates[-1] if candidates else levels[0]
+
+
+def peaks_to_json(peaks: dict, width: int = DEFAULT_JSON_WIDTH) -> dict:
+    """
+    转换为 audiowaveform 兼容的 JSON 格式（可直接用于 peaks.js、wavesurfer.js 等）
+
+    Args:
+        peaks (dict): read_peaks 的结果
+        width (int): 期望的最少箱数，通常为波形的显示宽度（像素）
+
+    Returns:
+        dict: {"version", "channels", "sample_rate", "samples_per_pixel", "bits", "length",
+               "data": [min0, max0, min1, max1, ...]}
+    """
+    level = select_level(peaks, width)
+    data: List[int] = list(array('b', level["data"]))
+    return {
+        "version": 2,
+        "channels": 1,
+        "sample_rate": peaks["sample_rate"],
+        "samples_per_pixel": level["samples_per_bin"],
+        "bits": 8,
+        "length": level["length"],
+        "data": data,
+    }
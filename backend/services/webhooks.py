@@ -0,0 +1,294 @@
+"""
+视记 - 完成回调模块
+
+功能：
+- 请求带 callback_url 时，任务完成（成功或失败）后把结果 POST 到该地址，客户端无需保持连接或轮询
+- 同一回调地址在短时间内完成的多个任务合并为一次请求发送（批量任务时大幅减少请求数）
+- 请求体用 HMAC-SHA256 签名（密钥来自环境变量 AUDIO2NOTE_WEBHOOK_SECRET），接收方可校验来源和时间戳
+- 发送失败时按指数退避 + 随机抖动重试，只重试网络错误、超时、429 和 5xx
+"""
+
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .errors import NETWORK, RATE_LIMITED, RetryPolicy, classify_error, is_retryable
+
+
+SIGNATURE_HEADER = "X-Audio2Note-Signature"
+TIMESTAMP_HEADER = "X-Audio2Note-Timestamp"
+DELIVERY_HEADER = "X-Audio2Note-Delivery"
+
+# 接收方校验签名时允许的时间戳偏差（秒），防止重放
+DEFAULT_SIGNATURE_TOLERANCE = 300
+
+# 这些状态码表示接收方暂时不可用，值得重试
+_RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+def sign_payload(secret: str, timestamp: str, body: bytes) -> str:
+    """
+    计算回调请求的签名
+
+    签名内容为 "时间戳.请求体"，时间戳一并签名，旧请求被截获后无法更换时间戳重放
+
+    Args:
+        secret (str): 签名密钥
+        timestamp (str): 请求头中的时间戳（Unix 秒）
+        body (bytes): 请求体
+
+    Returns:
+        str: "sha256=十六进制摘要"
+    """
+    digest = hmac.new(secret.encode('utf-8'), timestamp.encode('ascii') + b'.' + body,
+                      hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(secret: str, timestamp: str, body: bytes, signature: str,
+                     tolerance: float = DEFAULT_SIGNATURE_TOLERANCE) -> bool:
+    """
+    校验回调请求的签名（供接收方使用）
+
+    Args:
+        secret (str): 签名密钥
+        timestamp (str): X-Audio2Note-Timestamp 请求头
+        body (bytes): 原始请求体
+        signature (str): X-Audio2Note-Signature 请求头
+        tolerance (float): 允许的时间戳偏差（秒）
+
+    Returns:
+        bool: 签名正确且时间戳未过期返回 True
+    """
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance:
+            return False
+    except (TypeError, ValueError):
+        return False
+    return hmac.compare_digest(sign_payload(secret, timestamp, body), signature or '')
+
+
+class WebhookDispatcher:
+    """
+    回调发送器
+
+    任务完成时调用 enqueue() 登记事件后立即返回；后台线程按回调地址合并事件，
+    到达合并窗口或批量上限后交给发送线程池，失败的批次按退避时间重新排队
+    """
+
+    def __init__(self, secret: Optional[str] = None, batch_window: float = 1.0,
+                 max_batch_size: int = 50, timeout: float = 10.0, senders: int = 4,
+                 retry_policy: Optional[RetryPolicy] = None):
+        """
+        Args:
+            secret (str, optional): 签名密钥，默认读取环境变量 AUDIO2NOTE_WEBHOOK_SECRET；为空时不签名
+            batch_window (float): 合并窗口（秒），第一个事件登记后等待这么久再发送
+            max_batch_size (int): 单次请求最多包含的事件数
+            timeout (float): 单次请求超时（秒）
+            senders (int): 发送线程数，慢速的接收方不会阻塞其他回调地址
+            retry_policy (RetryPolicy, optional): 重试次数与退避参数
+        """
+        self.secret = secret if secret is not None else os.environ.get('AUDIO2NOTE_WEBHOOK_SECRET') or None
+        self.batch_window = batch_window
+        self.max_batch_size = max(max_batch_size, 1)
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=6, base_delay=1.0, max_delay=300.0)
+
+        self._cond = threading.Condition()
+        self._pending: Dict[str, List[dict]] = {}   # 回调地址 -> 待发送事件
+        self._deadlines: Dict[str, float] = {}      # 回调地址 -> 发送时间（monotonic）
+        self._retries: List[Tuple[float, int, str, List[dict], int]] = []  # (时间, 序号, 地址, 事件, 已尝试次数)
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._senders = ThreadPoolExecutor(max_workers=senders, thread_name_prefix="webhook")
+
+        self.delivered = 0
+        self.failed = 0
+
+    def enqueue(self, callback_url: str, event_type: str, data: dict) -> str:
+        """
+        登记一个待发送的事件
+
+        Args:
+            callback_url (str): 回调地址
+            event_type (str): 事件类型，如 "job.succeeded"、"job.failed"
+            data (dict): 事件内容
+
+        Returns:
+            str: 事件ID（接收方可据此去重）
+        """
+        event = {"id": uuid.uuid4().hex, "type": event_type, "created_at": time.time(), "data": data}
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("回调发送器已关闭")
+            self._start()
+            events = self._pending.setdefault(callback_url, [])
+            events.append(event)
+            now = time.monotonic()
+            self._deadlines.setdefault(callback_url, now + self.batch_window)
+            if len(events) >= self.max_batch_size:
+                self._deadlines[callback_url] = now
+            self._cond.notify()
+        return event["id"]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        立即发送所有待合并的事件，并等待发送完成（包括等待中的重试）
+
+        Args:
+            timeout (float, optional): 最长等待时间（秒）
+
+        Returns:
+            bool: 全部发送完成返回 True，超时返回 False
+        """
+        end = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            now = time.monotonic()
+            for url in self._deadlines:
+                self._deadlines[url] = now
+            self._retries = [(now, *item[1:]) for item in self._retries]
+            heapq.heapify(self._retries)
+            self._cond.notify_all()
+            while self._pending or self._retries or self._in_flight:
+                remaining = end - time.monotonic() if end is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """
+        尽量发送完剩余事件后停止后台线程
+
+        Args:
+            timeout (float): 等待发送的最长时间（秒），超时后剩余事件被丢弃
+        """
+        if self._thread is None:
+            return
+        if not self.flush(timeout):
+            print("⚠️ 回调未能在关闭前全部发送，剩余事件已丢弃")
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._senders.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self):
+        """首次登记事件时启动后台线程，未设置签名密钥时给出提示（调用方需持有锁）"""
+        if self._thread is None:
+            if not self.secret:
+                print("⚠️ 未设置 AUDIO2NOTE_WEBHOOK_SECRET，回调请求不带签名，接收方无法校验来源")
+            self._thread = threading.Thread(target=self._run, name="webhook-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batches = self._take_due()
+                while not batches:
+                    if self._stopped:
+                        return
+                    self._cond.wait(self._next_wakeup())
+                    batches = self._take_due()
+                self._in_flight += len(batches)
+
+            for url, events, attempts in batches:
+                self._senders.submit(self._deliver, url, events, attempts)
+
+    def _next_wakeup(self) -> Optional[float]:
+        """距离下一个批次到期的时间，没有待发送批次时返回 None（调用方需持有锁）"""
+        times = list(self._deadlines.values())
+        if self._retries:
+            times.append(self._retries[0][0])
+        return max(min(times) - time.monotonic(), 0) if times else None
+
+    def _take_due(self) -> List[Tuple[str, List[dict], int]]:
+        """取出已到期的批次（调用方需持有锁）"""
+        now = time.monotonic()
+        batches = []
+        for url in [u for u, deadline in self._deadlines.items() if deadline <= now]:
+            del self._deadlines[url]
+            events = self._pending.pop(url)
+            for i in range(0, len(events), self.max_batch_size):
+                batches.append((url, events[i:i + self.max_batch_size], 0))
+        while self._retries and self._retries[0][0] <= now:
+            _, _, url, events, attempts = heapq.heappop(self._retries)
+            batches.append((url, events, attempts))
+        return batches
+
+    def _deliver(self, url: str, events: List[dict], attempts: int):
+        """发送一个批次，失败时按错误类别决定是否重新排队"""
+        attempts += 1
+        error = None
+        retryable = False
+        try:
+            self._post(url, events)
+        except urllib.error.HTTPError as e:
+            category = RATE_LIMITED if e.code == 429 else NETWORK
+            error = f"HTTP {e.code}"
+            retryable = e.code in _RETRYABLE_STATUS
+        except Exception as e:
+            category = classify_error(e)
+            error = str(e)
+            retryable = is_retryable(category)
+
+        with self._cond:
+            self._in_flight -= 1
+            if error is None:
+                self.delivered += len(events)
+            elif retryable and attempts < self.retry_policy.max_attempts:
+                delay = self.retry_policy.delay(attempts, category)
+                print(f"🔁 回调发送失败（{error}，第 {attempts}/{self.retry_policy.max_attempts} 次），"
+                      f"{delay:.1f}s 后重试: {url}")
+                heapq.heappush(self._retries,
+                               (time.monotonic() + delay, next(self._sequence), url, events, attempts))
+            else:
+                self.failed += len(events)
+                print(f"❌ 回调发送失败，已放弃 {len(events)} 个事件（{error}）: {url}")
+            self._cond.notify_all()
+
+    def _post(self, url: str, events: List[dict]):
+        """POST 一个批次，接收方返回非 2xx 时抛出 HTTPError"""
+        body = json.dumps({"events": events}, ensure_ascii=False).encode('utf-8')
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "User-Agent": "audio2note-webhook/1.0",
+            TIMESTAMP_HEADER: timestamp,
+            DELIVERY_HEADER: uuid.uuid4().hex,
+        }
+        if self.secret:
+            headers[SIGNATURE_HEADER] = sign_payload(self.secret, timestamp, body)
+
+        request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+_dispatcher: Optional[WebhookDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_webhook_dispatcher() -> WebhookDispatcher:
+    """
+    获取（或创建）全局回调发送器
+
+    Returns:
+        WebhookDispatcher: 回调发送器实例
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = WebhookDispatcher()
+        return _dispatcher
@@ -0,0 +1,8 @@
+"""
+测试配置：把 backend 目录加入导入路径，从仓库根目录运行 pytest 时也能导入 services
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
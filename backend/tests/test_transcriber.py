@@ -0,0 +1,75 @@
+"""
+转写器测试：用 fake 引擎驱动单进程和进程池两条路径
+"""
+
+import json
+import os
+
+import pytest
+
+from services import transcriber
+from services.transcriber import FakeEngine, TranscriptionEngine, Transcriber
+
+
+def _make_chunks(tmp_path, count=3, seconds=10.0):
+    chunks = []
+    for i in range(count):
+        path = tmp_path / f"chunk_{i:03d}.mp3"
+        path.write_bytes(f"chunk {i}".encode())
+        chunks.append({'index': i, 'path': str(path), 'start': i * seconds, 'duration': seconds})
+    return chunks
+
+
+def test_engine_interface_is_abstract():
+    with pytest.raises(TypeError):
+        TranscriptionEngine()
+
+
+def test_pool_transcribes_chunks_in_order(tmp_path):
+    audio = tmp_path / "lecture.mp3"
+    audio.write_bytes(b"audio")
+    chunks = _make_chunks(tmp_path)
+
+    result = Transcriber(FakeEngine.name, workers=2).transcribe(str(audio), chunks)
+
+    expected = [FakeEngine().transcribe(c['path'], c['duration'])[0]['text'] for c in chunks]
+    assert [seg['text'] for seg in result['segments']] == expected
+    # 时间戳按分段偏移平移到原音频时间轴
+    assert [(seg['start'], seg['end']) for seg in result['segments']] == [(0.0, 10.0), (10.0, 20.0), (20.0, 30.0)]
+
+    with open(result['transcript_path'], encoding='utf-8') as f:
+        assert json.load(f)['segments'] == result['segments']
+    with open(result['text_path'], encoding='utf-8') as f:
+        assert f.read().splitlines()[1].startswith("[00:00:10] [fake] chunk_001.mp3")
+
+
+def test_single_worker_matches_pool(tmp_path):
+    audio = tmp_path / "lecture.mp3"
+    audio.write_bytes(b"audio")
+    chunks = _make_chunks(tmp_path)
+
+    pooled = Transcriber(FakeEngine.name, workers=3).transcribe(str(audio), chunks)['segments']
+    single = Transcriber(FakeEngine.name, workers=1).transcribe(str(audio), chunks)['segments']
+    assert single == pooled
+
+
+def test_single_worker_reuses_engine(tmp_path, monkeypatch):
+    created = []
+
+    class CountingEngine(FakeEngine):
+        name = "counting"
+
+        def __init__(self):
+            created.append(self)
+
+    monkeypatch.setitem(transcriber.ENGINES, CountingEngine.name, CountingEngine)
+    monkeypatch.setattr(transcriber, "_engines", {})
+
+    audio = tmp_path / "lecture.mp3"
+    audio.write_bytes(b"audio")
+    chunks = _make_chunks(tmp_path)
+    for _ in range(2):
+        Transcriber(CountingEngine.name, workers=1).transcribe(str(audio), chunks)
+
+    assert len(created) == 1
+    assert os.path.exists(tmp_path / "lecture.transcript.txt")
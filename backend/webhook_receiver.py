@@ -0,0 +1,161 @@
+"""
+本地回调接收器
+
+启动一个 HTTP 服务接收完成回调，校验签名并打印每批事件，用于在本地调试 callback_url；
+--self-test 在临时端口上启动接收器，用 WebhookDispatcher 发送一批事件，检查批量合并、
+签名校验和失败重试是否符合预期
+
+用法:
+    python webhook_receiver.py [--port 8002] [--secret 密钥]
+    python webhook_receiver.py --self-test
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.errors import RetryPolicy
+from services.webhooks import (DELIVERY_HEADER, SIGNATURE_HEADER, TIMESTAMP_HEADER,
+                               WebhookDispatcher, verify_signature)
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """
+    回调接收服务
+
+    记录收到的每个请求；fail_first 不为 0 时前几个请求返回 503，用于验证发送方的重试
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, secret: str = None, fail_first: int = 0, verbose: bool = False):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.secret = secret
+        self.fail_first = fail_first
+        self.verbose = verbose
+        self.requests = []   # [{"delivery", "signed", "valid", "events"}]
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/callback"
+
+    def handle_delivery(self, headers, body: bytes) -> int:
+        """处理一次回调请求，返回响应状态码"""
+        with self._lock:
+            if self.rejected < self.fail_first:
+                self.rejected += 1
+                return 503
+
+        signature = headers.get(SIGNATURE_HEADER)
+        valid = None
+        if self.secret:
+            valid = verify_signature(self.secret, headers.get(TIMESTAMP_HEADER), body, signature)
+            if not valid:
+                print(f"❌ 签名校验失败: {headers.get(DELIVERY_HEADER)}")
+                return 401
+
+        try:
+            events = json.loads(body.decode('utf-8'))["events"]
+        except (ValueError, KeyError, TypeError):
+            print("❌ 请求体格式错误")
+            return 400
+
+        with self._lock:
+            self.requests.append({"delivery": headers.get(DELIVERY_HEADER),
+                                  "signed": signature is not None, "valid": valid, "events": events})
+        if self.verbose:
+            state = "签名有效" if valid else "未签名" if signature is None else "未校验签名"
+            print(f"📬 收到 {len(events)} 个事件（{state}）")
+            for event in events:
+                data = event.get("data") or {}
+                print(f"   {event['type']}: {data.get('request_id', '')} {data.get('video_title', '')}")
+        return 200
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        status = self.server.handle_delivery(self.headers, body)
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def self_test(event_count: int = 100, batch_size: int = 40) -> bool:
+    """
+    端到端检查回调发送
+
+    - 接收器拒绝第一个请求（503），发送方应退避后重试
+    - 所有事件恰好送达一次，每批不超过 batch_size 个，每个请求的签名都有效
+    - 无法连接的地址在用完重试次数后放弃
+
+    Returns:
+        bool: 全部检查通过返回 True
+    """
+    secret = "self-test-secret"
+    receiver = WebhookReceiver(secret=secret, fail_first=1)
+    threading.Thread(target=receiver.serve_forever, daemon=True).start()
+    dispatcher = WebhookDispatcher(secret=secret, batch_window=0.2, max_batch_size=batch_size,
+                                   timeout=2.0, retry_policy=RetryPolicy(3, 0.1, 0.5))
+
+    try:
+        expected = {dispatcher.enqueue(receiver.url, "job.succeeded", {"index": i})
+                    for i in range(event_count)}
+        # 本机上关闭的端口，连接会被立即拒绝
+        unreachable = receiver.url.rsplit(':', 1)[0] + ":9/callback"
+        dispatcher.enqueue(unreachable, "job.failed", {})
+        finished = dispatcher.flush(timeout=30)
+    finally:
+        dispatcher.close(timeout=1)
+        receiver.shutdown()
+        receiver.server_close()
+
+    received = [event["id"] for request in receiver.requests for event in request["events"]]
+    sizes = [len(request["events"]) for request in receiver.requests]
+    checks = [
+        ("发送在超时前完成", finished),
+        ("503 后重试", receiver.rejected == 1),
+        (f"{event_count} 个事件各送达一次", sorted(received) == sorted(expected)),
+        (f"每批不超过 {batch_size} 个事件（{sizes}）", bool(sizes) and max(sizes) <= batch_size),
+        ("所有请求签名有效", all(request["valid"] for request in receiver.requests)),
+        ("无法连接的地址已放弃", dispatcher.failed == 1),
+    ]
+    for name, passed in checks:
+        print(f"{'✅' if passed else '❌'} {name}")
+    return all(passed for _, passed in checks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地回调接收器")
+    parser.add_argument("--port", type=int, default=8002, help="监听端口")
+    parser.add_argument("--secret", default=os.environ.get('AUDIO2NOTE_WEBHOOK_SECRET'),
+                        help="签名密钥，默认读取环境变量 AUDIO2NOTE_WEBHOOK_SECRET；为空时不校验签名")
+    parser.add_argument("--self-test", action="store_true", help="运行回调发送的端到端检查")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+
+    receiver = WebhookReceiver(args.port, args.secret, verbose=True)
+    print(f"📡 回调接收器已启动: {receiver.url}")
+    if not args.secret:
+        print("⚠️ 未设置签名密钥，不校验签名")
+    try:
+        receiver.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.server_close()
+
+
+if __name__ == "__main__":
+    main()
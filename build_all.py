@@ -4,6 +4,7 @@ AI Audio2Note 跨平台构建脚本
 支持 Mac (.app) 和 Windows (.exe) 打包
 """
 
+import argparse
 import os
 import sys
 import platform
@@ -12,8 +13,9 @@ import shutil
 from pathlib import Path
 
 class CrossPlatformBuilder:
-    def __init__(self):
+    def __init__(self, profile="onedir"):
         self.system = platform.system().lower()
+        self.profile = profile  # 后端打包配置：onedir（启动快）或 onefile
         self.project_root = Path(__file__).parent
         self.backend_dir = self.project_root / "backend"
         self.frontend_dir = self.project_root / "frontend"
@@ -29,7 +31,7 @@ class CrossPlatformBuilder:
             print("✅ PyInstaller 已安装")
         except ImportError:
             print("❌ PyInstaller 未安装，正在安装...")
-            subprocess.run([sys.executable, "-m", "pip", "install", "pyinstaller"], check=True)
+            subprocess.run([sys.executable, "-m", "pip", "install", "pyinstaller>=6.6"], check=True)
             
         # 检查Node.js依赖
         try:
@@ -61,13 +63,49 @@ class CrossPlatformBuilder:
             print(f"❌ 不支持的操作系统: {self.system}")
             return False
     
+    def backend_profile_args(self):
+        """后端打包配置对应的 PyInstaller 参数（见 backend/build_exe.py）"""
+        sys.path.insert(0, str(self.backend_dir))
+        from build_exe import profile_args
+        return profile_args(self.profile)
+
+    def copy_backend(self, package_dir):
+        """把后端打包产物复制到分发包，返回是否成功"""
+        exe_name = "ai-audio2note-backend" + (".exe" if self.system == "windows" else "")
+        if self.profile == "onedir":
+            backend_build = self.backend_dir / "dist" / "ai-audio2note-backend"
+            if not backend_build.exists():
+                return False
+            shutil.copytree(backend_build, package_dir / "ai-audio2note-backend", dirs_exist_ok=True)
+            return True
+
+        backend_exe = self.backend_dir / "dist" / exe_name
+        if not backend_exe.exists():
+            return False
+        shutil.copy2(backend_exe, package_dir / exe_name)
+        if self.system != "windows":
+            # 添加执行权限
+            os.chmod(package_dir / exe_name, 0o755)
+        return True
+
+    def backend_launch_path(self):
+        """启动脚本中后端可执行文件的相对路径"""
+        if self.system == "windows":
+            if self.profile == "onedir":
+                return "ai-audio2note-backend\\ai-audio2note-backend.exe"
+            return "ai-audio2note-backend.exe"
+        if self.profile == "onedir":
+            return "./ai-audio2note-backend/ai-audio2note-backend"
+        return "./ai-audio2note-backend"
+
     def build_windows_backend(self):
         """构建Windows后端"""
         print("🪟 构建Windows后端...")
         
         cmd = [
             "pyinstaller",
-            "--onefile",
+            "--noconfirm",
+            *self.backend_profile_args(),
             "--name", "ai-audio2note-backend",
             "--add-data", "services;services",
             "--hidden-import", "uvicorn",
@@ -118,7 +156,8 @@ class CrossPlatformBuilder:
         
         cmd = [
             "pyinstaller",
-            "--onefile",
+            "--noconfirm",
+            *self.backend_profile_args(),
             "--name", "ai-audio2note-backend",
             "--add-data", "services:services",
             "--hidden-import", "uvicorn",
@@ -233,9 +272,7 @@ class CrossPlatformBuilder:
         package_dir.mkdir(exist_ok=True)
         
         # 复制后端可执行文件
-        backend_exe = self.backend_dir / "dist" / "ai-audio2note-backend.exe"
-        if backend_exe.exists():
-            shutil.copy2(backend_exe, package_dir / "ai-audio2note-backend.exe")
+        if self.copy_backend(package_dir):
             print("✅ 后端可执行文件已复制")
         else:
             print("❌ 后端可执行文件不存在")
@@ -253,11 +290,11 @@ class CrossPlatformBuilder:
         # 创建启动脚本
         startup_script = package_dir / "启动AI_Audio2Note.bat"
         with open(startup_script, 'w', encoding='utf-8') as f:
-            f.write("""@echo off
+            f.write(f"""@echo off
 echo 启动AI Audio2Note...
 echo 正在启动后端服务...
-start /B ai-audio2note-backend.exe
-timeout /t 3 /nobreak >nul
+start /B {self.backend_launch_path()}
+powershell -NoProfile -Command "$d=(Get-Date).AddSeconds(30); while((Get-Date) -lt $d){{ try {{ Invoke-WebRequest -UseBasicParsing http://localhost:8001/health -TimeoutSec 1 | Out-Null; exit 0 }} catch {{ Start-Sleep -Milliseconds 100 }} }}; exit 1"
 echo 正在启动桌面应用...
 start AI_Audio2Note\\AI_Audio2Note.exe
 echo 应用已启动！
@@ -302,11 +339,7 @@ pause
         package_dir.mkdir(exist_ok=True)
         
         # 复制后端可执行文件
-        backend_exe = self.backend_dir / "dist" / "ai-audio2note-backend"
-        if backend_exe.exists():
-            shutil.copy2(backend_exe, package_dir / "ai-audio2note-backend")
-            # 添加执行权限
-            os.chmod(package_dir / "ai-audio2note-backend", 0o755)
+        if self.copy_backend(package_dir):
             print("✅ 后端可执行文件已复制")
         else:
             print("❌ 后端可执行文件不存在")
@@ -324,11 +357,15 @@ pause
         # 创建启动脚本
         startup_script = package_dir / "启动AI_Audio2Note.command"
         with open(startup_script, 'w', encoding='utf-8') as f:
-            f.write("""#!/bin/bash
+            f.write(f"""#!/bin/bash
+cd "$(dirname "$0")"
 echo "启动AI Audio2Note..."
 echo "正在启动后端服务..."
-./ai-audio2note-backend &
-sleep 3
+{self.backend_launch_path()} &
+for i in $(seq 1 300); do
+    curl -sf http://localhost:8001/health >/dev/null && break
+    sleep 0.1
+done
 echo "正在启动桌面应用..."
 open AI_Audio2Note.app
 echo "应用已启动！"
@@ -397,7 +434,12 @@ brew install ffmpeg
 
 def main():
     """主函数"""
-    builder = CrossPlatformBuilder()
+    parser = argparse.ArgumentParser(description="AI Audio2Note 跨平台构建")
+    parser.add_argument("--profile", choices=["onedir", "onefile"], default="onedir",
+                        help="后端打包配置：onedir 启动快，onefile 为单文件")
+    args = parser.parse_args()
+
+    builder = CrossPlatformBuilder(args.profile)
     success = builder.build_all()
     
     if success:
@@ -40,7 +40,7 @@ def check_dependencies():
         print("✅ PyInstaller已安装")
     except ImportError:
         print("📦 安装PyInstaller...")
-        if not run_command([sys.executable, "-m", "pip", "install", "pyinstaller"]):
+        if not run_command([sys.executable, "-m", "pip", "install", "pyinstaller>=6.6"]):
             return False
     
     # 检查Node.js
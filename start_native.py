@@ -2,61 +2,257 @@
 """
 启动带有原生文件夹选择器的版本
 支持Electron原生文件夹选择器
+
+子进程管理：
+- 后端和前端的输出由后台线程持续读取并写入 logs/ 下的滚动日志，
+  避免管道缓冲区写满后子进程阻塞在 print 上
+- 后端由 BackendSupervisor 守护：定期检查 /health，连续失败或进程退出时自动重启
+- 退出时先请求子进程正常结束，超时后再强制结束
 """
 
+import logging
+import os
+import signal
 import subprocess
+import threading
 import time
 import sys
+import urllib.request
 import webbrowser
+from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
+BACKEND_URL = "http://localhost:8001"
+LOG_DIR = Path("logs")
+
+# 滚动日志：单个文件 5MB，保留 3 个历史文件
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+def _get_log_writer(name):
+    """获取写入 logs/<name>.log 的滚动日志记录器"""
+    logger = logging.getLogger(f"audio2note.{name}")
+    if not logger.handlers:
+        LOG_DIR.mkdir(exist_ok=True)
+        handler = RotatingFileHandler(
+            LOG_DIR / f"{name}.log", maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+def start_logged_process(cmd, cwd, log_name, env=None):
+    """
+    启动子进程，并在后台线程中把其输出持续写入滚动日志
+
+    Args:
+        cmd (list): 命令
+        cwd (Path): 工作目录
+        log_name (str): 日志文件名（不含扩展名）
+        env (dict, optional): 额外的环境变量
+
+    Returns:
+        subprocess.Popen: 子进程
+    """
+    kwargs = {}
+    if os.name == "nt":
+        # 独立进程组，退出时可以发送 CTRL_BREAK_EVENT 让子进程正常结束
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+
+    process = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        stdin=subprocess.DEVNULL,
+        env={**os.environ, **(env or {})},
+        **kwargs
+    )
+
+    logger = _get_log_writer(log_name)
+
+    def _drain():
+        for raw in iter(process.stdout.readline, b""):
+            logger.info(raw.decode("utf-8", errors="replace").rstrip())
+        process.stdout.close()
+        logger.info(f"[进程已退出，返回码: {process.wait()}]")
+
+    threading.Thread(target=_drain, name=f"{log_name}-log", daemon=True).start()
+    return process
+
+def stop_process(process, timeout=10.0):
+    """
+    结束子进程：先请求正常退出，超时后强制结束
+
+    Args:
+        process (subprocess.Popen): 子进程
+        timeout (float): 等待正常退出的时间（秒）
+    """
+    if process is None or process.poll() is not None:
+        return
+
+    try:
+        if os.name == "nt":
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            process.terminate()
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print("⚠️ 子进程未能正常退出，强制结束")
+        process.kill()
+        process.wait()
+
+def check_backend_health(timeout=2.0):
+    """检查后端 /health 是否返回 200"""
+    try:
+        with urllib.request.urlopen(f"{BACKEND_URL}/health", timeout=timeout) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+def wait_for_backend(process=None, timeout=30.0, interval=0.1):
+    """
+    轮询 /health 直到后端就绪，代替固定时长的等待
+
+    Args:
+        process: 后端进程，进程提前退出时立即返回
+        timeout (float): 最长等待时间（秒）
+        interval (float): 轮询间隔（秒）
+
+    Returns:
+        bool: 后端就绪返回 True，超时或进程退出返回 False
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    while time.perf_counter() < deadline:
+        if process is not None and process.poll() is not None:
+            print(f"❌ 后端进程已退出，返回码: {process.returncode}")
+            return False
+        if check_backend_health(timeout=1):
+            print(f"✅ 后端已就绪（{time.perf_counter() - start:.2f}s）")
+            return True
+        time.sleep(interval)
+
+    print(f"⚠️ 等待后端超时（{timeout:.0f}s）")
+    return False
+
+class BackendSupervisor:
+    """
+    后端进程守护
+
+    定期检查后端进程和 /health，进程异常退出或连续多次健康检查失败时重启后端，
+    连续重启之间按指数退避等待；后端以返回码 0 正常退出时不再重启
+    """
+
+    def __init__(self, check_interval=5.0, max_failures=3, max_backoff=60.0):
+        """
+        Args:
+            check_interval (float): 健康检查间隔（秒）
+            max_failures (int): 连续失败多少次后重启
+            max_backoff (float): 重启退避的最长等待时间（秒）
+        """
+        self.check_interval = check_interval
+        self.max_failures = max_failures
+        self.max_backoff = max_backoff
+        self.process = None
+        self.restarts = 0
+        self._stop_event = threading.Event()
+        # 重启和停止都在这把锁内替换/结束后端进程，停止时不会留下刚启动的孤儿进程
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """启动后端并开始守护，返回后端是否就绪"""
+        self.process = start_backend()
+        ready = wait_for_backend(self.process)
+        self._thread = threading.Thread(target=self._monitor, name="backend-supervisor", daemon=True)
+        self._thread.start()
+        return ready
+
+    def _monitor(self):
+        failures = 0
+        backoff = 1.0
+        while not self._stop_event.wait(self.check_interval):
+            exited = self.process.poll() is not None
+            if not exited and check_backend_health():
+                failures = 0
+                backoff = 1.0
+                continue
+
+            failures += 1
+            if not exited and failures < self.max_failures:
+                print(f"⚠️ 后端健康检查失败（{failures}/{self.max_failures}）")
+                continue
+
+            if exited and self.process.returncode == 0:
+                print("ℹ️ 后端已正常退出，停止守护")
+                return
+
+            reason = f"进程已退出（返回码 {self.process.returncode}）" if exited else "健康检查连续失败"
+            print(f"🔄 后端{reason}，{backoff:.0f}s 后重启...")
+            if self._stop_event.wait(backoff):
+                return
+
+            with self._lock:
+                if self._stop_event.is_set():
+                    return
+                stop_process(self.process)
+                self.process = start_backend()
+                self.restarts += 1
+            failures = 0
+            backoff = min(backoff * 2, self.max_backoff)
+            wait_for_backend(self.process)
+
+    def stop(self):
+        """停止守护并正常关闭后端"""
+        self._stop_event.set()
+        with self._lock:
+            stop_process(self.process)
+        if self._thread:
+            self._thread.join(timeout=self.check_interval + 1)
+
 def start_backend():
     """启动后端服务"""
     print("🚀 启动后端服务...")
     backend_dir = Path("backend")
-    
-    backend_process = subprocess.Popen(
+
+    backend_process = start_logged_process(
         [sys.executable, "main.py"],
         cwd=backend_dir,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
+        log_name="backend",
+        env={"PYTHONUNBUFFERED": "1"}
     )
-    
+
     return backend_process
 
 def start_native_frontend():
     """启动原生文件夹选择版本"""
     print("🌐 启动原生文件夹选择版本...")
-    
-    # 等待后端启动
-    time.sleep(3)
-    
+
     # 检查是否可以使用Electron
     try:
         # 尝试启动Electron版本
         frontend_dir = Path("frontend")
-        electron_process = subprocess.Popen(
+        electron_process = start_logged_process(
             ["npm", "run", "dev"],
             cwd=frontend_dir,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            log_name="frontend"
         )
-        
+
         # 等待一下看看是否有错误
         time.sleep(3)
-        
+
         # 检查进程是否还在运行
         if electron_process.poll() is not None:
-            stdout, stderr = electron_process.communicate()
-            print(f"❌ Electron启动失败，使用浏览器版本:")
-            print(f"stdout: {stdout}")
-            print(f"stderr: {stderr}")
+            print(f"❌ Electron启动失败，使用浏览器版本（详见 {LOG_DIR / 'frontend.log'}）")
             return start_browser_fallback()
-        
+
         print("✅ Electron应用启动成功")
         return electron_process
-        
+
     except Exception as e:
         print(f"❌ Electron启动失败: {e}")
         return start_browser_fallback()
@@ -64,11 +260,11 @@ def start_native_frontend():
 def start_browser_fallback():
     """浏览器版本回退"""
     print("🌐 启动浏览器版本...")
-    
+
     # 打开浏览器
     frontend_path = Path("frontend/index_electron_native.html").absolute()
     webbrowser.open(f"file://{frontend_path}")
-    
+
     print("✅ 浏览器版本已打开")
     return None
 
@@ -76,43 +272,42 @@ def main():
     """主函数"""
     print("🎵 AI Audio2Note 原生文件夹选择版本启动")
     print("=" * 60)
-    
-    backend_process = None
+
+    supervisor = BackendSupervisor()
     frontend_process = None
-    
+
     try:
-        # 启动后端
-        backend_process = start_backend()
-        time.sleep(3)  # 等待后端启动
-        
+        # 启动后端（带守护，异常退出或无响应时自动重启）
+        supervisor.start()
+
         # 启动前端
         frontend_process = start_native_frontend()
-        
+
         print("\n✅ 服务启动完成！")
-        print("🌐 后端API: http://localhost:8001")
+        print(f"🌐 后端API: {BACKEND_URL}")
         print("🖥️  前端应用: 已打开")
+        print(f"📝 运行日志: {LOG_DIR.absolute()}")
         print("\n💡 文件夹选择功能:")
         print("   • Electron版本: 原生系统文件夹选择器")
         print("   • 浏览器版本: 改进的输入对话框")
         print("\n按 Ctrl+C 停止所有服务")
-        
+
         # 等待用户中断
         while True:
             time.sleep(1)
-            
+
     except KeyboardInterrupt:
         print("\n🛑 正在停止服务...")
-        
+
     finally:
         # 清理进程
-        if backend_process:
-            backend_process.terminate()
-            print("✅ 后端服务已停止")
-        
+        supervisor.stop()
+        print("✅ 后端服务已停止")
+
         if frontend_process:
-            frontend_process.terminate()
+            stop_process(frontend_process)
             print("✅ 前端服务已停止")
-        
+
         print("👋 再见！")
 
 if __name__ == "__main__":